@@ -8,4 +8,9 @@ setup(
         "tkinter",
     ],
     python_requires=">=3.6",
+    entry_points={
+        "console_scripts": [
+            "bank-system=src.cli:main",
+        ],
+    },
 )
\ No newline at end of file
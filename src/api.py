@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+try:
+    from .instrumentation import instrumentation, percentile
+    from .service import (
+        DuplicateEmailError, LoanService, RecordNotFoundError, ServiceError, ValidationError
+    )
+except ImportError:  # running as a script: python src/api.py
+    from instrumentation import instrumentation, percentile
+    from service import (
+        DuplicateEmailError, LoanService, RecordNotFoundError, ServiceError, ValidationError
+    )
+
+# JSON keys of a submitted application, in LoanService.prepare order
+APPLICATION_KEYS = ["name", "email", "dob", "loan_amount", "interest_rate", "months"]
+
+MAX_BODY_SIZE = 1024 * 1024
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+REASONS = {
+    200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request",
+    404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+    413: "Payload Too Large", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class Metrics:
+    """Request counts, latency percentiles and write batching figures.
+
+    Latencies are kept for the most recent window requests per route, so
+    memory stays bounded however long the server runs.
+    """
+
+    def __init__(self, window=1000):
+        self.started = time.monotonic()
+        self.requests = Counter()
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+        self.write_batches = 0
+        self.batched_writes = 0
+
+    def record(self, route, seconds):
+        self.requests[route] += 1
+        self.latencies[route].append(seconds)
+
+    def record_batch(self, size):
+        self.write_batches += 1
+        self.batched_writes += size
+
+    def snapshot(self):
+        uptime = time.monotonic() - self.started
+        total = sum(self.requests.values())
+        routes = {}
+        for route, count in self.requests.items():
+            latencies = sorted(self.latencies[route])
+            routes[route] = {
+                "count": count,
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            }
+        return {
+            "uptime_seconds": round(uptime, 3),
+            "requests_total": total,
+            "requests_per_second": round(total / uptime, 3) if uptime else 0.0,
+            "write_batches": self.write_batches,
+            "average_batch_size": round(self.batched_writes / self.write_batches, 3)
+            if self.write_batches else 0.0,
+            "routes": routes,
+        }
+
+class WriteCoalescer:
+    """Groups concurrent submissions into a single repository write.
+
+    Each submission waits on a future. A background task takes whatever
+    has queued up, up to max_batch records, and stores it with one call
+    to LoanService.submit_many on the dedicated write thread.
+    """
+
+    def __init__(self, service, executor, metrics, max_batch=256, max_delay=0.002):
+        self.service = service
+        self.executor = executor
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = None
+        self.task = None
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, record):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((record, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            if self.max_delay:
+                # Give concurrent requests a moment to join the group
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            records = [record for record, _ in batch]
+            try:
+                outcomes = await loop.run_in_executor(self.executor, self.service.submit_many, records)
+            except Exception as e:
+                outcomes = [e] * len(batch)
+            self.metrics.record_batch(len(batch))
+
+            for (_, future), outcome in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if outcome is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(outcome)
+
+class LoanAPIServer:
+    """Local HTTP/JSON front end for LoanService.
+
+    Endpoints:
+        POST   /applications          submit one application, or a list of them
+        GET    /applications          list records (?offset=&limit=)
+        GET    /applications/<email>  look up one record
+        DELETE /applications/<email>  delete one record
+        GET    /metrics               latency and throughput figures, as JSON
+        GET    /metrics/prometheus    the same plus storage timings, as Prometheus text
+
+    Writes run one at a time on a dedicated thread. Reads use a separate
+    pool, so the event loop never touches the disk.
+    """
+
+    def __init__(self, service, host="127.0.0.1", port=8080, max_batch=256, max_delay=0.002):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.metrics = Metrics()
+        self.writes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-write")
+        self.reads = ThreadPoolExecutor(max_workers=4, thread_name_prefix="api-read")
+        self.coalescer = WriteCoalescer(service, self.writes, self.metrics, max_batch, max_delay)
+        self.server = None
+
+    async def start(self):
+        self.coalescer.start()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.coalescer.stop()
+        self.writes.shutdown(wait=True)
+        self.reads.shutdown(wait=True)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line, headers = await self.read_head(reader)
+                except ValueError:  # a line longer than the reader's limit
+                    await self.respond(writer, 431, {"error": "Request line or header too long"}, False)
+                    break
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Malformed request line"}, False)
+                    break
+
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {"error": "Malformed Content-Length"}, False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self.respond(writer, 413, {"error": "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                started = time.perf_counter()
+                route, status, payload = await self.dispatch(method, target, body)
+                self.metrics.record(route, time.perf_counter() - started)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def read_head(reader):
+        """Read a request line and its headers, as (bytes, {lower-case name: value})"""
+        request_line = await reader.readline()
+        headers = {}
+        if request_line.strip():
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+        return request_line, headers
+
+    async def respond(self, writer, status, payload, keep_alive):
+        """Send payload as JSON, or as plain text if it is a string"""
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            content_type = "application/json"
+        head = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if body:
+            head.append(f"Content-Type: {content_type}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        """Route a request, returning (route name, status, JSON payload)"""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        route = "not_found"
+        try:
+            if parts == ["applications"]:
+                if method == "POST":
+                    route = "submit"
+                    return (route,) + await self.submit(body)
+                if method == "GET":
+                    route = "list"
+                    return route, 200, await self.list(parse_qs(url.query))
+                raise HTTPError(405, "Use GET or POST on /applications")
+            if len(parts) == 2 and parts[0] == "applications":
+                if method == "GET":
+                    route = "lookup"
+                    record = await self.read(self.service.get, parts[1])
+                    return route, 200, record.to_json()
+                if method == "DELETE":
+                    route = "delete"
+                    await self.write(self.service.delete, parts[1])
+                    return route, 204, None
+                raise HTTPError(405, "Use GET or DELETE on /applications/<email>")
+            if parts == ["metrics"] and method == "GET":
+                route = "metrics"
+                snapshot = self.metrics.snapshot()
+                if instrumentation.enabled:
+                    snapshot["instrumentation"] = instrumentation.snapshot()
+                return route, 200, snapshot
+            if parts == ["metrics", "prometheus"] and method == "GET":
+                route = "metrics"
+                return route, 200, self.prometheus_text()
+            raise HTTPError(404, "No such endpoint")
+        except HTTPError as e:
+            return route, e.status, {"error": str(e)}
+        except ValidationError as e:
+            return route, 400, {"error": str(e)}
+        except RecordNotFoundError as e:
+            return route, 404, {"error": str(e)}
+        except DuplicateEmailError as e:
+            return route, 409, {"error": str(e)}
+        except ServiceError as e:
+            return route, 400, {"error": str(e)}
+        except Exception as e:
+            return route, 500, {"error": f"An error occurred while accessing the database: {e}"}
+
+    def prometheus_text(self):
+        """Request figures in Prometheus text, followed by the instrumentation's"""
+        snapshot = self.metrics.snapshot()
+        lines = [
+            "# HELP bank_api_requests_total Requests handled, by route.",
+            "# TYPE bank_api_requests_total counter",
+        ]
+        for route, figures in snapshot["routes"].items():
+            lines.append(f'bank_api_requests_total{{route="{route}"}} {figures["count"]}')
+        lines += [
+            "# HELP bank_api_write_batches_total Grouped repository writes.",
+            "# TYPE bank_api_write_batches_total counter",
+            f"bank_api_write_batches_total {snapshot['write_batches']}",
+        ]
+        text = "\n".join(lines) + "\n"
+        return text + instrumentation.to_prometheus() if instrumentation.enabled else text
+
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.reads, fn, *args)
+
+    async def write(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.writes, fn, *args)
+
+    def prepare(self, application):
+        if not isinstance(application, dict):
+            raise ValidationError("Each application must be a JSON object")
+        fields = [application.get(key, "") for key in APPLICATION_KEYS]
+        for key, value in zip(APPLICATION_KEYS, fields):
+            # prepare() would turn null, true or a list into text that may pass
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                raise ValidationError(f"{key} must be a string or a number")
+        return self.service.prepare(*fields)
+
+    async def submit(self, body):
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+
+        if not isinstance(payload, list):
+            record = self.prepare(payload)
+            await self.coalescer.submit(record)
+            return 201, record.to_json()
+
+        # A list is submitted item by item; each gets its own outcome
+        async def submit_one(application):
+            try:
+                record = self.prepare(application)
+                await self.coalescer.submit(record)
+            except (ServiceError, DuplicateEmailError) as e:
+                return {"status": 409 if isinstance(e, DuplicateEmailError) else 400, "error": str(e)}
+            except Exception as e:
+                # Other records of the list may already be stored, so the
+                # failure stays with this one rather than failing them all
+                return {"status": 500, "error": f"An error occurred while accessing the database: {e}"}
+            return {"status": 201, "record": record.to_json()}
+
+        return 200, await asyncio.gather(*(submit_one(item) for item in payload))
+
+    async def list(self, query):
+        try:
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", [str(DEFAULT_PAGE_SIZE)])[0])
+        except ValueError:
+            raise HTTPError(400, "offset and limit must be whole numbers")
+        if offset < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+            raise HTTPError(400, f"offset must be >= 0 and limit between 1 and {MAX_PAGE_SIZE}")
+
+        def page():
+            return self.service.count(), self.service.list(offset, limit)
+
+        total, records = await self.read(page)
+        return {"total": total, "offset": offset, "limit": limit,
+                "records": [record.to_json() for record in records]}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON API for loan applications")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--storage", help="storage backend (default: $BANK_STORAGE or csv)")
+    parser.add_argument("--database", help="database path (default: $BANK_DATABASE)")
+    args = parser.parse_args(argv)
+
+    service = LoanService.open(args.storage, args.database)
+    server = LoanAPIServer(service, args.host, args.port)
+    print(f"Serving loan API on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
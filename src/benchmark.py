@@ -0,0 +1,453 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    from .instrumentation import percentile
+    from .loans import build_record
+    from .service import LoanService
+    from .storage import open_repository
+except ImportError:  # running as a script: python src/benchmark.py
+    from instrumentation import percentile
+    from loans import build_record
+    from service import LoanService
+    from storage import open_repository
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "baseline.json")
+
+# Entry points --startup imports in fresh interpreters, and the cold
+# starts each is timed over
+STARTUP_MODULES = ["src.service", "src.cli", "src.bank_system"]
+STARTUP_RUNS = 10
+
+# Milliseconds a headless entry point may spend on imports, and the
+# window on reaching its first idle moment, before the startup tests
+# fail. Both sit well above a developer machine's figures; they catch a
+# heavy import or page creeping back into start-up, not noise
+STARTUP_BUDGET_MS = 120
+GUI_STARTUP_BUDGET_MS = 1000
+
+# Run by gui_startup_time in a fresh interpreter
+GUI_STARTUP_CODE = """\
+import time
+started = time.perf_counter()
+from src.bank_system import load_gui
+gui = load_gui()
+root = gui.tk.Tk()
+root.withdraw()
+app = gui.BankSystemGUI(root)
+app.executor.drain()
+root.update()
+print(time.perf_counter() - started)
+app.close()
+"""
+
+# Iterations of each operation run under tracemalloc to find its peak
+MEMORY_SAMPLES = 3
+
+# A timing only counts as a regression if it grew by more than this many
+# milliseconds as well as by the tolerated share, so sub-millisecond
+# operations do not fail on scheduler noise
+MIN_DELTA_MS = 1.0
+
+FIRST_NAMES = ["Ann", "Bob", "Cara", "Dan", "Eve", "Finn", "Gina", "Hugo", "Iris", "Jon"]
+LAST_NAMES = ["Lee", "Stone", "Moss", "Reed", "Shaw", "Vale", "Wood", "Young"]
+
+def synthetic_records(count, seed=0, start=0):
+    """Yield count reproducible LoanRecords with emails customer<n>@example.com"""
+    rng = random.Random(seed + start)
+    for number in range(start, start + count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        dob = f"{rng.randint(1950, 2004)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        yield build_record(name, f"customer{number}@example.com", dob,
+                           rng.randint(1, 500) * 100, rng.randint(1, 20), rng.randint(6, 360))
+
+def build_book(repository, count, seed=0, chunk_size=10000):
+    """Fill an initialized repository with count synthetic records"""
+    records = synthetic_records(count, seed)
+    while count > 0:
+        chunk = [next(records) for _ in range(min(chunk_size, count))]
+        repository.append_many(chunk)
+        count -= len(chunk)
+
+class Operation:
+    """One benchmarked call. setup() runs untimed before every call."""
+
+    def __init__(self, name, call, setup=None):
+        self.name = name
+        self.call = call
+        self.setup = setup
+
+    def run(self):
+        argument = self.setup() if self.setup is not None else None
+        started = time.perf_counter()
+        self.call(argument)
+        return time.perf_counter() - started
+
+def measure(operation, iterations, budget):
+    """Time operation up to iterations times or budget seconds, then sample memory.
+
+    At least three timings are taken however slow the operation is.
+    """
+    timings = []
+    deadline = time.perf_counter() + budget
+    while len(timings) < iterations and (len(timings) < 3 or time.perf_counter() < deadline):
+        timings.append(operation.run())
+
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(MEMORY_SAMPLES):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            operation.run()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return summarize(timings, peak)
+
+def summarize(timings, peak=0):
+    """Figures of a list of timings in seconds and a peak in bytes"""
+    timings = sorted(timings)
+    return {
+        "samples": len(timings),
+        "p50_ms": round(percentile(timings, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+class Workload:
+    """Hands out emails for the operations of one benchmarked book.
+
+    Lookups pick random stored emails; submissions use fresh numbers past
+    the end of the book, and deletes remove those submissions again, so
+    the book keeps its size.
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.rng = random.Random(seed)
+        self.next_number = size
+        self.submitted = []
+
+    def stored_email(self):
+        return f"customer{self.rng.randrange(self.size)}@example.com"
+
+    def missing_email(self):
+        return f"nobody{self.rng.randrange(self.size)}@example.com"
+
+    def new_application(self):
+        number = self.next_number
+        self.next_number += 1
+        self.submitted.append(f"customer{number}@example.com")
+        return ("Bench User", f"customer{number}@example.com", "1990-01-01", "1000", "5", "12")
+
+    def submitted_email(self, make_one):
+        if not self.submitted:
+            make_one()
+        return self.submitted.pop()
+
+    def offset(self, limit):
+        return self.rng.randrange(max(1, self.size - limit))
+
+def service_operations(service, workload):
+    """Operations on LoanService, the layer shared by every front end"""
+    def submit_new():
+        service.submit(*workload.new_application())
+
+    return [
+        Operation("submit", lambda application: service.submit(*application),
+                  workload.new_application),
+        Operation("email_exists", service.email_exists, workload.stored_email),
+        Operation("email_missing", service.email_exists, workload.missing_email),
+        Operation("lookup", service.get, workload.stored_email),
+        Operation("list_page", lambda offset: service.list(offset, 100),
+                  lambda: workload.offset(100)),
+        Operation("query", lambda text: service.query(text, "loan_cents").page(0, 100),
+                  lambda: workload.rng.choice(LAST_NAMES).lower()),
+        Operation("delete", service.delete, lambda: workload.submitted_email(submit_new)),
+    ]
+
+@contextlib.contextmanager
+def answered_dialogs(module):
+    """Answer the GUI's message boxes without showing them"""
+    messagebox = module.messagebox
+    saved = {name: getattr(messagebox, name)
+             for name in ("showinfo", "showwarning", "showerror", "askyesno")}
+    for name in saved:
+        setattr(messagebox, name, lambda *args, **kwargs: True)
+    try:
+        yield
+    finally:
+        for name, function in saved.items():
+            setattr(messagebox, name, function)
+
+def gui_operations(app, module, workload):
+    """The same work driven through the Tk front end, waiting for its I/O"""
+    page = app.frames[module.DatabasePage]
+
+    def submit_new():
+        app.service.submit(*workload.new_application())
+
+    def load_data(_):
+        page.load_data()
+        app.executor.drain()
+
+    def delete_record(email):
+        page.delete_entry.delete(0, "end")
+        page.delete_entry.insert(0, email)
+        page.delete_record()
+        app.executor.drain()
+
+    return [
+        Operation("gui_email_exists", app.email_exists, workload.stored_email),
+        Operation("gui_load_database", lambda _: app.load_database()),
+        Operation("gui_load_data", load_data),
+        Operation("gui_delete_record", delete_record, lambda: workload.submitted_email(submit_new)),
+    ]
+
+@contextlib.contextmanager
+def virtual_display():
+    """Provide an X display for Tk, starting Xvfb if there is none.
+
+    Does nothing when DISPLAY is already set or on other platforms.
+    Raises RuntimeError if a display is needed and Xvfb is not installed.
+    """
+    if os.environ.get("DISPLAY") or not sys.platform.startswith("linux"):
+        yield
+        return
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        raise RuntimeError("No display available; install Xvfb or set DISPLAY to benchmark the GUI")
+
+    # Xvfb picks a free display number and writes it to the pipe
+    read_end, write_end = os.pipe()
+    server = subprocess.Popen([xvfb, "-displayfd", str(write_end), "-screen", "0", "1280x1024x24",
+                               "-nolisten", "tcp"], pass_fds=(write_end,),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_end)
+    with os.fdopen(read_end) as pipe:
+        display = pipe.readline().strip()
+    if not display:
+        server.wait()
+        raise RuntimeError("Xvfb did not start")
+    os.environ["DISPLAY"] = f":{display}"
+    try:
+        yield
+    finally:
+        del os.environ["DISPLAY"]
+        server.terminate()
+        server.wait()
+
+def import_time(module):
+    """Seconds a fresh interpreter spends importing module, by -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        # "import time: self | cumulative | name", nested imports indented
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2] == f" {module}":
+            return int(fields[1]) / 1_000_000
+    raise RuntimeError(f"No import time reported for {module}")
+
+def gui_startup_time(database):
+    """Seconds from a fresh interpreter's first import until the window is idle"""
+    env = dict(os.environ, BANK_STORAGE="csv", BANK_DATABASE=database)
+    result = subprocess.run([sys.executable, "-c", GUI_STARTUP_CODE], cwd=PROJECT_ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+def run_startup(workdir, runs=STARTUP_RUNS, gui=False):
+    """Cold start figures of the entry points, and of the window with gui"""
+    results = {
+        f"startup/import/{module}": summarize([import_time(module) for _ in range(runs)])
+        for module in STARTUP_MODULES
+    }
+    if gui:
+        database = os.path.join(workdir, "startup.csv")
+        results["startup/gui/window"] = summarize([gui_startup_time(database) for _ in range(runs)])
+    return results
+
+def run_size(backend, size, workdir, iterations=100, budget=5.0, gui=False, seed=0, report=print):
+    """Benchmark one backend at one book size, returning {key: figures}"""
+    suffix = "csv" if backend == "csv" else "db"
+    path = os.path.join(workdir, f"bench-{size}.{suffix}")
+    repository = open_repository(backend, path)
+    repository.initialize()
+    started = time.perf_counter()
+    build_book(repository, size, seed)
+    report(f"{backend}: built {size:,} records in {time.perf_counter() - started:.1f}s")
+
+    results = {}
+    workload = Workload(size, seed)
+    service = LoanService(repository)
+    try:
+        # The first query builds the search index where the backend needs
+        # one; a fresh service each time keeps the index being timed cold
+        first_query = Operation(
+            "first_query", lambda _: LoanService(repository).query("lee", "loan_cents").page(0, 100))
+        results[f"{backend}/service/first_query/{size}"] = measure(first_query, 1, 0)
+        service.query()  # Build the search index outside the timings
+        for operation in service_operations(service, workload):
+            results[f"{backend}/service/{operation.name}/{size}"] = measure(operation, iterations, budget)
+
+        if gui:
+            results.update(run_gui(backend, size, service, workload, iterations, budget))
+    finally:
+        service.close()
+    return results
+
+def run_gui(backend, size, service, workload, iterations, budget):
+    try:
+        from . import gui
+    except ImportError:  # running as a script: python src/benchmark.py
+        import gui
+
+    results = {}
+    root = gui.tk.Tk()
+    root.withdraw()
+    # Point the GUI's own start-up at the benchmark book, not ./database.csv
+    saved = {name: os.environ.get(name) for name in ("BANK_STORAGE", "BANK_DATABASE")}
+    os.environ.update(BANK_STORAGE=backend, BANK_DATABASE=service.repository.path)
+    try:
+        app = gui.BankSystemGUI(root)
+        app.executor.drain()
+        app.service.close()
+        app.service = service
+        with answered_dialogs(gui):
+            for operation in gui_operations(app, gui, workload):
+                results[f"{backend}/gui/{operation.name}/{size}"] = measure(operation, iterations, budget)
+        app.executor.drain()
+        app.executor.shutdown()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        root.destroy()
+    return results
+
+def run(backends=("csv",), sizes=DEFAULT_SIZES, iterations=100, budget=5.0, gui=False, seed=0,
+        report=print, startup=False):
+    """Benchmark every backend at every size in a scratch directory"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, \
+            (virtual_display() if gui else contextlib.nullcontext()):
+        if startup:
+            results.update(run_startup(workdir, gui=gui))
+        for backend in backends:
+            for size in sizes:
+                results.update(run_size(backend, size, workdir, iterations, budget, gui, seed, report))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def compare(results, baseline, tolerance=0.5, min_delta_ms=MIN_DELTA_MS):
+    """List the regressions of results against a stored baseline.
+
+    The median latency or the peak memory regresses when it exceeds the
+    baseline by more than tolerance (0.5 means 50%). The tail
+    percentiles are reported but not compared: on a shared machine they
+    mostly measure the neighbours. Keys missing from the baseline are
+    not compared.
+    """
+    regressions = []
+    for key, figures in sorted(results["results"].items()):
+        expected = baseline.get("results", {}).get(key)
+        if expected is None:
+            continue
+        p50, allowed = figures["p50_ms"], expected["p50_ms"] * (1 + tolerance)
+        if p50 > allowed and p50 - expected["p50_ms"] > min_delta_ms:
+            regressions.append(f"{key}: p50 {p50} ms, baseline {expected['p50_ms']} ms")
+        peak, allowed = figures["peak_kib"], expected["peak_kib"] * (1 + tolerance)
+        if peak > allowed and peak - expected["peak_kib"] > 64:
+            regressions.append(f"{key}: peak {peak} KiB, baseline {expected['peak_kib']} KiB")
+    return regressions
+
+def format_table(results):
+    lines = [f"{'benchmark':<42} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'peak KiB':>10}"]
+    for key, figures in sorted(results["results"].items()):
+        lines.append(f"{key:<42} {figures['samples']:>5} {figures['p50_ms']:>10} "
+                     f"{figures['p95_ms']:>10} {figures['p99_ms']:>10} {figures['peak_kib']:>10}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark storage, service and GUI operations")
+    parser.add_argument("--backend", action="append", choices=["csv", "sqlite"],
+                        help="backend to benchmark; repeat for several (default: csv)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated record counts (default: %(default)s)")
+    parser.add_argument("--iterations", type=int, default=100, help="timed calls per operation")
+    parser.add_argument("--budget", type=float, default=5.0,
+                        help="seconds an operation may take before it stops early")
+    parser.add_argument("--gui", action="store_true",
+                        help="also drive the Tk front end (uses Xvfb when there is no display)")
+    parser.add_argument("--startup", action="store_true",
+                        help="also time cold starts of the entry points (and the window, with --gui)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="merge the results into the baseline file")
+    parser.add_argument("--check", action="store_true",
+                        help="exit with status 1 if any figure regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed growth over the baseline, as a fraction (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",")]
+    except ValueError:
+        parser.error("--sizes must be whole numbers separated by commas")
+    if min(sizes) <= 0:
+        parser.error("--sizes must be positive")
+
+    results = run(args.backend or ["csv"], sizes, args.iterations, args.budget, args.gui, args.seed,
+                  startup=args.startup)
+    print(format_table(results))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    baseline = {"results": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    status = 0
+    if args.check:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        status = 1 if regressions else 0
+    if args.save_baseline:
+        baseline["meta"] = results["meta"]
+        baseline.setdefault("results", {}).update(results["results"])
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+    return status
+
+if __name__ == "__main__":
+    raise SystemExit(main())
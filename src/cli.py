@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+
+try:
+    from .reporting import format_report
+    from .service import LoanService, ServiceError, StorageError
+except ImportError:  # running as a script: python src/cli.py
+    from reporting import format_report
+    from service import LoanService, ServiceError, StorageError
+
+def print_records(records, as_json):
+    if as_json:
+        for record in records:
+            print(json.dumps(record.to_json()))
+        return
+    for record in records:
+        print(" | ".join(record.display_values()))
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bank-system", description="Bank Loan Management System")
+    parser.add_argument("--storage", help="storage backend (default: $BANK_STORAGE or csv)")
+    parser.add_argument("--database", help="database path (default: $BANK_DATABASE)")
+    parser.add_argument("--json", action="store_true", help="print records as JSON lines")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit = subparsers.add_parser("submit", help="submit a loan application")
+    submit.add_argument("--name", required=True)
+    submit.add_argument("--email", required=True)
+    submit.add_argument("--dob", required=True, help="date of birth, YYYY-MM-DD")
+    submit.add_argument("--amount", required=True, help="loan amount ($)")
+    submit.add_argument("--rate", required=True, help="interest rate (%%)")
+    submit.add_argument("--months", required=True, help="loan term in months")
+
+    listing = subparsers.add_parser("list", help="list stored applications")
+    listing.add_argument("--offset", type=int, default=0)
+    listing.add_argument("--limit", type=int)
+
+    search = subparsers.add_parser("search", help="find applications by name or email")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=100)
+
+    delete = subparsers.add_parser("delete", help="delete the application for an email")
+    delete.add_argument("email")
+
+    subparsers.add_parser("report", help="portfolio totals and exposure by term and age")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        service = LoanService.open(args.storage, args.database)
+    except (ServiceError, StorageError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        if args.command == "submit":
+            record = service.submit(args.name, args.email, args.dob,
+                                    args.amount, args.rate, args.months)
+            print_records([record], args.json)
+        elif args.command == "list":
+            print_records(service.list(args.offset, args.limit), args.json)
+        elif args.command == "search":
+            print_records(service.search(args.query, args.limit), args.json)
+        elif args.command == "delete":
+            service.delete(args.email)
+            print(f"Deleted {args.email}")
+        elif args.command == "report":
+            report = service.report()
+            print(json.dumps(report) if args.json else format_report(report))
+    except (ServiceError, StorageError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
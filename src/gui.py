@@ -0,0 +1,1033 @@
+import itertools
+import tkinter as tk
+from tkinter import filedialog, ttk, messagebox
+
+try:
+    from . import loans, validation
+    from .instrumentation import instrumentation
+    from .records import format_money
+    from .service import DuplicateEmailError, LoanService, RecordNotFoundError, ValidationError
+    from .storage import open_repository
+    from .workers import IOExecutor
+except ImportError:  # imported from a script in src/
+    import loans
+    import validation
+    from instrumentation import instrumentation
+    from records import format_money
+    from service import DuplicateEmailError, LoanService, RecordNotFoundError, ValidationError
+    from storage import open_repository
+    from workers import IOExecutor
+
+# Rows fetched per scroll step on the database page, and how many such
+# pages are kept in the Treeview at once
+PAGE_SIZE = 100
+WINDOW_PAGES = 3
+
+def window_overflow(kept, fetched, capacity=PAGE_SIZE * WINDOW_PAGES):
+    """Rows to drop from the far end of a window after adding fetched rows to it"""
+    return max(0, min(kept, kept + fetched - capacity))
+
+# Milliseconds of quiet typing before the database search runs
+SEARCH_DELAY = 250
+
+# Milliseconds of quiet typing before a form field is checked
+VALIDATE_DELAY = 300
+
+# Milliseconds between checks for changes made by other processes while
+# the database page is shown
+REFRESH_INTERVAL = 1000
+
+# Records read per step of a full portfolio recalculation, and the
+# milliseconds between progress bar updates while it runs
+RECOMPUTE_CHUNK = 10000
+PROGRESS_INTERVAL = 100
+
+# Database view columns that sort by a record field when clicked
+SORT_COLUMNS = {
+    "Name": "name", "Email": "email", "Date of Birth": "dob",
+    "Loan Amount": "loan_cents", "Interest Rate": "rate", "Term": "months",
+}
+
+class Pages(dict):
+    """The main window's pages by class, each built on first lookup"""
+    
+    def __init__(self, container, controller):
+        dict.__init__(self)
+        self.container = container
+        self.controller = controller
+    
+    def __missing__(self, cont):
+        frame = self[cont] = cont(self.container, self.controller)
+        frame.grid(row=0, column=0, sticky="nsew")
+        return frame
+
+class BankSystemGUI:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Bank Loan Management System")
+        
+        
+        self.root.state('normal')
+        root.resizable(False, False)
+        # Configure styles
+        self.style = ttk.Style()
+        self.style.configure('Header.TLabel', font=('Helvetica', 16, 'bold'))
+        self.style.configure('TButton', font=('Helvetica', 10))
+        self.style.configure('TLabel', font=('Helvetica', 10))
+        self.style.configure('Error.TLabel', font=('Helvetica', 9), foreground='red')
+        self.style.configure('Invalid.TEntry', foreground='red')
+        
+        # Create main container
+        self.container = ttk.Frame(root)
+        self.container.pack(fill=tk.BOTH, expand=True)
+        
+        # Pages are built the first time they are shown, so startup only
+        # pays for the application form
+        self.frames = Pages(self.container, self)
+        self.current_frame = None
+        
+        # Status bar shown while storage work runs in the background
+        self.status_label = ttk.Label(root, text="", anchor=tk.W)
+        self.status_label.pack(fill=tk.X, side=tk.BOTTOM, padx=5)
+        
+        self.show_frame(MainPage)
+        
+        # All disk access goes through the I/O executor
+        self.executor = IOExecutor(self.root.after, on_busy_change=self.set_busy)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.bind("<F12>", lambda event: self.show_diagnostics())
+        self.diagnostics = None
+        
+        # Initialize database file; all business rules live in the service
+        self.service = LoanService(open_repository())
+        self.initialize_database()
+    
+    @property
+    def repository(self):
+        return self.service.repository
+    
+    @repository.setter
+    def repository(self, repository):
+        self.service = LoanService(repository)
+        
+    def initialize_database(self):
+        """Ensure the database exists with correct headers"""
+        def show_error(e):
+            messagebox.showerror("Initialization Error", 
+                               f"Failed to initialize database:\n{str(e)}")
+        self.run_io(self.service.repository.initialize, on_error=show_error, write=True)
+    
+    def run_io(self, fn, *args, on_success=None, on_error=None, write=False, quiet=False):
+        """Run storage work in the background, reporting errors in a dialog by default.
+
+        quiet work, like polling for changes, leaves the status bar and
+        cursor alone.
+        """
+        if on_error is None:
+            on_error = self.show_database_error
+        return self.executor.submit(fn, *args, on_success=on_success,
+                                    on_error=on_error, write=write, quiet=quiet)
+    
+    def show_database_error(self, e):
+        instrumentation.error("storage", e)
+        messagebox.showerror("Database Error", 
+                           f"An error occurred while accessing the database:\n{str(e)}")
+    
+    def set_busy(self, busy):
+        self.status_label.config(text="Working..." if busy else "")
+        self.root.config(cursor="watch" if busy else "")
+    
+    def show_diagnostics(self):
+        """Open the diagnostics panel, or bring it to the front"""
+        if self.diagnostics is None or not self.diagnostics.winfo_exists():
+            self.diagnostics = DiagnosticsWindow(self.root)
+        self.diagnostics.lift()
+    
+    def close(self):
+        """Flush pending writes before the window goes away"""
+        self.executor.shutdown()
+        self.service.close()
+        self.root.destroy()
+        
+    def show_frame(self, cont):
+        frame = self.frames[cont]
+        frame.tkraise()
+        self.current_frame = frame
+        if cont in (DatabasePage, ReportsPage):
+            frame.load_data()
+        
+    def validate_email(self, email):
+        return self.service.validate_email(email)
+    
+    def validate_dob(self, dob):
+        return self.service.validate_dob(dob)
+    
+    def calculate_interest(self, amount, rate):
+        return self.service.calculate_interest(amount, rate)
+    
+    def calculate_monthly_interest(self, interest_amount, months):
+        return self.service.calculate_monthly_interest(interest_amount, months)
+    
+    def load_database(self):
+        try:
+            return self.service.list()
+        except Exception as e:
+            self.show_database_error(e)
+            return None
+    
+    def email_exists(self, email):
+        """Check if email already exists in database"""
+        return self.service.email_exists(email)
+
+class MainPage(ttk.Frame):
+    def __init__(self, parent, controller):
+        ttk.Frame.__init__(self, parent)
+        self.controller = controller
+        
+        # Configure grid weights for centering
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_columnconfigure(2, weight=1)
+        
+        # Main content frame (centered)
+        main_frame = ttk.Frame(self)
+        main_frame.grid(row=1, column=1, sticky="nsew", padx=20, pady=20)
+        
+        # Header
+        header = ttk.Label(main_frame, text="Loan Application Form", style='Header.TLabel')
+        header.pack(pady=20)
+        
+        # Form Frame
+        form_frame = ttk.Frame(main_frame)
+        form_frame.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
+        
+        # Configure form grid
+        for i in range(7):
+            form_frame.grid_rowconfigure(i, weight=1)
+        form_frame.grid_columnconfigure(0, weight=1)
+        form_frame.grid_columnconfigure(1, weight=1)
+        
+        # Customer Name
+        ttk.Label(form_frame, text="Customer Full Name:").grid(row=0, column=0, sticky=tk.W, pady=5)
+        self.name_entry = ttk.Entry(form_frame, width=40)
+        self.name_entry.grid(row=0, column=1, pady=5, padx=5, sticky=tk.W)
+        
+        # Email
+        ttk.Label(form_frame, text="Email Address:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.email_entry = ttk.Entry(form_frame, width=40)
+        self.email_entry.grid(row=1, column=1, pady=5, padx=5, sticky=tk.W)
+        
+        # Date of Birth
+        ttk.Label(form_frame, text="Date of Birth (YYYY-MM-DD):").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.dob_entry = ttk.Entry(form_frame, width=40)
+        self.dob_entry.grid(row=2, column=1, pady=5, padx=5, sticky=tk.W)
+        
+        # Loan Amount
+        ttk.Label(form_frame, text="Loan Amount ($):").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.loan_entry = ttk.Entry(form_frame, width=40)
+        self.loan_entry.grid(row=3, column=1, pady=5, padx=5, sticky=tk.W)
+        
+        # Interest Rate
+        ttk.Label(form_frame, text="Interest Rate (%):").grid(row=4, column=0, sticky=tk.W, pady=5)
+        self.interest_entry = ttk.Entry(form_frame, width=40)
+        self.interest_entry.grid(row=4, column=1, pady=5, padx=5, sticky=tk.W)
+        
+        # Months
+        ttk.Label(form_frame, text="Loan Term (Months):").grid(row=5, column=0, sticky=tk.W, pady=5)
+        self.month_entry = ttk.Entry(form_frame, width=40)
+        self.month_entry.grid(row=5, column=1, pady=5, padx=5, sticky=tk.W)
+        
+        # Each field is checked shortly after the user stops typing in it;
+        # the message for the field being edited shows below the form
+        self.entries = {
+            "name": self.name_entry, "email": self.email_entry, "dob": self.dob_entry,
+            "loan_amount": self.loan_entry, "interest_rate": self.interest_entry,
+            "months": self.month_entry,
+        }
+        self.field_messages = {}
+        self.validate_jobs = {}
+        self.email_check = 0
+        for field, entry in self.entries.items():
+            entry.bind("<KeyRelease>", lambda event, field=field: self.on_field_key(field), add="+")
+        self.validation_label = ttk.Label(form_frame, text="", style='Error.TLabel', wraplength=500)
+        self.validation_label.grid(row=6, column=0, columnspan=2, sticky=tk.W)
+        
+        # Results Frame
+        results_frame = ttk.LabelFrame(main_frame, text="Calculation Results", padding=10)
+        results_frame.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
+        
+        self.loan_result = ttk.Label(results_frame, text="")
+        self.loan_result.pack(anchor=tk.W)
+        
+        self.interest_result = ttk.Label(results_frame, text="")
+        self.interest_result.pack(anchor=tk.W)
+        
+        self.month_result = ttk.Label(results_frame, text="")
+        self.month_result.pack(anchor=tk.W)
+        
+        self.payment_result = ttk.Label(results_frame, text="")
+        self.payment_result.pack(anchor=tk.W)
+        
+        # Refresh the results as the loan figures are typed
+        for entry in (self.loan_entry, self.interest_entry, self.month_entry):
+            entry.bind("<KeyRelease>", lambda event: self.update_results(), add="+")
+        
+        # Buttons Frame
+        buttons_frame = ttk.Frame(main_frame)
+        buttons_frame.pack(pady=20)
+        
+        ttk.Button(buttons_frame, text="Submit Application", 
+                  command=self.submit_data).pack(side=tk.LEFT, padx=10)
+        
+        ttk.Button(buttons_frame, text="View Database", 
+                  command=lambda: self.controller.show_frame(DatabasePage)).pack(side=tk.LEFT, padx=10)
+        
+        ttk.Button(buttons_frame, text="View Reports", 
+                  command=lambda: self.controller.show_frame(ReportsPage)).pack(side=tk.LEFT, padx=10)
+        
+        ttk.Button(buttons_frame, text="View Schedule", 
+                  command=self.show_schedule).pack(side=tk.LEFT, padx=10)
+        
+        ttk.Button(buttons_frame, text="Clear Form", 
+                  command=self.clear_fields).pack(side=tk.LEFT, padx=10)
+    
+    def on_field_key(self, field):
+        """Check field once the user pauses typing in it"""
+        job = self.validate_jobs.pop(field, None)
+        if job is not None:
+            self.after_cancel(job)
+        self.validate_jobs[field] = self.after(VALIDATE_DELAY, self.validate_field, field)
+    
+    def validate_field(self, field):
+        """Show what is wrong with a field; an empty field is not flagged until submit"""
+        self.validate_jobs.pop(field, None)
+        value = self.entries[field].get().strip()
+        message = validation.check_field(field, value) if value else None
+        self.show_field_message(field, message)
+        if field == "email" and value and message is None:
+            self.check_email_registered(value)
+    
+    def check_email_registered(self, email):
+        """Look the email up in the background and flag it if it is taken"""
+        self.email_check += 1
+        check = self.email_check
+        
+        def show(exists):
+            if exists and check == self.email_check and self.email_entry.get().strip() == email:
+                self.show_field_message("email", "This email address is already registered in our system.")
+        
+        # A failed lookup only means no early warning; submit still checks
+        self.controller.run_io(self.controller.service.email_exists, email,
+                               on_success=show, on_error=lambda e: None)
+    
+    def show_field_message(self, field, message):
+        self.field_messages[field] = message
+        self.entries[field].configure(style="Invalid.TEntry" if message else "TEntry")
+        shown = message or next((text for text in self.field_messages.values() if text), "")
+        self.validation_label.config(text=shown)
+    
+    def loan_figures(self):
+        """Return (amount, rate, months) if all three entries hold positive numbers"""
+        values = [entry.get().strip() for entry in (self.loan_entry, self.interest_entry, self.month_entry)]
+        if not all(validation.is_positive_whole(value) for value in values):
+            return None
+        return tuple(int(value) for value in values)
+    
+    def update_results(self):
+        self.show_results(self.loan_figures())
+    
+    def show_results(self, figures):
+        """Fill the results panel from (amount, rate, months), or clear it for None"""
+        if figures is None:
+            for label in (self.loan_result, self.interest_result, self.month_result, self.payment_result):
+                label.config(text="")
+            return
+        amount, rate, months = figures
+        summary = loans.amortization_summary(amount, rate, months)
+        self.loan_result.config(text=f"Loan Amount: {amount:,} $")
+        self.interest_result.config(text=f"Interest Amount: {rate}%")
+        self.month_result.config(text=f"Total Interest for {months} months: {summary.total_interest:,} $")
+        self.payment_result.config(text=f"Monthly Payment: {summary.monthly_payment:,} $"
+                                        f" (total repaid {summary.total_paid:,} $)")
+    
+    def show_schedule(self):
+        figures = self.loan_figures()
+        if figures is None:
+            messagebox.showwarning("Validation Error", "Please enter a positive loan amount, interest rate and loan term.")
+            return
+        ScheduleWindow(self, *figures)
+    
+    def submit_data(self):
+        # Get all values
+        name = self.name_entry.get().strip()
+        email = self.email_entry.get().strip()
+        dob = self.dob_entry.get().strip()
+        loan_amount = self.loan_entry.get().strip()
+        interest_rate = self.interest_entry.get().strip()
+        months = self.month_entry.get().strip()
+        
+        # The service validates, prices and stores the application
+        timer = instrumentation.start("gui.submit_data")
+        
+        def succeeded(result):
+            timer.stop()
+            self.submit_succeeded(result)
+        
+        def failed(e):
+            timer.stop(failed=True)
+            self.submit_failed(e)
+        
+        self.controller.run_io(self.controller.service.submit,
+                               name, email, dob, loan_amount, interest_rate, months,
+                               on_success=succeeded, on_error=failed, write=True)
+    
+    def submit_succeeded(self, result):
+        messagebox.showinfo("Application Submitted", "The loan application has been successfully submitted to our database.")
+        
+        # Clear form after successful submission
+        self.clear_fields()
+    
+    def submit_failed(self, e):
+        if isinstance(e, ValidationError):
+            messagebox.showwarning("Validation Error", str(e))
+        elif isinstance(e, DuplicateEmailError):
+            messagebox.showwarning("Duplicate Email", "This email address is already registered in our system.")
+        else:
+            instrumentation.error("gui.submit_data", e)
+            messagebox.showerror("Submission Error", f"An error occurred while saving the application:\n{str(e)}")
+    
+    def clear_fields(self):
+        self.name_entry.delete(0, tk.END)
+        self.email_entry.delete(0, tk.END)
+        self.dob_entry.delete(0, tk.END)
+        self.loan_entry.delete(0, tk.END)
+        self.interest_entry.delete(0, tk.END)
+        self.month_entry.delete(0, tk.END)
+        self.show_results(None)
+        for job in self.validate_jobs.values():
+            self.after_cancel(job)
+        self.validate_jobs.clear()
+        for field in self.entries:
+            self.show_field_message(field, None)
+
+class ScheduleWindow(tk.Toplevel):
+    """Month-by-month repayment schedule for one loan.
+
+    Rows are pulled from the lazy schedule generator a chunk at a time
+    between Tk events, so long terms never freeze the window.
+    """
+    
+    CHUNK_SIZE = 200
+    
+    def __init__(self, parent, amount, rate, months):
+        tk.Toplevel.__init__(self, parent)
+        self.title(f"Repayment Schedule: {amount:,} $ at {rate}% for {months} months")
+        
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        columns = ("Month", "Payment", "Principal", "Interest", "Balance")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=15)
+        for column in columns:
+            self.tree.heading(column, text=column if column == "Month" else f"{column} ($)")
+            self.tree.column(column, width=110, anchor=tk.E)
+        
+        y_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=y_scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        y_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.rows = loans.amortization_schedule(amount, rate, months)
+        self.add_rows()
+    
+    def add_rows(self):
+        chunk = list(itertools.islice(self.rows, self.CHUNK_SIZE))
+        for row in chunk:
+            self.tree.insert("", tk.END, values=tuple(f"{value:,}" for value in row))
+        if len(chunk) == self.CHUNK_SIZE:
+            self.after(1, self.add_rows)
+
+class DatabasePage(ttk.Frame):
+    def __init__(self, parent, controller):
+        ttk.Frame.__init__(self, parent)
+        self.controller = controller
+        
+        # Configure grid weights for centering
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_columnconfigure(2, weight=1)
+        
+        # Main content frame (centered)
+        main_frame = ttk.Frame(self)
+        main_frame.grid(row=1, column=1, sticky="nsew", padx=20, pady=20)
+        
+        # Header
+        header = ttk.Label(main_frame, text="Customer Database", style='Header.TLabel')
+        header.pack(pady=20)
+        
+        # Search Frame; results update as the user types
+        search_frame = ttk.Frame(main_frame)
+        search_frame.pack(pady=5)
+        
+        ttk.Label(search_frame, text="Search Name or Email:").pack(side=tk.LEFT, padx=5)
+        self.search_entry = ttk.Entry(search_frame, width=30)
+        self.search_entry.pack(side=tk.LEFT, padx=5)
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
+        self.search_job = None
+        
+        ttk.Button(search_frame, text="Clear Search",
+                 command=self.clear_search).pack(side=tk.LEFT, padx=5)
+        
+        # Treeview Frame
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
+        
+        # Create Treeview with optimized column widths
+        self.tree = ttk.Treeview(tree_frame, columns=(
+            "Name", "Email", "Date of Birth", "Loan Amount", 
+            "Interest Rate", "Interest", "Term", "Total Interest"
+        ), show="headings")
+        
+        # Configure columns with perfect widths
+        self.tree.heading("Name", text="Name")
+        self.tree.column("Name", width=110, anchor=tk.W) 
+        
+        self.tree.heading("Email", text="Email")
+        self.tree.column("Email", width=120, anchor=tk.W)  
+        
+        self.tree.heading("Date of Birth", text="Date of Birth")
+        self.tree.column("Date of Birth", width=130, anchor=tk.W)  
+        
+        self.tree.heading("Loan Amount", text="Loan Amount ($)")
+        self.tree.column("Loan Amount", width=140, anchor=tk.W)  
+        
+        self.tree.heading("Interest Rate", text="Interest Rate (%)")
+        self.tree.column("Interest Rate", width=140, anchor=tk.W) 
+        
+        self.tree.heading("Interest", text="Monthly Interest ($)")
+        self.tree.column("Interest", width=160, anchor=tk.W) 
+        
+        self.tree.heading("Term", text="Term (Months)")
+        self.tree.column("Term", width=130, anchor=tk.W)  
+        
+        self.tree.heading("Total Interest", text="Total Interest ($)")
+        self.tree.column("Total Interest", width=140, anchor=tk.W) 
+        
+        # Clicking a sortable heading sorts by it; clicking again reverses
+        self.heading_text = {column: self.tree.heading(column, "text") for column in SORT_COLUMNS}
+        for column in SORT_COLUMNS:
+            self.tree.heading(column, command=lambda column=column: self.sort_column(column))
+        self.sort_by = None
+        self.descending = False
+        
+        # Add scrollbars; vertical scrolling also slides the row window
+        self.y_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        x_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll, xscrollcommand=x_scrollbar.set)
+        
+        # Use grid for better layout control
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.y_scrollbar.grid(row=0, column=1, sticky="ns")
+        x_scrollbar.grid(row=1, column=0, sticky="ew")
+        
+        # Configure grid weights
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+        
+        # Position of the first loaded row and the total record count
+        self.window_start = 0
+        self.total_records = 0
+        self.shift_pending = False
+        # Bumped on every full reload so late page fetches are discarded
+        self.generation = 0
+        # Bumped on every load request so an older query cannot overwrite a newer one
+        self.load_token = 0
+        # Search result the window pages through, or None for storage order
+        self.result = None
+        # Pending check for changes made elsewhere, while the page is shown
+        self.poll_job = None
+        self.range_label = ttk.Label(main_frame, text="")
+        self.range_label.pack()
+        
+        # Delete Frame
+        delete_frame = ttk.Frame(main_frame)
+        delete_frame.pack(pady=10)
+        
+        ttk.Label(delete_frame, text="Enter Email to Delete:").pack(side=tk.LEFT, padx=5)
+        self.delete_entry = ttk.Entry(delete_frame, width=30)
+        self.delete_entry.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(delete_frame, text="Delete Record", 
+                 command=self.delete_record).pack(side=tk.LEFT, padx=5)
+        
+        # Back Button
+        ttk.Button(main_frame, text="Back to Application Form", 
+                 command=lambda: controller.show_frame(MainPage)).pack(pady=10)
+    
+    def load_data(self, start=0, keep_view=False):
+        """Load the window of rows from position start in the background.
+
+        With keep_view the Treeview stays scrolled where it was, for
+        refreshes the user did not ask for.
+        """
+        service = self.controller.service
+        text = self.search_entry.get().strip()
+        sort_by, descending = self.sort_by, self.descending
+        self.load_token += 1
+        token = self.load_token
+        limit = PAGE_SIZE * WINDOW_PAGES
+        timer = instrumentation.start("gui.load_data")
+        
+        def fetch():
+            service.sync()
+            if not text and sort_by is None:
+                result, total = None, service.count()
+            else:
+                result = service.query(text, sort_by, descending)
+                total = result.total
+            # Rows may have gone since the window was loaded
+            first = min(start, max(0, total - limit))
+            records = result.page(first, limit) if result is not None else service.list(first, limit)
+            return result, first, total, records
+        
+        def show(loaded):
+            timer.stop()
+            if token != self.load_token:
+                return
+            view = self.tree.yview()[0]
+            self.result = loaded[0]
+            self.show_window(*loaded[1:])
+            if keep_view:
+                self.tree.yview_moveto(view)
+        
+        def failed(e):
+            timer.stop(failed=True)
+            self.controller.show_database_error(e)
+        
+        self.controller.run_io(fetch, on_success=show, on_error=failed)
+        if self.poll_job is None:
+            self.poll_job = self.after(REFRESH_INTERVAL, self.poll_changes)
+    
+    def poll_changes(self):
+        """Refresh the rows in view when another process changed the records.
+
+        Checking costs a stat call or two, so it runs every
+        REFRESH_INTERVAL milliseconds for as long as the page is shown.
+        """
+        if self.controller.current_frame is not self:
+            self.poll_job = None
+            return
+        
+        def schedule_next(changed):
+            if changed:
+                self.load_data(self.window_start, keep_view=True)
+            self.poll_job = self.after(REFRESH_INTERVAL, self.poll_changes)
+        
+        # A failed check is retried on the next tick rather than reported
+        self.controller.run_io(self.controller.service.sync, on_success=schedule_next,
+                               on_error=lambda e: schedule_next(False), quiet=True)
+    
+    def fetch_page(self, offset, limit):
+        """Load rows for the window from the current search, or from storage"""
+        if self.result is not None:
+            return self.result.page(offset, limit)
+        return self.controller.service.list(offset, limit)
+    
+    def on_search_key(self, event=None):
+        """Search once the user pauses typing"""
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DELAY, self.run_search)
+    
+    def run_search(self):
+        self.search_job = None
+        self.load_data()
+    
+    def clear_search(self):
+        self.search_entry.delete(0, tk.END)
+        self.run_search()
+    
+    def sort_column(self, column):
+        field = SORT_COLUMNS[column]
+        if self.sort_by == field:
+            self.descending = not self.descending
+        else:
+            self.sort_by, self.descending = field, False
+        
+        for name, text in self.heading_text.items():
+            if SORT_COLUMNS[name] == self.sort_by:
+                text += " \u25bc" if self.descending else " \u25b2"
+            self.tree.heading(name, text=text)
+        self.load_data()
+    
+    def record_values(self, record):
+        """Format a LoanRecord for display; storage only keeps raw numbers"""
+        return record.display_values()
+    
+    def show_window(self, start, total, records):
+        """Replace the Treeview contents with records loaded from position start"""
+        with instrumentation.timed("gui.show_window"):
+            items = self.tree.get_children()
+            if items:
+                self.tree.delete(*items)
+            
+            self.generation += 1
+            self.window_start = start
+            self.total_records = total
+            for record in records:
+                self.tree.insert("", tk.END, values=self.record_values(record))
+            self.update_range_label()
+    
+    def update_range_label(self):
+        loaded = len(self.tree.get_children())
+        if loaded == 0:
+            self.range_label.config(text="No matching records" if self.result is not None else "No records")
+            return
+        self.range_label.config(text=f"Showing records {self.window_start + 1:,}-"
+                                     f"{self.window_start + loaded:,} of {self.total_records:,}")
+    
+    def on_tree_scroll(self, first, last):
+        """Slide the row window when the user scrolls to either end"""
+        self.y_scrollbar.set(first, last)
+        if self.shift_pending:
+            return
+        
+        window_end = self.window_start + len(self.tree.get_children())
+        if float(last) >= 1.0 and window_end < self.total_records:
+            direction = 1
+        elif float(first) <= 0.0 and self.window_start > 0:
+            direction = -1
+        else:
+            return
+        self.shift_pending = True
+        self.after_idle(self.shift_window, direction)
+    
+    def shift_window(self, direction):
+        """Fetch one more page in the scroll direction"""
+        self.shift_pending = True
+        loaded = len(self.tree.get_children())
+        if direction > 0:
+            offset, limit = self.window_start + loaded, PAGE_SIZE
+        else:
+            offset = max(0, self.window_start - PAGE_SIZE)
+            limit = self.window_start - offset
+        
+        generation = self.generation
+        
+        def apply(records):
+            if generation == self.generation:
+                self.apply_shift(direction, records)
+            self.shift_pending = False
+        
+        def fail(e):
+            self.shift_pending = False
+            self.controller.show_database_error(e)
+        
+        self.controller.run_io(self.fetch_page, offset, limit,
+                               on_success=apply, on_error=fail)
+    
+    def apply_shift(self, direction, records):
+        """Add fetched rows at one end of the window, trimming the other back to its size"""
+        if not records:
+            return
+        items = self.tree.get_children()
+        overflow = window_overflow(len(items), len(records))
+        if direction > 0:
+            anchor = items[-1] if items else None
+            for record in records:
+                self.tree.insert("", tk.END, values=self.record_values(record))
+            if overflow:
+                self.tree.delete(*items[:overflow])
+            self.window_start += overflow
+            if anchor is not None:
+                self.tree.see(anchor)
+        else:
+            for index, record in enumerate(records):
+                self.tree.insert("", index, values=self.record_values(record))
+            if overflow:
+                self.tree.delete(*items[-overflow:])
+            self.window_start -= len(records)
+            self.tree.yview_moveto(len(records) / len(self.tree.get_children()))
+        self.update_range_label()
+    
+    def delete_record(self):
+        email = self.delete_entry.get().strip()
+        if not email:
+            messagebox.showwarning("Input Required", "Please enter the email address of the record you wish to delete.")
+            return
+        
+        if not self.controller.validate_email(email):
+            messagebox.showwarning("Invalid Email", "Please enter a valid email address.")
+            return
+        
+        # Confirm deletion
+        if not messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete the record for {email}?"):
+            return
+        
+        timer = instrumentation.start("gui.delete_record")
+        
+        def finished(result):
+            timer.stop()
+            self.delete_finished()
+        
+        def failed(e):
+            timer.stop(failed=True)
+            self.delete_failed(e)
+        
+        self.controller.run_io(self.controller.service.delete, email,
+                               on_success=finished, on_error=failed, write=True)
+    
+    def delete_finished(self):
+        messagebox.showinfo("Deletion Successful", "The record has been successfully removed from the database.")
+        self.load_data()  # Refresh the view
+        self.delete_entry.delete(0, tk.END)
+    
+    def delete_failed(self, e):
+        if isinstance(e, RecordNotFoundError):
+            messagebox.showinfo("Not Found", str(e))
+            return
+        instrumentation.error("gui.delete_record", e)
+        messagebox.showerror("Deletion Error", f"An error occurred while deleting the record:\n{str(e)}")
+
+class ReportsPage(ttk.Frame):
+    """Portfolio totals and exposure per term bucket and age band.
+
+    The service keeps the totals current as records come and go, so the
+    page opens without reading the database. Recalculate rebuilds them
+    from storage in chunks, with a progress bar.
+    """
+    
+    GROUP_COLUMNS = ("Group", "Loans", "Principal ($)", "Expected Interest ($)", "Share")
+    
+    def __init__(self, parent, controller):
+        ttk.Frame.__init__(self, parent)
+        self.controller = controller
+        
+        # Configure grid weights for centering
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_columnconfigure(2, weight=1)
+        
+        main_frame = ttk.Frame(self)
+        main_frame.grid(row=1, column=1, sticky="nsew", padx=20, pady=20)
+        
+        header = ttk.Label(main_frame, text="Portfolio Report", style='Header.TLabel')
+        header.pack(pady=20)
+        
+        summary_frame = ttk.LabelFrame(main_frame, text="Summary", padding=10)
+        summary_frame.pack(pady=5, padx=20, fill=tk.X)
+        self.summary_labels = {}
+        for key, text in (("count", "Loans"), ("principal", "Outstanding Principal"),
+                          ("interest", "Total Expected Interest"), ("rate", "Average Interest Rate")):
+            row = len(self.summary_labels)
+            ttk.Label(summary_frame, text=f"{text}:").grid(row=row, column=0, sticky=tk.W, pady=2)
+            self.summary_labels[key] = ttk.Label(summary_frame, text="")
+            self.summary_labels[key].grid(row=row, column=1, sticky=tk.W, padx=10, pady=2)
+        
+        self.trees = {}
+        for key, text in (("terms", "Exposure by Loan Term"), ("ages", "Exposure by Age")):
+            group_frame = ttk.LabelFrame(main_frame, text=text, padding=10)
+            group_frame.pack(pady=5, padx=20, fill=tk.BOTH, expand=True)
+            tree = ttk.Treeview(group_frame, columns=self.GROUP_COLUMNS, show="headings", height=6)
+            for column in self.GROUP_COLUMNS:
+                tree.heading(column, text=column)
+                tree.column(column, width=150 if column == "Group" else 130,
+                            anchor=tk.W if column == "Group" else tk.E)
+            tree.pack(fill=tk.BOTH, expand=True)
+            self.trees[key] = tree
+        
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(pady=5, fill=tk.X, padx=20)
+        self.progress = ttk.Progressbar(progress_frame, mode="determinate")
+        self.progress.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress_label = ttk.Label(progress_frame, text="", width=24)
+        self.progress_label.pack(side=tk.LEFT, padx=5)
+        # (records read, total) written by the worker, read by the Tk thread
+        self.recompute_progress = None
+        
+        buttons_frame = ttk.Frame(main_frame)
+        buttons_frame.pack(pady=10)
+        self.recompute_button = ttk.Button(buttons_frame, text="Recalculate",
+                                           command=self.recompute)
+        self.recompute_button.pack(side=tk.LEFT, padx=10)
+        ttk.Button(buttons_frame, text="Back to Application Form", 
+                 command=lambda: controller.show_frame(MainPage)).pack(side=tk.LEFT, padx=10)
+        
+        # Pending check for changes made elsewhere, while the page is shown
+        self.poll_job = None
+    
+    def load_data(self):
+        """Show the running totals, first catching up with other processes"""
+        service = self.controller.service
+        timer = instrumentation.start("gui.load_report")
+        
+        def fetch():
+            service.sync()
+            return service.report()
+        
+        def show(report):
+            timer.stop()
+            self.show_report(report)
+        
+        def failed(e):
+            timer.stop(failed=True)
+            self.controller.show_database_error(e)
+        
+        self.controller.run_io(fetch, on_success=show, on_error=failed)
+        if self.poll_job is None:
+            self.poll_job = self.after(REFRESH_INTERVAL, self.poll_changes)
+    
+    def poll_changes(self):
+        """Refresh the figures when another process changed the records"""
+        if self.controller.current_frame is not self:
+            self.poll_job = None
+            return
+        
+        def schedule_next(changed):
+            if changed:
+                self.controller.run_io(self.controller.service.report, on_success=self.show_report)
+            self.poll_job = self.after(REFRESH_INTERVAL, self.poll_changes)
+        
+        self.controller.run_io(self.controller.service.sync, on_success=schedule_next,
+                               on_error=lambda e: schedule_next(False), quiet=True)
+    
+    def show_report(self, report):
+        labels = self.summary_labels
+        labels["count"].config(text=f"{report['count']:,}")
+        labels["principal"].config(text=format_money(report["principal_cents"]))
+        labels["interest"].config(text=format_money(report["interest_cents"]))
+        labels["rate"].config(text=f"{report['average_rate']}% "
+                                   f"({report['weighted_rate']}% weighted by principal)")
+        for key, tree in self.trees.items():
+            tree.delete(*tree.get_children())
+            for group in report[key]:
+                tree.insert("", tk.END, values=(
+                    group["label"], f"{group['count']:,}", format_money(group["principal_cents"]),
+                    format_money(group["interest_cents"]), f"{group['share']:.1%}"
+                ))
+    
+    def recompute(self):
+        """Rebuild the totals from storage in the background"""
+        self.recompute_button.state(["disabled"])
+        self.recompute_progress = (0, 0)
+        timer = instrumentation.start("gui.recompute_report")
+        
+        def progress(read, total):
+            self.recompute_progress = (read, total)
+        
+        def finished(report):
+            timer.stop()
+            self.recompute_done()
+            self.show_report(report)
+        
+        def failed(e):
+            timer.stop(failed=True)
+            self.recompute_done()
+            self.controller.show_database_error(e)
+        
+        self.controller.run_io(self.controller.service.recompute_portfolio, RECOMPUTE_CHUNK, progress,
+                               on_success=finished, on_error=failed)
+        self.show_progress()
+    
+    def show_progress(self):
+        if self.recompute_progress is None:
+            return
+        read, total = self.recompute_progress
+        self.progress.config(maximum=max(total, 1), value=read)
+        self.progress_label.config(text=f"{read:,} of {total:,} records")
+        self.after(PROGRESS_INTERVAL, self.show_progress)
+    
+    def recompute_done(self):
+        self.recompute_progress = None
+        self.progress.config(value=0)
+        self.progress_label.config(text="")
+        self.recompute_button.state(["!disabled"])
+
+class DiagnosticsWindow(tk.Toplevel):
+    """Live timings, counters and recent errors from the instrumentation layer.
+
+    Opened with F12. Figures refresh every REFRESH_INTERVAL milliseconds
+    while the window is open.
+    """
+    
+    COLUMNS = ("Operation", "Calls", "Errors", "Mean (ms)", "p95 (ms)", "Max (ms)")
+    
+    def __init__(self, parent):
+        tk.Toplevel.__init__(self, parent)
+        self.title("Diagnostics")
+        
+        controls = ttk.Frame(self)
+        controls.pack(fill=tk.X, padx=10, pady=5)
+        self.recording = tk.BooleanVar(value=instrumentation.enabled)
+        ttk.Checkbutton(controls, text="Record timings", variable=self.recording,
+                        command=self.toggle_recording).pack(side=tk.LEFT)
+        ttk.Button(controls, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Export...", command=self.export).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Save Profiles...", command=self.save_profiles).pack(side=tk.LEFT, padx=5)
+        
+        self.tree = ttk.Treeview(self, columns=self.COLUMNS, show="headings", height=12)
+        for column in self.COLUMNS:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=200 if column == "Operation" else 80,
+                             anchor=tk.W if column == "Operation" else tk.E)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        self.counters_label = ttk.Label(self, text="", justify=tk.LEFT)
+        self.counters_label.pack(fill=tk.X, padx=10, pady=5)
+        
+        ttk.Label(self, text="Recent errors:").pack(anchor=tk.W, padx=10)
+        self.errors = tk.Listbox(self, height=5)
+        self.errors.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        self.refresh_job = None
+        self.refresh()
+    
+    def destroy(self):
+        # A refresh left pending would fire against the destroyed widgets
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        tk.Toplevel.destroy(self)
+    
+    def toggle_recording(self):
+        instrumentation.configure(self.recording.get(), instrumentation.profile)
+    
+    def reset(self):
+        instrumentation.reset()
+        self.refresh(schedule=False)
+    
+    def refresh(self, schedule=True):
+        snapshot = instrumentation.snapshot()
+        self.tree.delete(*self.tree.get_children())
+        for name, figures in snapshot["operations"].items():
+            self.tree.insert("", tk.END, values=(
+                name, figures["count"], figures["errors"],
+                figures["mean_ms"], figures["p95_ms"], figures["max_ms"]
+            ))
+        self.counters_label.config(text="  ".join(
+            f"{name}: {value:,}" for name, value in snapshot["counters"].items()))
+        self.errors.delete(0, tk.END)
+        for when, name, message in reversed(instrumentation.recent_errors):
+            self.errors.insert(tk.END, f"{when}  {name}: {message}")
+        if schedule:
+            self.refresh_job = self.after(REFRESH_INTERVAL, self.refresh)
+    
+    def export(self):
+        path = filedialog.asksaveasfilename(
+            parent=self, defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("Prometheus text", "*.prom")])
+        if path:
+            instrumentation.export(path)
+    
+    def save_profiles(self):
+        if not instrumentation.profile:
+            messagebox.showinfo("No Profiles", "Start the application with --profile cprofile or "
+                                "--profile tracemalloc to record profiles.", parent=self)
+            return
+        directory = filedialog.askdirectory(parent=self)
+        if directory:
+            paths = instrumentation.dump_profiles(directory)
+            messagebox.showinfo("Profiles Saved", f"Saved {len(paths)} files to {directory}.", parent=self)
@@ -0,0 +1,160 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+
+try:
+    from . import loans
+    from .storage import REQUIRED_COLUMNS, map_header, open_repository
+    from .validation import FIELDS, validate_batch
+except ImportError:  # running as a script: python src/importer.py
+    import loans
+    from storage import REQUIRED_COLUMNS, map_header, open_repository
+    from validation import FIELDS, validate_batch
+
+# The database column each field is read from. Input keys are matched to
+# columns by storage.map_header, so imports accept every spelling the
+# database file itself does.
+FIELD_COLUMNS = dict(zip(FIELDS, REQUIRED_COLUMNS))
+
+REJECT_FIELDS = ["Line", "Reason"] + list(FIELDS)
+
+DUPLICATE_REASON = "This email address is already registered in our system."
+
+class ImportResult:
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+
+    def __repr__(self):
+        return f"ImportResult(accepted={self.accepted}, rejected={self.rejected})"
+
+def normalize_row(row):
+    """Map an input row onto FIELDS, stripping values and unit suffixes"""
+    keys = [key for key in row if key is not None]
+    lookup = {}
+    for key, column in zip(keys, map_header([str(key) for key in keys])):
+        if column is not None:
+            lookup.setdefault(column, row[key])
+    fields = {}
+    for field, column in FIELD_COLUMNS.items():
+        value = lookup.get(column)
+        value = "" if value is None else str(value).strip()
+        if field in ("loan_amount", "interest_rate", "months"):
+            # Accept the formatted values database.csv itself stores
+            value = value.rstrip("$%").replace("months", "").strip()
+        fields[field] = value
+    return fields
+
+def iter_rows(path, file_format=None):
+    """Yield (line number, row dict) from a CSV or JSON Lines file, one at a time"""
+    file_format = file_format or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, "r", newline="") as file:
+        if file_format == "jsonl":
+            for number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield number, {"__error__": f"Invalid JSON: {e}"}
+                    continue
+                if not isinstance(row, dict):
+                    row = {"__error__": "Expected a JSON object"}
+                yield number, row
+        else:
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+
+def import_file(path, repository, rejects_path=None, batch_size=1000, file_format=None):
+    """Stream an applications file into the repository.
+
+    Every row goes through the same rules as the application form,
+    checked batch_size rows per call. Valid rows are written in batches
+    of batch_size; invalid or duplicate rows are written to rejects_path,
+    when given, with the reason. Only one batch is held in memory at a
+    time, whatever the size of the input.
+    """
+    result = ImportResult()
+    batch = []
+    batch_emails = set()
+    sources = {}  # id of each batched record: its line number and fields
+
+    def reject(number, fields, reason):
+        result.rejected += 1
+        if rejects:
+            rejects.writerow(dict(fields, Line=number, Reason=reason))
+
+    def flush():
+        # Another writer may have stored an email since it was checked
+        skipped = []
+        result.accepted += repository.append_many(batch, skipped)
+        for record in skipped:
+            reject(*sources[id(record)], DUPLICATE_REASON)
+        batch.clear()
+        batch_emails.clear()
+        sources.clear()
+
+    rejects_file = open(rejects_path, "w", newline="") if rejects_path else None
+    try:
+        rejects = csv.DictWriter(rejects_file, fieldnames=REJECT_FIELDS) if rejects_file else None
+        if rejects:
+            rejects.writeheader()
+
+        rows = iter_rows(path, file_format)
+        while True:
+            chunk = [(number, row, normalize_row(row)) for number, row in itertools.islice(rows, batch_size)]
+            if not chunk:
+                break
+            errors = validate_batch([fields for _, _, fields in chunk])
+            for (number, row, fields), problems in zip(chunk, errors):
+                reason = row.get("__error__") or next(iter(problems.values()), None)
+                email = fields["email"].lower()
+                if reason is None and (email in batch_emails or repository.email_exists(email)):
+                    reason = DUPLICATE_REASON
+
+                if reason:
+                    reject(number, fields, reason)
+                    continue
+
+                record = loans.build_record(
+                    fields["name"], fields["email"], fields["dob"],
+                    int(fields["loan_amount"]), int(fields["interest_rate"]), int(fields["months"])
+                )
+                batch.append(record)
+                batch_emails.add(email)
+                sources[id(record)] = (number, fields)
+                if len(batch) >= batch_size:
+                    flush()
+        if batch:
+            flush()
+    finally:
+        if rejects_file:
+            rejects_file.close()
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import loan applications")
+    parser.add_argument("input", help="CSV or JSON Lines file of applications")
+    parser.add_argument("--rejects", help="where to write rejected rows (default: <input>.rejects.csv)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], dest="file_format")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--storage", help="storage backend (default: $BANK_STORAGE or csv)")
+    parser.add_argument("--database", help="database path (default: $BANK_DATABASE)")
+    args = parser.parse_args(argv)
+
+    rejects_path = args.rejects or os.path.splitext(args.input)[0] + ".rejects.csv"
+    repository = open_repository(args.storage, args.database)
+    try:
+        repository.initialize()
+        result = import_file(args.input, repository, rejects_path,
+                             args.batch_size, args.file_format)
+    finally:
+        repository.close()
+    print(f"Imported {result.accepted} applications, rejected {result.rejected} (see {rejects_path})")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
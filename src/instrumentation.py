@@ -0,0 +1,396 @@
+import argparse
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger("bank_system")
+
+# Kinds of per-operation profile that can be recorded on top of timings
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class OperationStats:
+    """Call count, error count and timings of one named operation.
+
+    Totals cover every call. Percentiles come from the most recent window
+    calls, so memory stays bounded however long the process runs.
+    """
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds, failed=False):
+        self.count += 1
+        self.errors += failed
+        self.total += seconds
+        self.slowest = max(self.slowest, seconds)
+        self.recent.append(seconds)
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_seconds": round(self.total, 6),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(percentile(recent, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(recent, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(recent, 0.99) * 1000, 3),
+            "max_ms": round(self.slowest * 1000, 3),
+        }
+
+class Timer:
+    """A running measurement, for work that finishes in a later callback"""
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.started = time.perf_counter()
+        self.stopped = False
+
+    def stop(self, failed=False):
+        if not self.stopped:
+            self.stopped = True
+            self.instrumentation.record(self.name, time.perf_counter() - self.started, failed)
+
+class _NotStarted:
+    __slots__ = ()
+
+    def stop(self, failed=False):
+        pass
+
+_NOT_STARTED = _NotStarted()
+
+class Instrumentation:
+    """Timers and counters for the storage, service and GUI hot paths.
+
+    Disabled by default, in which case every hook returns at once. With
+    profile modes on, the outermost timed operation of each thread is
+    also run under cProfile, and/or its tracemalloc peak is recorded
+    along with a snapshot taken after the call that set it.
+    """
+
+    def __init__(self, enabled=False, profile=()):
+        self.enabled = False
+        self.profile = frozenset()
+        self.recent_errors = deque(maxlen=50)
+        self._started_tracing = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+        self.configure(enabled, profile)
+
+    @classmethod
+    def from_environment(cls):
+        """Configure from the environment.
+
+        BANK_METRICS=1 turns recording on. BANK_PROFILE lists PROFILE_MODES,
+        comma-separated. BANK_METRICS_FILE and BANK_PROFILE_DIR name where
+        the figures and profiles are written when the process exits; each
+        also turns recording on.
+        """
+        profile = [mode.strip() for mode in os.environ.get("BANK_PROFILE", "").split(",") if mode.strip()]
+        metrics_file = os.environ.get("BANK_METRICS_FILE")
+        profile_dir = os.environ.get("BANK_PROFILE_DIR")
+        enabled = os.environ.get("BANK_METRICS", "").lower() in ("1", "true", "yes", "on")
+        instance = cls(enabled or bool(profile or metrics_file or profile_dir), profile)
+        if metrics_file:
+            atexit.register(instance.export, metrics_file)
+        if profile_dir:
+            atexit.register(instance.dump_profiles, profile_dir)
+        return instance
+
+    def configure(self, enabled=True, profile=()):
+        unknown = set(profile) - set(PROFILE_MODES)
+        if unknown:
+            raise ValueError(f"Unknown profile mode: {', '.join(sorted(unknown))}")
+        self.enabled = enabled
+        self.profile = frozenset(profile) if enabled else frozenset()
+        # The profilers are imported only once asked for, keeping them
+        # out of every program's start-up
+        if "tracemalloc" in self.profile:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+        elif self._started_tracing:
+            import tracemalloc
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self):
+        with self._lock:
+            self.operations = {}
+            self.counters = Counter()
+            self.profiles = {}
+            self.memory_peaks = {}
+            self.memory_snapshots = {}
+            self.started = time.time()
+
+    def record(self, name, seconds, failed=False):
+        with self._lock:
+            stats = self.operations.get(name)
+            if stats is None:
+                stats = self.operations[name] = OperationStats()
+            stats.record(seconds, failed)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += amount
+
+    def start(self, name):
+        """Return a Timer to stop later; while disabled, one that records nothing"""
+        return Timer(self, name) if self.enabled else _NOT_STARTED
+
+    def error(self, name, error):
+        """Log a failure shown to the user and keep it for the diagnostics panel.
+
+        Errors are kept even while recording is off, since they are rare
+        and otherwise only ever appear in a dialog.
+        """
+        logger.error("%s failed: %s", name, error, exc_info=error)
+        with self._lock:
+            self.recent_errors.append((time.strftime("%H:%M:%S"), name, str(error)))
+
+    def timed(self, name):
+        """Context manager timing the block as one call of operation name"""
+        if not self.enabled:
+            return _NOT_TIMED
+        return _Timed(self, name)
+
+    def _profile_start(self, name):
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        if depth or not self.profile:
+            return None
+        profiler = None
+        if "cprofile" in self.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another thread's profile is running
+                profiler = None
+        memory = None
+        if "tracemalloc" in self.profile:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+                memory = tracemalloc.get_traced_memory()[0]
+        return profiler, memory
+
+    def _profile_stop(self, name, started):
+        self._local.depth -= 1
+        if started is None:
+            return
+        profiler, memory = started
+        if profiler is not None:
+            import pstats
+            profiler.disable()
+            with self._lock:
+                if name in self.profiles:
+                    self.profiles[name].add(profiler)
+                else:
+                    self.profiles[name] = pstats.Stats(profiler)
+        if memory is not None:
+            import tracemalloc
+            peak = tracemalloc.get_traced_memory()[1] - memory
+            if peak > self.memory_peaks.get(name, -1):
+                snapshot = tracemalloc.take_snapshot()
+                with self._lock:
+                    self.memory_peaks[name] = peak
+                    self.memory_snapshots[name] = snapshot
+
+    def snapshot(self):
+        """Every figure as plain data, ready for JSON"""
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 3),
+                "operations": {name: stats.snapshot() for name, stats in sorted(self.operations.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "memory_peaks_kib": {name: round(peak / 1024, 1)
+                                     for name, peak in sorted(self.memory_peaks.items())},
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """Every figure in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP bank_operation_seconds Time spent in each instrumented operation.",
+            "# TYPE bank_operation_seconds summary",
+        ]
+        for name, figures in snapshot["operations"].items():
+            label = f'operation="{name}"'
+            for quantile in ("0.5", "0.95", "0.99"):
+                key = "p" + quantile[2:].ljust(2, "0") + "_ms"
+                lines.append(f'bank_operation_seconds{{{label},quantile="{quantile}"}} '
+                             f"{figures[key] / 1000}")
+            lines.append(f"bank_operation_seconds_sum{{{label}}} {figures['total_seconds']}")
+            lines.append(f"bank_operation_seconds_count{{{label}}} {figures['count']}")
+        lines += [
+            "# HELP bank_operation_errors_total Instrumented operations that raised.",
+            "# TYPE bank_operation_errors_total counter",
+        ]
+        for name, figures in snapshot["operations"].items():
+            lines.append(f'bank_operation_errors_total{{operation="{name}"}} {figures["errors"]}')
+        lines += [
+            "# HELP bank_events_total Counted events, such as rows parsed.",
+            "# TYPE bank_events_total counter",
+        ]
+        for name, value in snapshot["counters"].items():
+            lines.append(f'bank_events_total{{event="{name}"}} {value}')
+        if snapshot["memory_peaks_kib"]:
+            lines += [
+                "# HELP bank_operation_memory_peak_bytes Largest tracemalloc peak of one call.",
+                "# TYPE bank_operation_memory_peak_bytes gauge",
+            ]
+            for name, peak in snapshot["memory_peaks_kib"].items():
+                lines.append(f'bank_operation_memory_peak_bytes{{operation="{name}"}} {int(peak * 1024)}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write the figures to path; a .prom or .txt file gets Prometheus text, anything else JSON"""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w") as file:
+            file.write(text)
+
+    def dump_profiles(self, directory):
+        """Write <operation>.prof and <operation>.tracemalloc files, returning their paths"""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            profiles = dict(self.profiles)
+            snapshots = dict(self.memory_snapshots)
+        paths = []
+        for name, stats in profiles.items():
+            paths.append(os.path.join(directory, f"{name}.prof"))
+            stats.dump_stats(paths[-1])
+        for name, snapshot in snapshots.items():
+            paths.append(os.path.join(directory, f"{name}.tracemalloc"))
+            snapshot.dump(paths[-1])
+        return paths
+
+class _Timed:
+    __slots__ = ("instrumentation", "name", "started", "profiling")
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.profiling = self.instrumentation._profile_start(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        seconds = time.perf_counter() - self.started
+        self.instrumentation._profile_stop(self.name, self.profiling)
+        # A generator closed by a consumer that stopped early did not fail
+        failed = error_type is not None and not issubclass(error_type, GeneratorExit)
+        self.instrumentation.record(self.name, seconds, failed)
+        if failed:
+            logger.debug("%s failed after %.3f ms: %s", self.name, seconds * 1000, error)
+
+class _NotTimed:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NOT_TIMED = _NotTimed()
+
+# The process-wide instance every module reports to
+instrumentation = Instrumentation.from_environment()
+
+def instrumented(name):
+    """Decorator timing every call of a function as operation name.
+
+    For generator functions only the steps that produce an item are
+    timed and added up into one call, so whatever the consumer does
+    between items is left out; the items yielded are counted as
+    "<name>.items". Generators are not profiled, since their work is
+    spread across the consumer's.
+    """
+    def decorate(function):
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator(*args, **kwargs):
+                if not instrumentation.enabled:
+                    yield from function(*args, **kwargs)
+                    return
+                items = 0
+                seconds = 0.0
+                failed = False
+                iterator = function(*args, **kwargs)
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            return
+                        except BaseException:
+                            failed = True
+                            raise
+                        finally:
+                            seconds += time.perf_counter() - started
+                        items += 1
+                        yield item
+                finally:
+                    # A consumer that stopped early closes us; pass it on
+                    iterator.close()
+                    instrumentation.record(name, seconds, failed)
+                    instrumentation.count(name + ".items", items)
+            return generator
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return function(*args, **kwargs)
+            with instrumentation.timed(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a metrics file written with BANK_METRICS_FILE")
+    parser.add_argument("path", help="JSON metrics file")
+    parser.add_argument("--sort", default="total_seconds",
+                        choices=["count", "errors", "total_seconds", "mean_ms", "p95_ms", "max_ms"])
+    args = parser.parse_args(argv)
+
+    with open(args.path) as file:
+        snapshot = json.load(file)
+    operations = sorted(snapshot["operations"].items(), key=lambda item: item[1][args.sort], reverse=True)
+    print(f"{'operation':<32} {'count':>8} {'errors':>7} {'mean ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for name, figures in operations:
+        print(f"{name:<32} {figures['count']:>8} {figures['errors']:>7} {figures['mean_ms']:>10} "
+              f"{figures['p95_ms']:>10} {figures['max_ms']:>10}")
+    for name, value in snapshot["counters"].items():
+        print(f"{name:<32} {value:>8}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,161 @@
+import argparse
+import csv
+import functools
+import sys
+from array import array
+from collections import namedtuple
+
+# NumPy is optional and slow to import, so it is only loaded by the first
+# batch calculation; None means it is not installed
+_NOT_LOADED = object()
+numpy = _NOT_LOADED
+
+def load_numpy():
+    global numpy
+    if numpy is _NOT_LOADED:
+        try:
+            import numpy as module
+        except ImportError:  # the batch API falls back to array
+            module = None
+        numpy = module
+    return numpy
+
+try:
+    from .records import LoanRecord
+except ImportError:  # running as a script: python src/loans.py
+    from records import LoanRecord
+
+def calculate_interest(amount, rate):
+    return int(amount / 100 * rate)
+
+def calculate_monthly_interest(interest_amount, months):
+    return interest_amount * months
+
+# One month of a repayment schedule. Interest is charged at the flat
+# monthly figure from calculate_interest, so the schedule's interest adds
+# up to calculate_monthly_interest. Principal is repaid evenly, with any
+# remainder in the final month.
+ScheduleRow = namedtuple("ScheduleRow", "month payment principal interest balance")
+ScheduleSummary = namedtuple("ScheduleSummary", "monthly_payment final_payment total_interest total_paid")
+
+SCHEDULE_FIELDS = ["Email", "Month", "Payment", "Principal", "Interest", "Balance"]
+
+def amortization_schedule(amount, rate, months):
+    """Yield a ScheduleRow for each month of the loan, one at a time"""
+    interest = calculate_interest(amount, rate)
+    principal, remainder = divmod(amount, months)
+    balance = amount
+    for month in range(1, months + 1):
+        if month == months:
+            principal += remainder
+        balance -= principal
+        yield ScheduleRow(month, principal + interest, principal, interest, balance)
+
+@functools.lru_cache(maxsize=1024)
+def amortization_summary(amount, rate, months):
+    """Totals of amortization_schedule in closed form, without walking it"""
+    interest = calculate_interest(amount, rate)
+    total_interest = calculate_monthly_interest(interest, months)
+    principal, remainder = divmod(amount, months)
+    return ScheduleSummary(
+        monthly_payment=principal + interest,
+        final_payment=principal + remainder + interest,
+        total_interest=total_interest,
+        total_paid=amount + total_interest
+    )
+
+def write_schedules(file, records):
+    """Stream the schedule of every stored record to file as CSV.
+
+    Rows are written as they are generated, so neither the portfolio nor
+    any single schedule is held in memory. Records without a term are
+    skipped. Returns the number of rows written.
+    """
+    writer = csv.writer(file)
+    writer.writerow(SCHEDULE_FIELDS)
+    written = 0
+    for record in records:
+        if record.months <= 0:
+            continue
+        for row in amortization_schedule(record.loan_amount, record.rate, record.months):
+            writer.writerow((record.email,) + tuple(row))
+            written += 1
+    return written
+
+def calculate_interest_batch(amounts, rates, months):
+    """Price whole columns of loans in one pass.
+
+    Takes equal-length sequences (lists, array buffers or NumPy arrays)
+    of loan amounts, rates and terms and returns the interest and total
+    interest columns. Each element equals what calculate_interest and
+    calculate_monthly_interest return for it, truncation included. The
+    result is a pair of int64 NumPy arrays when NumPy is installed and a
+    pair of array('q') buffers otherwise.
+    """
+    numpy = load_numpy()
+    if numpy is not None:
+        amounts = numpy.asarray(amounts, dtype=numpy.float64)
+        rates = numpy.asarray(rates, dtype=numpy.float64)
+        months = numpy.asarray(months, dtype=numpy.int64)
+        # Same float operations as the scalar path; astype truncates like int()
+        interest = (amounts / 100 * rates).astype(numpy.int64)
+        return interest, interest * months
+
+    interest = array("q", [int(amount / 100 * rate) for amount, rate in zip(amounts, rates)])
+    totals = array("q", [value * term for value, term in zip(interest, months)])
+    return interest, totals
+
+def build_record(name, email, dob, loan_amount, interest_rate, months):
+    """Compute the interest figures and return the LoanRecord to store"""
+    interest_money = calculate_interest(loan_amount, interest_rate)
+    monthly_interest = calculate_monthly_interest(interest_money, months)
+    return LoanRecord(
+        name=name.title(),
+        email=email.lower(),
+        dob=dob,
+        loan_cents=loan_amount * 100,
+        rate=interest_rate,
+        months=months,
+        interest_cents=interest_money * 100,
+        total_interest_cents=monthly_interest * 100
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Loan calculations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    schedule = subparsers.add_parser(
+        "schedule", help="write amortization schedules as CSV, for one loan or every stored loan"
+    )
+    schedule.add_argument("loan", nargs="*", type=int, metavar="AMOUNT RATE MONTHS")
+    schedule.add_argument("--output", help="CSV file to write (default: standard output)")
+    schedule.add_argument("--storage", help="storage backend (default: $BANK_STORAGE or csv)")
+    schedule.add_argument("--database", help="database path (default: $BANK_DATABASE)")
+    args = parser.parse_args(argv)
+
+    if args.loan and (len(args.loan) != 3 or min(args.loan) <= 0):
+        parser.error("give a positive loan amount, interest rate and number of months")
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.loan:
+            amount, rate, months = args.loan
+            writer = csv.writer(output)
+            writer.writerow(SCHEDULE_FIELDS[1:])
+            writer.writerows(amortization_schedule(amount, rate, months))
+        else:
+            try:
+                from .storage import open_repository
+            except ImportError:  # running as a script: python src/loans.py
+                from storage import open_repository
+            repository = open_repository(args.storage, args.database)
+            try:
+                write_schedules(output, repository.iter_records())
+            finally:
+                repository.close()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+
+FIELDNAMES = [
+    "Name", "Email", "Date of Birth", "Loan amount",
+    "Interest amount", "Interest money", "Month",
+    "Interest money per month"
+]
+
+def parse_money(value):
+    """Convert a stored amount in dollars to integer cents.
+
+    Accepts raw numbers ("5000", "5000.25") as well as the formatted
+    strings older versions wrote ("5000 $", "1,250 $"). Empty values read
+    as zero.
+    """
+    text = str(value if value is not None else "").replace(",", "").rstrip(" $").strip()
+    if not text:
+        return 0
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Not an amount: {value!r}")
+    if not amount.is_finite():  # "inf" and "nan" parse, but have no cents
+        raise ValueError(f"Not an amount: {value!r}")
+    return int(amount * 100)
+
+def parse_whole(value):
+    """Convert a stored rate or term ("10", "10 %", "12 months") to an int"""
+    text = str(value if value is not None else "").rstrip(" %months").strip()
+    if not text:
+        return 0
+    return int(text)
+
+def money_text(cents):
+    """Raw storage form of an amount: whole dollars, or dollars and cents"""
+    dollars, remainder = divmod(cents, 100)
+    return str(dollars) if not remainder else f"{dollars}.{remainder:02d}"
+
+def format_money(cents):
+    """Display form of an amount, as shown in the database view"""
+    return f"{money_text(cents)} $"
+
+@dataclass
+class LoanRecord:
+    """One stored loan application.
+
+    Amounts are integer cents, the rate is a whole percentage and the
+    term is a number of months. Formatting for people only happens in
+    display_values(), so sorting and aggregating never re-parse text.
+    """
+
+    __slots__ = (
+        "name", "email", "dob", "loan_cents", "rate", "months",
+        "interest_cents", "total_interest_cents",
+    )
+
+    name: str
+    email: str
+    dob: str
+    loan_cents: int
+    rate: int
+    months: int
+    interest_cents: int
+    total_interest_cents: int
+
+    @property
+    def loan_amount(self):
+        """Loan amount in whole dollars, the unit the interest rules use"""
+        return self.loan_cents // 100
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a record from a CSV row, upgrading legacy formatted values"""
+        return cls(
+            name=row.get("Name") or "",
+            email=row.get("Email") or "",
+            dob=row.get("Date of Birth") or "",
+            loan_cents=parse_money(row.get("Loan amount")),
+            rate=parse_whole(row.get("Interest amount")),
+            months=parse_whole(row.get("Month")),
+            interest_cents=parse_money(row.get("Interest money")),
+            total_interest_cents=parse_money(row.get("Interest money per month")),
+        )
+
+    def to_row(self):
+        """CSV row holding raw numbers under the original column names"""
+        return {
+            "Name": self.name,
+            "Email": self.email,
+            "Date of Birth": self.dob,
+            "Loan amount": money_text(self.loan_cents),
+            "Interest amount": str(self.rate),
+            "Interest money": money_text(self.interest_cents),
+            "Month": str(self.months),
+            "Interest money per month": money_text(self.total_interest_cents)
+        }
+
+    def display_values(self):
+        """Values for the database view, in FIELDNAMES order"""
+        return (
+            self.name,
+            self.email,
+            self.dob,
+            format_money(self.loan_cents),
+            f"{self.rate} %",
+            format_money(self.interest_cents),
+            f"{self.months} months",
+            format_money(self.total_interest_cents)
+        )
+
+    def to_json(self):
+        """Plain dict for JSON output, with amounts in dollars"""
+        def dollars(cents):
+            return cents // 100 if cents % 100 == 0 else cents / 100
+
+        return {
+            "name": self.name,
+            "email": self.email,
+            "dob": self.dob,
+            "loan_amount": dollars(self.loan_cents),
+            "interest_rate": self.rate,
+            "months": self.months,
+            "interest": dollars(self.interest_cents),
+            "total_interest": dollars(self.total_interest_cents),
+        }
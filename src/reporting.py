@@ -0,0 +1,194 @@
+import argparse
+import bisect
+import itertools
+import json
+from datetime import date
+
+try:
+    from .records import format_money
+    from .storage import open_repository
+except ImportError:  # running as a script: python src/reporting.py
+    from records import format_money
+    from storage import open_repository
+
+# Upper bounds (inclusive) of the loan term buckets, in months; longer
+# terms fall in the last bucket
+TERM_BOUNDS = [12, 36, 60, 120]
+TERM_BUCKETS = ["Up to 12 months", "13-36 months", "37-60 months",
+                "61-120 months", "Over 120 months"]
+
+# Lower bounds of the borrower age bands, in years at report time
+AGE_BOUNDS = [25, 35, 45, 55, 65]
+AGE_BANDS = ["Under 25", "25-34", "35-44", "45-54", "55-64", "65 and over"]
+UNKNOWN_AGE = "Unknown"
+
+def term_bucket(months):
+    return TERM_BUCKETS[bisect.bisect_left(TERM_BOUNDS, months)]
+
+def age_on(dob, today):
+    """Whole years from dob (YYYY-MM-DD) to today, or None if dob is not a date"""
+    try:
+        born = date.fromisoformat(dob)
+    except ValueError:
+        return None
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+def age_band(age):
+    if age is None or age < 0:
+        return UNKNOWN_AGE
+    return AGE_BANDS[bisect.bisect_right(AGE_BOUNDS, age)]
+
+class Exposure:
+    """Number of loans, principal and expected interest in one group"""
+
+    __slots__ = ("count", "principal_cents", "interest_cents")
+
+    def __init__(self):
+        self.count = 0
+        self.principal_cents = 0
+        self.interest_cents = 0
+
+    def add(self, record, sign=1):
+        self.count += sign
+        self.principal_cents += sign * record.loan_cents
+        self.interest_cents += sign * record.total_interest_cents
+
+    def merge(self, other):
+        self.count += other.count
+        self.principal_cents += other.principal_cents
+        self.interest_cents += other.interest_cents
+
+    def to_json(self, label, total_cents):
+        return {
+            "label": label,
+            "count": self.count,
+            "principal_cents": self.principal_cents,
+            "interest_cents": self.interest_cents,
+            "share": round(self.principal_cents / total_cents, 4) if total_cents else 0.0,
+        }
+
+class Portfolio:
+    """Running totals over a loan book, updated one record at a time.
+
+    Adding and removing a record costs a few dictionary updates, so the
+    totals can follow every submit and delete instead of being rebuilt.
+    Exposure is kept per term bucket and per date of birth; ages move
+    with the calendar, so dates are grouped into age bands only when a
+    report is made. Outstanding principal is the full loan amount, since
+    no repayments are recorded.
+    """
+
+    def __init__(self):
+        self.total = Exposure()
+        self.rate_sum = 0
+        self.weighted_rate_sum = 0
+        self.terms = {}
+        self.births = {}
+
+    def add(self, record, sign=1):
+        self.total.add(record, sign)
+        self.rate_sum += sign * record.rate
+        self.weighted_rate_sum += sign * record.rate * record.loan_cents
+        for groups, key in ((self.terms, term_bucket(record.months)), (self.births, record.dob)):
+            exposure = groups.get(key)
+            if exposure is None:
+                exposure = groups[key] = Exposure()
+            exposure.add(record, sign)
+            if not exposure.count:
+                del groups[key]
+
+    def remove(self, record):
+        self.add(record, -1)
+
+    def merge(self, other):
+        """Fold the totals of another portfolio, such as a computed chunk, into this one"""
+        self.total.merge(other.total)
+        self.rate_sum += other.rate_sum
+        self.weighted_rate_sum += other.weighted_rate_sum
+        for mine, theirs in ((self.terms, other.terms), (self.births, other.births)):
+            for key, exposure in theirs.items():
+                mine.setdefault(key, Exposure()).merge(exposure)
+
+    @classmethod
+    def compute(cls, records, chunk_size=10000, progress=None):
+        """Build a portfolio from records, reading chunk_size records at a time.
+
+        progress, if given, is called with the number of records read so
+        far after every chunk.
+        """
+        portfolio = cls()
+        records = iter(records)
+        read = 0
+        while True:
+            chunk = cls()
+            for record in itertools.islice(records, chunk_size):
+                chunk.add(record)
+            if not chunk.total.count:
+                break
+            portfolio.merge(chunk)
+            read += chunk.total.count
+            if progress is not None:
+                progress(read)
+        return portfolio
+
+    def age_bands(self, today):
+        bands = {}
+        for dob, exposure in self.births.items():
+            bands.setdefault(age_band(age_on(dob, today)), Exposure()).merge(exposure)
+        return bands
+
+    def report(self, today=None):
+        """Summary of the portfolio as of today, as JSON-ready data"""
+        today = today or date.today()
+        total = self.total
+        ages = self.age_bands(today)
+        return {
+            "as_of": today.isoformat(),
+            "count": total.count,
+            "principal_cents": total.principal_cents,
+            "interest_cents": total.interest_cents,
+            "average_rate": round(self.rate_sum / total.count, 2) if total.count else 0.0,
+            "weighted_rate": round(self.weighted_rate_sum / total.principal_cents, 2)
+            if total.principal_cents else 0.0,
+            "terms": [self.terms[label].to_json(label, total.principal_cents)
+                      for label in TERM_BUCKETS if label in self.terms],
+            "ages": [ages[label].to_json(label, total.principal_cents)
+                     for label in AGE_BANDS + [UNKNOWN_AGE] if label in ages],
+        }
+
+def format_report(report):
+    """Plain-text rendering of Portfolio.report() for the command line"""
+    lines = [
+        f"Portfolio as of {report['as_of']}",
+        f"Loans: {report['count']:,}",
+        f"Outstanding principal: {format_money(report['principal_cents'])}",
+        f"Expected interest: {format_money(report['interest_cents'])}",
+        f"Average rate: {report['average_rate']}% "
+        f"(weighted by principal: {report['weighted_rate']}%)",
+    ]
+    for title, key in (("By term", "terms"), ("By age", "ages")):
+        lines += ["", title]
+        for group in report[key]:
+            lines.append(f"  {group['label']:<16} {group['count']:>8,}  "
+                         f"{format_money(group['principal_cents']):>18}  {group['share']:>7.1%}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Portfolio totals and exposure of the loan book")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--storage", help="storage backend (default: $BANK_STORAGE or csv)")
+    parser.add_argument("--database", help="database path (default: $BANK_DATABASE)")
+    args = parser.parse_args(argv)
+
+    repository = open_repository(args.storage, args.database)
+    try:
+        repository.initialize()
+        report = Portfolio.compute(repository.iter_records(), args.chunk_size).report()
+    finally:
+        repository.close()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
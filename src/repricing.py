@@ -0,0 +1,53 @@
+import argparse
+import dataclasses
+from array import array
+
+try:
+    from .loans import calculate_interest_batch
+    from .storage import open_repository
+except ImportError:  # running as a script: python src/repricing.py
+    from loans import calculate_interest_batch
+    from storage import open_repository
+
+def reprice_records(records, rate=None):
+    """Recompute the interest columns of a chunk of records.
+
+    With rate given, every loan is moved to that rate first.
+    """
+    amounts = array("q", (record.loan_amount for record in records))
+    rates = array("q", (rate if rate is not None else record.rate for record in records))
+    months = array("q", (record.months for record in records))
+
+    interest, totals = calculate_interest_batch(amounts, rates, months)
+    return [
+        dataclasses.replace(record, rate=loan_rate, interest_cents=int(value) * 100,
+                            total_interest_cents=int(total) * 100)
+        for record, loan_rate, value, total in zip(records, rates, interest, totals)
+    ]
+
+def reprice_repository(repository, rate=None, chunk_size=10000):
+    """Reprice every stored record and write the results back in bulk"""
+    return repository.update_all(lambda chunk: reprice_records(chunk, rate), chunk_size)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalculate interest for every stored loan")
+    parser.add_argument("--rate", type=int, help="move every loan to this interest rate (%%)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--storage", help="storage backend (default: $BANK_STORAGE or csv)")
+    parser.add_argument("--database", help="database path (default: $BANK_DATABASE)")
+    args = parser.parse_args(argv)
+
+    if args.rate is not None and args.rate <= 0:
+        parser.error("Interest rate must be a positive number.")
+
+    repository = open_repository(args.storage, args.database)
+    try:
+        repository.initialize()
+        count = reprice_repository(repository, args.rate, args.chunk_size)
+    finally:
+        repository.close()
+    print(f"Repriced {count} records")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
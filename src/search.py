@@ -0,0 +1,315 @@
+import bisect
+import threading
+from array import array
+
+try:
+    from .storage import SORT_FIELDS, EmailIndex
+except ImportError:  # imported from a script in src/
+    from storage import SORT_FIELDS, EmailIndex
+
+# Queries shorter than this match word prefixes instead of substrings
+TRIGRAM_LENGTH = 3
+
+def trigrams(text):
+    return {text[i:i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+def sort_value(record, field):
+    value = getattr(record, field)
+    return value.lower() if isinstance(value, str) else value
+
+def _bisect_left(ids, target, key):
+    """bisect.bisect_left comparing key(id) with target, for any Python 3"""
+    low, high = 0, len(ids)
+    while low < high:
+        middle = (low + high) // 2
+        if key(ids[middle]) < target:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def _discard_id(ids, record_id):
+    """Remove record_id from an ascending array of ids, if it is there"""
+    position = bisect.bisect_left(ids, record_id)
+    if position < len(ids) and ids[position] == record_id:
+        del ids[position]
+
+class RecordIndex:
+    """In-memory search and sort indexes over the stored records.
+
+    Backends that cannot search by themselves, like the CSV file, are
+    searched through this index; SQLite answers queries in SQL instead.
+
+    Every record gets an increasing id, its position in records, so id
+    order is insertion order. Names and emails are indexed by trigram
+    for substring search and name words for prefix search on short
+    queries. Postings are ascending array("q") lists of ids, eight bytes
+    an entry, rather than sets of int objects. Each field in SORT_FIELDS
+    gets an array of ids in (value, id) order the first time a page is
+    sorted by it; afterwards it is kept in order with bisect as records
+    come and go, so a sorted page is a slice rather than a sort.
+
+    Deleted records leave a None behind until COMPACT_MIN_DELETES of
+    them make up COMPACT_RATIO of the ids, as with the CSV file's
+    tombstones; compact() then renumbers the live records and starts a
+    new generation, so older results know to run their query again.
+    """
+
+    COMPACT_MIN_DELETES = 1000
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, records=()):
+        self.records = []  # by id; None once deleted
+        self.generation = 0
+        self._count = 0
+        self._ids = {}
+        self._trigrams = {}
+        self._words = {}
+        self._word_list = None  # distinct words, sorted; rebuilt when None
+        self._sorted = {}
+        self.lock = threading.RLock()
+        self.extend(records)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, email):
+        return EmailIndex.normalize(email) in self._ids
+
+    @staticmethod
+    def _words_of(record):
+        return set(record.name.lower().split())
+
+    @staticmethod
+    def _trigrams_of(record):
+        return trigrams(record.name.lower()) | trigrams(EmailIndex.normalize(record.email))
+
+    def _sort_key(self, field):
+        records = self.records
+        return lambda record_id: (sort_value(records[record_id], field), record_id)
+
+    def _insert(self, record):
+        self.discard(record.email)
+        record_id = len(self.records)
+        self.records.append(record)
+        self._count += 1
+        self._ids[EmailIndex.normalize(record.email)] = record_id
+        # New ids are the largest yet, so appending keeps postings ascending
+        for trigram in self._trigrams_of(record):
+            ids = self._trigrams.get(trigram)
+            if ids is None:
+                ids = self._trigrams[trigram] = array("q")
+            ids.append(record_id)
+        for word in self._words_of(record):
+            ids = self._words.get(word)
+            if ids is None:
+                ids = self._words[word] = array("q")
+                if self._word_list is not None:
+                    bisect.insort(self._word_list, word)
+            ids.append(record_id)
+        return record_id
+
+    def add(self, record):
+        """Index a newly stored record, replacing any record with its email"""
+        with self.lock:
+            record_id = self._insert(record)
+            for field, ids in self._sorted.items():
+                key = self._sort_key(field)
+                ids.insert(_bisect_left(ids, key(record_id), key), record_id)
+
+    def extend(self, records):
+        """Index many records at once; sort orders are rebuilt on next use"""
+        with self.lock:
+            self._sorted = {}
+            self._word_list = None
+            for record in records:
+                self._insert(record)
+
+    def discard(self, email):
+        """Forget the record stored for email, if any"""
+        with self.lock:
+            record_id = self._ids.pop(EmailIndex.normalize(email), None)
+            if record_id is None:
+                return False
+            record = self.records[record_id]
+            for field, ids in self._sorted.items():
+                position = _bisect_left(ids, (sort_value(record, field), record_id),
+                                        self._sort_key(field))
+                if position < len(ids) and ids[position] == record_id:
+                    del ids[position]
+            self.records[record_id] = None
+            self._count -= 1
+            for postings, keys in ((self._trigrams, self._trigrams_of(record)),
+                                   (self._words, self._words_of(record))):
+                for key in keys:
+                    ids = postings[key]
+                    _discard_id(ids, record_id)
+                    if not ids:
+                        del postings[key]
+                        if postings is self._words and self._word_list is not None:
+                            self._word_list.pop(bisect.bisect_left(self._word_list, key))
+            if self.needs_compaction():
+                self.compact()
+            return True
+
+    def needs_compaction(self):
+        dead = len(self.records) - self._count
+        return dead >= self.COMPACT_MIN_DELETES and dead >= len(self.records) * self.COMPACT_RATIO
+
+    def compact(self):
+        """Drop the slots of deleted records by indexing the live ones afresh"""
+        with self.lock:
+            live = [record for record in self.records if record is not None]
+            fields = list(self._sorted)
+            self.records = []
+            self.generation += 1
+            self._count = 0
+            self._ids = {}
+            self._trigrams = {}
+            self._words = {}
+            self.extend(live)
+            for field in fields:  # keep sorted pages as quick as before
+                self.sorted_ids(field)
+
+    def _live_ids(self):
+        if self._count == len(self.records):
+            return range(self._count)
+        return array("q", (record_id for record_id, record in enumerate(self.records)
+                           if record is not None))
+
+    def sorted_ids(self, field):
+        """Ids of the live records in (value, id) order of field"""
+        with self.lock:
+            ids = self._sorted.get(field)
+            if ids is None:
+                live = self._live_ids()
+                records = self.records
+                if field in ("name", "email", "dob"):
+                    values = [getattr(records[record_id], field).lower() for record_id in live]
+                else:
+                    values = [getattr(records[record_id], field) for record_id in live]
+                # A stable sort of ascending ids leaves equal values in id order
+                order = sorted(range(len(live)), key=values.__getitem__)
+                ids = array("q", order if isinstance(live, range)
+                            else (live[position] for position in order))
+                self._sorted[field] = ids
+            return ids
+
+    def _prefixed_words(self, prefix):
+        if self._word_list is None:
+            self._word_list = sorted(self._words)
+        words = self._word_list
+        position = bisect.bisect_left(words, prefix)
+        while position < len(words) and words[position].startswith(prefix):
+            yield self._words[words[position]]
+            position += 1
+
+    def _prefixed_emails(self, prefix):
+        ids = self.sorted_ids("email")
+        records = self.records
+        position = _bisect_left(ids, prefix, lambda record_id: records[record_id].email.lower())
+        while position < len(ids) and records[ids[position]].email.lower().startswith(prefix):
+            yield ids[position]
+            position += 1
+
+    def matching(self, text):
+        """Ids whose name or email contains text, ignoring case, in id order.
+
+        Text shorter than TRIGRAM_LENGTH matches the start of a name word
+        or of the email instead.
+        """
+        needle = text.strip().lower()
+        with self.lock:
+            if len(needle) < TRIGRAM_LENGTH:
+                ids = set(self._prefixed_emails(needle))
+                for postings in self._prefixed_words(needle):
+                    ids.update(postings)
+                return sorted(ids)
+            postings = [self._trigrams.get(trigram) for trigram in trigrams(needle)]
+            if not all(postings):
+                return []
+            # Only the rarest trigram is walked; a substring check then
+            # settles each candidate, as shared trigrams are not enough
+            records = self.records
+            return [
+                record_id for record_id in min(postings, key=len)
+                if needle in records[record_id].name.lower()
+                or needle in EmailIndex.normalize(records[record_id].email)
+            ]
+
+    def search(self, text="", sort_by=None, descending=False):
+        """Return a SearchResult for the records matching text, in order.
+
+        Without text every record matches. Without sort_by records come
+        in insertion order.
+        """
+        if sort_by is not None and sort_by not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort_by!r}")
+        with self.lock:
+            if not text.strip():
+                if sort_by is None:
+                    ids = self._live_ids()
+                    return SearchResult(self, ids[::-1] if descending else ids,
+                                        query=(text, None, descending))
+                return SearchResult(self, field=sort_by, descending=descending)
+            ids = self.matching(text)
+            if sort_by is not None:
+                ids.sort(key=self._sort_key(sort_by), reverse=descending)
+            elif descending:
+                ids.reverse()
+            return SearchResult(self, ids, query=(text, sort_by, descending))
+
+class SearchResult:
+    """The ordered outcome of RecordIndex.search, read a page at a time.
+
+    A query with text holds the list of matching ids. A plain sort reads
+    the live sorted index directly, so it costs nothing until a page is
+    asked for. Records deleted since the query are skipped, and should
+    the index be compacted meanwhile, which renumbers the ids, the query
+    runs again.
+    """
+
+    STREAM_CHUNK = 1000
+
+    def __init__(self, index, ids=None, field=None, descending=False, query=None):
+        self.index = index
+        self.ids = ids
+        self.field = field
+        self.descending = descending
+        self.query = query
+        self.generation = index.generation
+
+    def _current_ids(self):
+        if self.ids is not None and self.generation != self.index.generation:
+            fresh = self.index.search(*self.query)
+            self.ids, self.generation = fresh.ids, fresh.generation
+        return self.ids
+
+    @property
+    def total(self):
+        with self.index.lock:
+            ids = self._current_ids()
+            return len(self.index) if ids is None else len(ids)
+
+    def page(self, offset, limit):
+        """Records at positions offset to offset + limit"""
+        index = self.index
+        with index.lock:
+            if self._current_ids() is not None:
+                ids = self.ids[offset:offset + limit]
+            else:
+                entries = index.sorted_ids(self.field)
+                if self.descending:
+                    end = max(0, len(entries) - offset)
+                    ids = entries[max(0, end - limit):end][::-1]
+                else:
+                    ids = entries[offset:offset + limit]
+            records = index.records
+            return [records[record_id] for record_id in ids if records[record_id] is not None]
+
+    def __iter__(self):
+        """Stream every matching record, one chunk at a time"""
+        offset = 0
+        while offset < self.total:
+            yield from self.page(offset, self.STREAM_CHUNK)
+            offset += self.STREAM_CHUNK
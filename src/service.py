@@ -0,0 +1,282 @@
+import itertools
+import threading
+
+try:
+    from . import loans, validation
+    from .instrumentation import instrumentation, instrumented
+    from .reporting import Portfolio
+    from .search import RecordIndex
+    from .storage import SORT_FIELDS, DuplicateEmailError, EmailIndex, StorageError, open_repository
+except ImportError:  # imported from a script in src/
+    import loans
+    import validation
+    from instrumentation import instrumentation, instrumented
+    from reporting import Portfolio
+    from search import RecordIndex
+    from storage import SORT_FIELDS, DuplicateEmailError, EmailIndex, StorageError, open_repository
+
+__all__ = [
+    "DuplicateEmailError", "LoanService", "RecordNotFoundError",
+    "ServiceError", "StorageError", "ValidationError",
+]
+
+class ServiceError(Exception):
+    """Base class for problems reported by LoanService"""
+
+class ValidationError(ServiceError, ValueError):
+    """Raised when an application or query does not pass the form's rules"""
+
+class RecordNotFoundError(ServiceError, LookupError):
+    """Raised when no record is stored for the given email"""
+
+class LoanService:
+    """Submit, list, search and delete applications without any GUI.
+
+    Problems are raised as exceptions so the Tk front end, the command
+    line and batch jobs can each present them in their own way.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self._index = None
+        self._index_lock = threading.Lock()
+        self._cursor = None
+        self._token = None
+        self._portfolio = None
+        self._portfolio_lock = threading.Lock()
+        self._portfolio_cursor = None
+
+    @classmethod
+    def open(cls, backend=None, path=None):
+        """Build a service on the configured repository and initialize it"""
+        service = cls(open_repository(backend, path))
+        service.repository.initialize()
+        return service
+
+    def close(self):
+        self.repository.close()
+
+    validate_email = staticmethod(validation.validate_email)
+    validate_dob = staticmethod(validation.validate_dob)
+    calculate_interest = staticmethod(loans.calculate_interest)
+    calculate_monthly_interest = staticmethod(loans.calculate_monthly_interest)
+
+    def prepare(self, name, email, dob, loan_amount, interest_rate, months):
+        """Validate an application given as form strings and build its record.
+
+        Raises ValidationError for bad input. Nothing is stored.
+        """
+        fields = [str(value).strip() for value in (name, email, dob, loan_amount, interest_rate, months)]
+        error = validation.validate_application(*fields)
+        if error:
+            raise ValidationError(error)
+
+        name, email, dob = fields[:3]
+        return loans.build_record(name, email, dob, *(int(value) for value in fields[3:]))
+
+    @instrumented("service.submit")
+    def submit(self, name, email, dob, loan_amount, interest_rate, months):
+        """Validate and store an application given as form strings.
+
+        Returns the stored record. Raises ValidationError for bad input
+        and DuplicateEmailError if the email is already registered.
+        """
+        record = self.prepare(name, email, dob, loan_amount, interest_rate, months)
+        self.repository.append(record)
+        self._update_index()
+        self._update_portfolio()
+        return record
+
+    @instrumented("service.submit_many")
+    def submit_many(self, records):
+        """Store prepared records with a single grouped write.
+
+        Returns one entry per record: None if it was stored, or the
+        DuplicateEmailError explaining why it was not. Emails already
+        stored are caught by the repository while it holds its write
+        lock, so a record stored by another writer in the meantime is
+        reported rather than silently dropped.
+        """
+        records = list(records)
+        accepted = []
+        seen = set()
+        for record in records:
+            email = EmailIndex.normalize(record.email)
+            if email not in seen:
+                seen.add(email)
+                accepted.append(record)
+        skipped = []
+        if accepted and self.repository.append_many(accepted, skipped):
+            self._update_index()
+            self._update_portfolio()
+        stored = set(map(id, accepted)).difference(map(id, skipped))
+        outcomes = []
+        for record in records:
+            if id(record) in stored:
+                stored.discard(id(record))  # the same record twice is a duplicate
+                outcomes.append(None)
+            else:
+                outcomes.append(DuplicateEmailError(
+                    f"This email address is already registered in our system: {record.email}"))
+        return outcomes
+
+    def email_exists(self, email):
+        return self.repository.email_exists(email)
+
+    def get(self, email):
+        record = self.repository.get(email)
+        if record is None:
+            raise RecordNotFoundError(f"No record found with email: {email}")
+        return record
+
+    def count(self):
+        return self.repository.count()
+
+    def list(self, offset=0, limit=None):
+        """Return stored records in insertion order, a page at a time"""
+        if limit is None:
+            return list(itertools.islice(self.repository.iter_records(), offset, None))
+        return self.repository.fetch(offset, limit)
+
+    def search(self, text, limit=100, sort_by=None, descending=False):
+        """Return the first limit records query(text) finds, refusing blank text"""
+        if not text.strip():
+            raise ValidationError("Please enter something to search for.")
+        return self.query(text, sort_by, descending).page(0, limit)
+
+    @instrumented("service.delete")
+    def delete(self, email):
+        """Remove the record for email, raising RecordNotFoundError if there is none"""
+        email = email.strip()
+        if not validation.validate_email(email):
+            raise ValidationError("Please enter a valid email address.")
+        if not self.repository.delete(email):
+            raise RecordNotFoundError(f"No record found with email: {email}")
+        self._update_index()
+        self._update_portfolio()
+
+    def _update_index(self):
+        # Holding the lock means a change made while the index is being
+        # built is applied once the build finishes, never lost
+        with self._index_lock:
+            if self._index is not None:
+                self._catch_up_index()
+
+    def _catch_up_index(self):
+        # Like the portfolio, the index only follows the change feed, so
+        # the cursor always covers this process's own writes too and a
+        # record added here and deleted elsewhere is never left behind
+        changes = self.repository.changes_since(self._cursor)
+        if changes is None:
+            self._index = None
+            return
+        added, removed, self._cursor = changes
+        for record in removed:
+            self._index.discard(record.email)
+        for record in added:
+            self._index.add(record)
+
+    @property
+    def index(self):
+        """The search index, built from one pass over storage on first use.
+
+        Afterwards submit, submit_many and delete keep it current.
+        """
+        with self._index_lock:
+            if self._index is None:
+                self._cursor, records = self.repository.records_with_cursor()
+                with instrumentation.timed("service.index_build"):
+                    self._index = RecordIndex(records)
+            return self._index
+
+    def _update_portfolio(self):
+        with self._portfolio_lock:
+            if self._portfolio is not None:
+                self._catch_up_portfolio()
+
+    def _catch_up_portfolio(self):
+        # Totals are only ever moved by the change feed, never by the
+        # caller's own records, so no change is counted twice
+        changes = self.repository.changes_since(self._portfolio_cursor)
+        if changes is None:
+            self._portfolio = None
+            return
+        added, removed, self._portfolio_cursor = changes
+        for record in removed:
+            self._portfolio.remove(record)
+        for record in added:
+            self._portfolio.add(record)
+
+    @property
+    def portfolio(self):
+        """Running portfolio totals, computed from storage on first use.
+
+        Afterwards submit, submit_many, delete and sync keep them current,
+        so reports never read the whole book again.
+        """
+        with self._portfolio_lock:
+            if self._portfolio is None:
+                cursor, records = self.repository.records_with_cursor()
+                with instrumentation.timed("service.portfolio_build"):
+                    self._portfolio = Portfolio.compute(records)
+                self._portfolio_cursor = cursor
+            return self._portfolio
+
+    def report(self, today=None):
+        """Portfolio totals and exposure per term and age band, see Portfolio.report"""
+        portfolio = self.portfolio
+        with self._portfolio_lock:
+            return portfolio.report(today)
+
+    @instrumented("service.recompute_portfolio")
+    def recompute_portfolio(self, chunk_size=10000, progress=None):
+        """Rebuild the portfolio totals from storage, chunk_size records at a time.
+
+        progress, if given, is called with (records read, total records)
+        after every chunk. The running totals keep serving reports until
+        the new ones are complete. Returns the new report.
+        """
+        total = self.repository.count()
+        cursor, records = self.repository.records_with_cursor()
+        portfolio = Portfolio.compute(
+            records, chunk_size, None if progress is None else lambda read: progress(read, total))
+        with self._portfolio_lock:
+            self._portfolio, self._portfolio_cursor = portfolio, cursor
+            # Writes made during the pass are replayed from its cursor
+            self._catch_up_portfolio()
+        return self.report()
+
+    @instrumented("service.sync")
+    def sync(self):
+        """Catch up with changes other processes made to storage.
+
+        Returns True if the stored records changed since the last call.
+        The search index and portfolio totals are brought up to date
+        from the repository's change feed, or dropped to be rebuilt on
+        next use when the changes cannot be listed.
+        """
+        token = self.repository.change_token()
+        if token is None or token == self._token:
+            return False
+        first_call = self._token is None
+        self._token = token
+
+        self._update_index()
+        self._update_portfolio()
+        return not first_call
+
+    @instrumented("service.query")
+    def query(self, text="", sort_by=None, descending=False):
+        """Find records by name or email and order them by a field.
+
+        Returns a result to read pages from, with total and page(). The
+        repository answers the query itself where it can, as SQLite does;
+        otherwise the in-memory search index does. Raises ValidationError
+        if sort_by is not one of SORT_FIELDS.
+        """
+        if sort_by is not None and sort_by not in SORT_FIELDS:
+            raise ValidationError(f"Records cannot be sorted by {sort_by}.")
+        result = self.repository.query(text, sort_by, descending)
+        if result is None:
+            result = self.index.search(text, sort_by, descending)
+        return result
@@ -0,0 +1,494 @@
+import argparse
+import contextlib
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+try:
+    from .instrumentation import instrumented
+    from .records import LoanRecord, format_money
+    from .storage import (
+        COLUMNS, SNAPSHOT_FILE, EmailIndex, Repository, StorageError, atomic_write, open_repository,
+    )
+except ImportError:  # running as a script: python src/snapshot.py
+    from instrumentation import instrumented
+    from records import LoanRecord, format_money
+    from storage import (
+        COLUMNS, SNAPSHOT_FILE, EmailIndex, Repository, StorageError, atomic_write, open_repository,
+    )
+
+# File layout, all little-endian:
+#   header      magic, version, reserved, column count, row count
+#   directory   one entry per column: name, array typecode, offset, length
+#   columns     the column data, each starting on an 8-byte boundary
+# Numeric fields are one "q" column each. Text fields are a "q" column of
+# row offsets (one more than there are rows) into a "B" column holding
+# the UTF-8 text of every row back to back. "email.order" lists the rows
+# sorted by normalized email, so lookups are a binary search.
+MAGIC = b"BANKSNAP"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQ")
+DIRECTORY_ENTRY = struct.Struct("<24sc7xQQ")
+ALIGNMENT = 8
+
+TEXT_FIELDS = ("name", "email", "dob")
+NUMERIC_FIELDS = tuple(field for field in COLUMNS if field not in TEXT_FIELDS)
+EMAIL_ORDER = "email.order"
+
+# Stored values are little-endian; other machines get swapped copies
+NATIVE = sys.byteorder == "little"
+
+# Rows decoded at a time when iterating, to keep per-row overhead down
+READ_CHUNK = 10000
+
+READ_ONLY = "Snapshots are read-only; export the database again to include changes."
+
+class SnapshotError(StorageError):
+    """Raised when a snapshot file is missing, truncated or not a snapshot"""
+
+def _padding(offset):
+    return -offset % ALIGNMENT
+
+def build_columns(records):
+    """Lay records out as snapshot columns.
+
+    Returns ({column name: array}, row count).
+    """
+    numbers = {field: array("q") for field in NUMERIC_FIELDS}
+    offsets = {field: array("q", [0]) for field in TEXT_FIELDS}
+    texts = {field: array("B") for field in TEXT_FIELDS}
+    emails = []
+    for record in records:
+        for field in NUMERIC_FIELDS:
+            numbers[field].append(getattr(record, field))
+        for field in TEXT_FIELDS:
+            text = texts[field]
+            text.frombytes(getattr(record, field).encode("utf-8"))
+            offsets[field].append(len(text))
+        emails.append(EmailIndex.normalize(record.email))
+
+    columns = {}
+    for field in COLUMNS:
+        if field in TEXT_FIELDS:
+            columns[f"{field}.offsets"] = offsets[field]
+            columns[f"{field}.data"] = texts[field]
+        else:
+            columns[field] = numbers[field]
+    columns[EMAIL_ORDER] = array("q", sorted(range(len(emails)), key=emails.__getitem__))
+    return columns, len(emails)
+
+def write_columns(path, columns, count):
+    """Write columns from build_columns() to path as one snapshot, atomically"""
+    offset = HEADER.size + DIRECTORY_ENTRY.size * len(columns)
+    directory = []
+    for name, values in columns.items():
+        offset += _padding(offset)
+        length = len(values) * values.itemsize
+        directory.append(DIRECTORY_ENTRY.pack(name.encode("ascii"), values.typecode.encode("ascii"),
+                                              offset, length))
+        offset += length
+
+    def write(output):
+        output.write(HEADER.pack(MAGIC, VERSION, 0, len(columns), count))
+        output.write(b"".join(directory))
+        position = HEADER.size + DIRECTORY_ENTRY.size * len(columns)
+        for values in columns.values():
+            output.write(b"\0" * _padding(position))
+            position += _padding(position)
+            if not NATIVE and values.itemsize > 1:
+                values = array(values.typecode, values)
+                values.byteswap()
+            output.write(values)
+            position += len(values) * values.itemsize
+
+    atomic_write(path, write, binary=True)
+
+@instrumented("snapshot.write")
+def write_snapshot(path, records):
+    """Write records to path as a columnar snapshot, returning how many were written"""
+    columns, count = build_columns(records)
+    write_columns(path, columns, count)
+    return count
+
+def export_snapshot(repository, path=SNAPSHOT_FILE):
+    """Write every record of an open repository to a snapshot at path"""
+    return write_snapshot(path, repository.iter_records())
+
+class TextColumn:
+    """Read-only sequence of the strings of one text column.
+
+    raw(row) is the UTF-8 text as a view into the file; indexing
+    decodes it.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, row):
+        return self.data[self.offsets[row]:self.offsets[row + 1]]
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("snapshot row out of range")
+        return str(self.raw(row), "utf-8")
+
+    def slice(self, start, stop):
+        """Decode rows start to stop in one pass"""
+        bounds = self.offsets[start:stop + 1].tolist()
+        text = bytes(self.data[bounds[0]:bounds[-1]]) if bounds else b""
+        first = bounds[0] if bounds else 0
+        return [text[begin - first:end - first].decode("utf-8")
+                for begin, end in zip(bounds, bounds[1:])]
+
+class Snapshot:
+    """A snapshot file mapped into memory.
+
+    Opening reads only the header and directory, whatever the number of
+    rows; pages are loaded by the operating system as columns are read.
+    column() returns numeric columns as memoryviews of the mapping and
+    text columns as TextColumn, so nothing is copied until values are
+    used. Views handed out must be released before the file is
+    replaced on Windows.
+
+    Readers sharing a snapshot pin it with acquire() and let go with
+    release(); retire() then closes it once the last of them is done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._users = 0
+        self._retired = False
+        self._users_lock = threading.Lock()
+        try:
+            file = open(path, "rb")
+        except OSError as e:
+            raise SnapshotError(f"Cannot open snapshot {path}: {e}") from e
+        with file:
+            stat = os.fstat(file.fileno())
+            self.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if stat.st_size < HEADER.size:
+                raise SnapshotError(f"{path} is not a snapshot")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._columns = {}
+        try:
+            self._read_directory(stat.st_size)
+        except BaseException:
+            self.close()
+            raise
+
+    def _read_directory(self, size):
+        magic, version, _, column_count, self.row_count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} is not a snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"{self.path} has unsupported snapshot version {version}")
+        if HEADER.size + DIRECTORY_ENTRY.size * column_count > size:
+            raise SnapshotError(f"{self.path} is truncated")
+
+        self._directory = {}
+        for number in range(column_count):
+            name, typecode, offset, length = DIRECTORY_ENTRY.unpack_from(
+                self._map, HEADER.size + DIRECTORY_ENTRY.size * number)
+            name, typecode = name.rstrip(b"\0").decode("ascii"), typecode.decode("ascii")
+            if typecode not in ("q", "B") or offset + length > size or length % array(typecode).itemsize:
+                raise SnapshotError(f"{self.path} is truncated or corrupt")
+            self._directory[name] = (typecode, offset, length)
+
+        expected = {field: self.row_count for field in NUMERIC_FIELDS}
+        expected.update({f"{field}.offsets": self.row_count + 1 for field in TEXT_FIELDS})
+        expected[EMAIL_ORDER] = self.row_count
+        for name, rows in expected.items():
+            if name not in self._directory or len(self._numbers(name)) != rows:
+                raise SnapshotError(f"{self.path} is missing column {name}")
+        for field in TEXT_FIELDS:
+            if f"{field}.data" not in self._directory or (
+                    self._numbers(f"{field}.offsets")[-1] != len(self._numbers(f"{field}.data"))):
+                raise SnapshotError(f"{self.path} is missing column {field}.data")
+
+    def _numbers(self, name):
+        values = self._columns.get(name)
+        if values is None:
+            typecode, offset, length = self._directory[name]
+            values = self._view[offset:offset + length].cast(typecode)
+            if not NATIVE and typecode != "B":
+                values = array(typecode, values)
+                values.byteswap()
+            self._columns[name] = values
+        return values
+
+    @property
+    def columns(self):
+        """Names accepted by column()"""
+        return list(COLUMNS)
+
+    def column(self, name):
+        """The values of one field for every row, without copying them"""
+        if name in TEXT_FIELDS:
+            return TextColumn(self._numbers(f"{name}.offsets"), self._numbers(f"{name}.data"))
+        if name in NUMERIC_FIELDS:
+            return self._numbers(name)
+        raise KeyError(name)
+
+    def __len__(self):
+        return self.row_count
+
+    def __getitem__(self, row):
+        """The record at a row number, read straight from the mapping"""
+        if row < 0:
+            row += self.row_count
+        if not 0 <= row < self.row_count:
+            raise IndexError("snapshot row out of range")
+        return LoanRecord(*(self.column(field)[row] for field in COLUMNS))
+
+    def records(self, start=0, stop=None):
+        """Yield the records of rows start to stop, decoding a chunk at a time"""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        columns = [self.column(field) for field in COLUMNS]
+        for begin in range(max(start, 0), stop, READ_CHUNK):
+            end = min(begin + READ_CHUNK, stop)
+            values = [column.slice(begin, end) if isinstance(column, TextColumn)
+                      else column[begin:end].tolist() for column in columns]
+            for fields in zip(*values):
+                yield LoanRecord(*fields)
+
+    def __iter__(self):
+        return self.records()
+
+    def find(self, email):
+        """Row number of the record stored for email, or None"""
+        target = EmailIndex.normalize(email)
+        order = self._numbers(EMAIL_ORDER)
+        emails = self.column("email")
+        low, high = 0, self.row_count
+        while low < high:
+            middle = (low + high) // 2
+            if EmailIndex.normalize(emails[order[middle]]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.row_count and EmailIndex.normalize(emails[order[low]]) == target:
+            return order[low]
+        return None
+
+    def acquire(self):
+        with self._users_lock:
+            if self._retired:
+                raise SnapshotError(f"{self.path} was replaced")
+            self._users += 1
+        return self
+
+    def release(self):
+        with self._users_lock:
+            self._users -= 1
+            last = self._retired and not self._users
+        if last:
+            self.close()
+
+    def retire(self):
+        """Close the snapshot now, or when the last reader releases it"""
+        with self._users_lock:
+            self._retired = True
+            idle = not self._users
+        if idle:
+            self.close()
+
+    def close(self):
+        for values in self._columns.values():
+            if isinstance(values, memoryview):
+                values.release()
+        self._columns = {}
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # A caller still holds a column view; the mapping goes with it
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class SnapshotRepository(Repository):
+    """Read-only backend over a snapshot file.
+
+    Lookups are binary searches over the email order and pages are read
+    straight from the mapping, so even very large books open at once.
+    Writes other than update_all raise StorageError. When the file is
+    replaced, for instance by a fresh export, the next call maps the new
+    one; the old mapping stays open until the readers still going
+    through it, such as other threads' pages, are finished.
+    """
+
+    def __init__(self, path=SNAPSHOT_FILE):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.signature != self._stat_signature():
+            self._snapshot = Snapshot(self.path)
+            if snapshot is not None:
+                snapshot.retire()
+        return self._snapshot
+
+    @property
+    def snapshot(self):
+        """The mapped snapshot, reopened if the file was replaced"""
+        with self._lock:
+            return self._current()
+
+    def _acquire(self):
+        """The mapped snapshot, pinned open until it is released"""
+        with self._lock:
+            return self._current().acquire()
+
+    @contextlib.contextmanager
+    def _pinned(self):
+        snapshot = self._acquire()
+        try:
+            yield snapshot
+        finally:
+            snapshot.release()
+
+    @staticmethod
+    def _records(snapshot, start=0, stop=None):
+        # Takes over a pin the caller acquired, so a reader started before
+        # the file is replaced keeps its mapping until it is done
+        try:
+            yield from snapshot.records(start, stop)
+        finally:
+            snapshot.release()
+
+    def initialize(self):
+        if not os.path.exists(self.path):
+            raise SnapshotError(f"No snapshot at {self.path}; create one with "
+                                "'python src/snapshot.py export'")
+        self.snapshot  # maps the file, checking its header
+
+    def iter_records(self):
+        return self._records(self._acquire())
+
+    def fetch(self, offset, limit):
+        with self._pinned() as snapshot:
+            return list(snapshot.records(offset, offset + limit))
+
+    def append(self, record):
+        raise StorageError(READ_ONLY)
+
+    def append_many(self, records, skipped=None):
+        raise StorageError(READ_ONLY)
+
+    def delete(self, email):
+        raise StorageError(READ_ONLY)
+
+    @instrumented("snapshot.update_all")
+    def update_all(self, transform, chunk_size=10000):
+        # The transformed records become a new snapshot; the old mapping
+        # is retired before the file is replaced, which Windows requires
+        # unless other readers still hold it
+        visited = 0
+
+        def transformed(snapshot):
+            nonlocal visited
+            for start in range(0, len(snapshot), chunk_size):
+                chunk = list(snapshot.records(start, start + chunk_size))
+                visited += len(chunk)
+                yield from transform(chunk)
+
+        with self._pinned() as snapshot:
+            columns, count = build_columns(transformed(snapshot))
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.retire()
+                self._snapshot = None
+        write_columns(self.path, columns, count)
+        return visited
+
+    @instrumented("snapshot.email_exists")
+    def email_exists(self, email):
+        with self._pinned() as snapshot:
+            return snapshot.find(email) is not None
+
+    @instrumented("snapshot.get")
+    def get(self, email):
+        with self._pinned() as snapshot:
+            row = snapshot.find(email)
+            return None if row is None else snapshot[row]
+
+    def count(self):
+        return len(self.snapshot)
+
+    def change_token(self):
+        return self._stat_signature()
+
+    def change_cursor(self):
+        return self.snapshot.signature
+
+    def changes_since(self, cursor):
+        # A snapshot only ever changes by being replaced as a whole
+        signature = self.change_cursor()
+        return ([], [], cursor) if cursor == signature else None
+
+    def records_with_cursor(self):
+        snapshot = self._acquire()
+        return snapshot.signature, self._records(snapshot)
+
+    def close(self):
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.retire()
+                self._snapshot = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar snapshots of the loan book")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="write the database to a snapshot file")
+    export.add_argument("output", nargs="?", default=SNAPSHOT_FILE)
+    export.add_argument("--storage", help="storage backend (default: $BANK_STORAGE or csv)")
+    export.add_argument("--database", help="database path (default: $BANK_DATABASE)")
+    info = subparsers.add_parser("info", help="describe a snapshot file")
+    info.add_argument("path", nargs="?", default=SNAPSHOT_FILE)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "export":
+            repository = open_repository(args.storage, args.database)
+            try:
+                repository.initialize()
+                count = export_snapshot(repository, args.output)
+            finally:
+                repository.close()
+            print(f"Exported {count} records to {args.output}")
+        elif args.command == "info":
+            with Snapshot(args.path) as snapshot:
+                principal = sum(snapshot.column("loan_cents"))
+                print(f"{args.path}: {len(snapshot):,} records, "
+                      f"{os.path.getsize(args.path):,} bytes, snapshot version {VERSION}")
+                print(f"Outstanding principal: {format_money(principal)}")
+    except StorageError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,1820 @@
+import argparse
+import bisect
+import codecs
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:  # Windows locks byte ranges through msvcrt instead
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:  # neither: locking only keeps this process's threads apart
+        msvcrt = None
+else:
+    msvcrt = None
+
+try:
+    from .instrumentation import instrumentation, instrumented
+    from .records import FIELDNAMES, LoanRecord
+except ImportError:  # running as a script: python src/storage.py
+    from instrumentation import instrumentation, instrumented
+    from records import FIELDNAMES, LoanRecord
+
+DATABASE_FILE = "database.csv"
+SQLITE_FILE = "database.db"
+SNAPSHOT_FILE = "database.snap"
+TOMBSTONE_SUFFIX = ".tombstones"
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+
+# Every file is written as UTF-8. Files the original app wrote on Windows
+# used the ANSI code page instead, so rows that are not valid UTF-8 are
+# read as that; a rewrite, such as compaction, then stores them as UTF-8.
+ENCODING = "utf-8"
+LEGACY_ENCODING = "cp1252"
+
+# How hard the CSV backend works to keep acknowledged writes across a crash:
+#   full   fsync the journal before every write returns
+#   group  let writers that commit together share one fsync
+#   off    leave flushing to the operating system
+DURABILITY_MODES = ("full", "group", "off")
+
+# SQLite column for each LoanRecord field, in the same order
+COLUMNS = [
+    "name", "email", "dob", "loan_cents", "rate", "months",
+    "interest_cents", "total_interest_cents"
+]
+
+# Record fields the database view can be sorted by
+SORT_FIELDS = ("name", "email", "dob", "loan_cents", "rate", "months")
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def file_identity(path):
+    """Return a string that changes whenever path is replaced, or None"""
+    try:
+        return str(os.stat(path).st_ino)
+    except OSError:
+        return None
+
+def ends_mid_line(path):
+    """Return True if a non-empty file does not end with a newline"""
+    try:
+        with open(path, "rb") as file:
+            if file.seek(0, os.SEEK_END) == 0:
+                return False
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+def trim_torn_tail(path):
+    """Cut a partly written last line off a file left behind by a crash"""
+    if not ends_mid_line(path):
+        return
+    with open(path, "rb+") as file:
+        size = file.seek(0, os.SEEK_END)
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            file.seek(position - step)
+            newline = file.read(step).rfind(b"\n")
+            if newline >= 0:
+                position = position - step + newline + 1
+                break
+            position -= step
+        file.truncate(position)
+
+def sync_file(path):
+    """Flush a file's contents to disk, if it exists"""
+    try:
+        with open(path, "ab") as file:
+            os.fsync(file.fileno())
+    except FileNotFoundError:
+        pass
+
+def sync_directory(path):
+    """Make a rename in the directory holding path survive a power cut"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:  # Windows cannot open directories; renames are durable there
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write(path, write, binary=False):
+    """Replace path with the output of write(file), all or nothing.
+
+    write() fills a temporary file in the same directory, which is synced
+    to disk and then renamed over path, so a crash at any point leaves
+    either the old file or the complete new one. With binary, write()
+    gets a file opened for bytes instead of text.
+    """
+    import tempfile  # only writers need it; kept out of start-up
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".database-", suffix=".tmp")
+    try:
+        if binary:
+            file = os.fdopen(fd, "wb")
+        else:
+            file = os.fdopen(fd, "w", newline="", encoding=ENCODING)
+        with file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        remove_file(temp_path)
+        raise
+    sync_directory(path)
+
+class StorageError(Exception):
+    """Raised when the backing store cannot complete an operation"""
+
+class DuplicateEmailError(StorageError):
+    """Raised when a record with the same email is already stored"""
+
+# Column names older versions, hand-edited files and import files use,
+# matched case-insensitively, with the FIELDNAMES column each one holds
+HEADER_ALIASES = {
+    "customer name": "Name", "full name": "Name",
+    "email address": "Email",
+    "dob": "Date of Birth", "date_of_birth": "Date of Birth",
+    "loan amount ($)": "Loan amount", "amount": "Loan amount",
+    "interest rate": "Interest amount", "interest rate (%)": "Interest amount", "rate": "Interest amount",
+    "interest": "Interest money", "monthly interest": "Interest money",
+    "monthly interest ($)": "Interest money",
+    "months": "Month", "term": "Month", "term (months)": "Month", "loan term": "Month",
+    "total interest": "Interest money per month", "total interest ($)": "Interest money per month",
+    # The snake_case keys of JSON applications, as the importer and API take them
+    "loan_amount": "Loan amount", "interest_rate": "Interest amount",
+}
+HEADER_ALIASES.update((field.lower(), field) for field in FIELDNAMES)
+
+# Columns a rewritten file cannot do without; the interest figures are
+# derived from these and may be missing from older files
+REQUIRED_COLUMNS = ("Name", "Email", "Date of Birth", "Loan amount", "Interest amount", "Month")
+
+def map_header(headers):
+    """Return the FIELDNAMES column for each header, or None if unknown"""
+    return [HEADER_ALIASES.get(header.strip().lower()) for header in headers]
+
+def decode_text(data):
+    """Decode a line of a data file, falling back to LEGACY_ENCODING"""
+    try:
+        return data.decode(ENCODING)
+    except UnicodeDecodeError:
+        return data.decode(LEGACY_ENCODING, errors="replace")
+
+def parse_line(data):
+    return next(csv.reader([decode_text(data)]), [])
+
+def parse_header(data):
+    """Parse a header line, dropping the byte order mark Excel writes"""
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    return next(csv.reader([decode_text(data)]), [])
+
+# Where a RowReader stopped: which file, the byte offset after the last
+# complete row, the number of rows read up to there, and the bytes just
+# before the offset, to tell an append from a rewrite in place
+LoadCheckpoint = namedtuple("LoadCheckpoint", "identity offset rows tail")
+TAIL_SIZE = 64
+
+# A RowReader notes the byte offset of every this-many-th row, so a page
+# deep in the file can be read without parsing everything before it
+ROW_MARK_INTERVAL = 1000
+
+class RowReader:
+    """Streams the rows of a CSV database, resuming where it last stopped.
+
+    Rows come back as dicts keyed by FIELDNAMES, whatever the order or
+    spelling of the file's own header. The checkpoint records the byte
+    offset after the last complete row, so the next read() only parses
+    rows appended since. A partly written last row is left for later.
+    If the file was replaced, truncated or rewritten in place the reader
+    starts over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.checkpoint = None
+        self.columns = None
+        self.marks = []
+
+    def reset(self):
+        self.checkpoint = None
+        self.marks = []
+
+    def resumable(self):
+        """Return True if the next read() carries on from the checkpoint"""
+        checkpoint = self.checkpoint
+        if checkpoint is None:
+            return False
+        try:
+            with open(self.path, "rb") as file:
+                stat = os.fstat(file.fileno())
+                if ((stat.st_dev, stat.st_ino) != checkpoint.identity
+                        or stat.st_size < checkpoint.offset):
+                    return False
+                file.seek(checkpoint.offset - len(checkpoint.tail))
+                return file.read(len(checkpoint.tail)) == checkpoint.tail
+        except OSError:
+            return False
+
+    def _checkpoint(self, file, identity, offset, rows):
+        position = file.tell()
+        start = max(0, offset - TAIL_SIZE)
+        file.seek(start)
+        tail = file.read(offset - start)
+        file.seek(position)
+        return LoadCheckpoint(identity, offset, rows, tail)
+
+    def _parse(self, file, offset, rows):
+        """Yield (row number, row dict, start offset, end offset) from offset on"""
+        pending = b""
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            pending += line
+            if pending.count(b'"') % 2:
+                continue  # A quoted field spans lines; the row goes on
+            values = parse_line(pending)
+            start, offset = offset, offset + len(pending)
+            pending = b""
+            if not values:  # Blank lines are not rows, as in csv.DictReader
+                continue
+            yield rows, {column: value for column, value in zip(self.columns, values) if column}, start, offset
+            rows += 1
+
+    def read(self):
+        """Yield (row number, row dict) for every complete row not yet read"""
+        if not self.resumable():
+            self.reset()
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            stat = os.fstat(file.fileno())
+            identity = (stat.st_dev, stat.st_ino)
+            if self.checkpoint is None or self.checkpoint.identity != identity:
+                self.reset()
+                header = file.readline()
+                if not header.endswith(b"\n"):
+                    return
+                self.columns = map_header(parse_header(header))
+                self.checkpoint = self._checkpoint(file, identity, len(header), 0)
+            else:
+                file.seek(self.checkpoint.offset)
+
+            offset, rows = self.checkpoint.offset, self.checkpoint.rows
+            first = rows
+            try:
+                for row, fields, start, offset in self._parse(file, offset, rows):
+                    rows = row + 1
+                    if row % ROW_MARK_INTERVAL == 0 and len(self.marks) == row // ROW_MARK_INTERVAL:
+                        self.marks.append(start)
+                    yield row, fields
+            finally:
+                # Also runs when the caller stops early, covering the rows it got
+                if offset != self.checkpoint.offset:
+                    self.checkpoint = self._checkpoint(file, identity, offset, rows)
+                instrumentation.count("csv.rows_parsed", rows - first)
+
+    def read_from(self, row):
+        """Yield (row number, row dict) from the marked row at or before row.
+
+        Only rows already passed by read() can be found this way. Returns
+        None if there is no such mark or the file changed since.
+        """
+        mark = min(row // ROW_MARK_INTERVAL, len(self.marks) - 1)
+        if mark < 0 or not self.resumable():
+            return None
+        offset = self.marks[mark]
+
+        def rows():
+            with open(self.path, "rb") as file:
+                file.seek(offset)
+                for number, fields, _, _ in self._parse(file, offset, mark * ROW_MARK_INTERVAL):
+                    yield number, fields
+
+        return rows()
+
+class EmailIndex:
+    """Maps every live email in the database file to its row numbers.
+
+    Emails are case-normalized. The index is built once and kept current
+    on append and delete; every lookup compares the mtime and size of the
+    file and its tombstone log with the values recorded at the last sync.
+    When they changed behind our back, rows and tombstones appended since
+    are read from where the last read stopped; anything else triggers a
+    rebuild, which starts a new epoch.
+
+    Deleted rows stay in the file until compaction. The tombstone log
+    holds one "row,email" line per deletion, and an entry only counts if
+    the row it names still holds that email. The log's first line stamps
+    it with the identity of the data file it was started for, so a log
+    left behind by an interrupted compaction, which renumbers rows, is
+    ignored rather than hiding the wrong record.
+
+    Legacy files may hold an email on several rows; it stays in the
+    index until the last of them is deleted.
+    """
+
+    def __init__(self, path, tombstone_path=None):
+        self.path = path
+        self.tombstone_path = tombstone_path or path + TOMBSTONE_SUFFIX
+        self._emails = []  # email of every row, dead or alive
+        self._rows = {}  # email -> its live rows, oldest first
+        self.dead = set()
+        self._dead_rows = []  # self.dead, sorted
+        self.tombstones = []  # (row, email) of every valid tombstone, in log order
+        self.epoch = 0
+        self._reader = RowReader(path)
+        self._tombstone_offset = 0
+        self._signature = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def normalize(email):
+        return email.strip().lower()
+
+    @property
+    def row_count(self):
+        return len(self._emails)
+
+    @property
+    def live_count(self):
+        return len(self._emails) - len(self.dead)
+
+    def _stat_signature(self):
+        signature = []
+        for path in (self.path, self.tombstone_path):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    @instrumented("csv.index_rebuild")
+    def rebuild(self):
+        """Re-read every email from the database file and its tombstone log"""
+        with self._lock:
+            self.epoch += 1
+            self._emails = []
+            self._rows = {}
+            self.dead = set()
+            self._dead_rows = []
+            self.tombstones = []
+            self._reader.reset()
+            self._tombstone_offset = 0
+            self._read_new_entries()
+
+    def _read_new_entries(self):
+        for row, fields in self._reader.read():
+            if row != len(self._emails):
+                # The file was replaced between our checks; start over
+                self.rebuild()
+                return
+            email = self.normalize(fields.get("Email") or "")
+            self._emails.append(email)
+            self._rows.setdefault(email, []).append(row)
+
+        tombstones, self._tombstone_offset = read_tombstones(
+            self.tombstone_path, self._tombstone_offset, file_identity(self.path))
+        for row, email in tombstones:
+            if row < len(self._emails) and self._emails[row] == email and row not in self.dead:
+                self._mark_dead(row)
+                self.tombstones.append((row, email))
+        self._signature = self._stat_signature()
+
+    def _mark_dead(self, row):
+        self.dead.add(row)
+        bisect.insort(self._dead_rows, row)
+        email = self._emails[row]
+        rows = self._rows.get(email)
+        if rows is not None and row in rows:
+            rows.remove(row)
+            if not rows:
+                del self._rows[email]
+
+    def refresh(self):
+        """Catch up with changes made to the files since the index was last synced"""
+        with self._lock:
+            signature = self._stat_signature()
+            if signature == self._signature:
+                return
+            if self._resumable(signature):
+                self._read_new_entries()
+            else:
+                self.rebuild()
+
+    def catch_up(self):
+        """Read the rows and tombstones just appended to the files"""
+        with self._lock:
+            if self._resumable(self._stat_signature()):
+                self._read_new_entries()
+            else:
+                self.rebuild()
+
+    def _resumable(self, signature):
+        old, new = self._signature[1] if self._signature else None, signature[1]
+        if old is not None and (new is None or new[0] != old[0] or new[2] < self._tombstone_offset):
+            return False  # the log was replaced, removed or cut short
+        return self._reader.resumable()
+
+    def add(self, email):
+        """Record an email that was just appended as the last row.
+
+        Only the bytes written since the last read are parsed, and the
+        signature is taken afterwards, so the next lookup does not read
+        the file again.
+        """
+        self.catch_up()
+
+    def row_of(self, email):
+        """Return the newest live row holding email, or None"""
+        self.refresh()
+        rows = self._rows.get(self.normalize(email))
+        return rows[-1] if rows else None
+
+    def physical_row(self, position):
+        """Return the row number of the live record at position, or None"""
+        with self._lock:
+            if not 0 <= position < self.live_count:
+                return None
+            # Smallest row with position + 1 live rows up to and including it
+            low, high = position, position + len(self._dead_rows)
+            while low < high:
+                middle = (low + high) // 2
+                if middle + 1 - bisect.bisect_right(self._dead_rows, middle) > position:
+                    high = middle
+                else:
+                    low = middle + 1
+            return low
+
+    def discard(self, email):
+        """Forget an email whose record was removed behind the log's back"""
+        with self._lock:
+            rows = self._rows.get(self.normalize(email))
+            if rows:
+                self._mark_dead(rows[-1])
+            self._signature = self._stat_signature()
+
+    def __contains__(self, email):
+        self.refresh()
+        return self.normalize(email) in self._rows
+
+    def __len__(self):
+        """Return the number of live rows, blank and repeated emails included"""
+        self.refresh()
+        return self.live_count
+
+def tombstone_stamp(path):
+    """Return the data file identity a tombstone log was started for.
+
+    Logs written before stamps existed, and missing logs, give None.
+    """
+    try:
+        with open(path, "rb") as file:
+            line = file.readline()
+    except FileNotFoundError:
+        return None
+    if line.startswith(b"#") and line.endswith(b"\n"):
+        return line[1:].decode("ascii").strip()
+    return None
+
+def read_tombstones(path, offset=0, identity=None):
+    """Read a tombstone log from a byte offset on.
+
+    Returns the (row, email) entries found and the offset after the last
+    complete line; a torn last line is left for the next read. A log
+    stamped for a data file other than identity was left behind by an
+    interrupted rewrite, and yields nothing.
+    """
+    entries = []
+    try:
+        with open(path, "rb") as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                if line.startswith(b"#"):
+                    stamp = line[1:].decode("ascii").strip()
+                    if offset == 0 and identity is not None and stamp != identity:
+                        return [], 0
+                    offset += len(line)
+                    continue
+                offset += len(line)
+                row, _, email = decode_text(line).rstrip("\r\n").partition(",")
+                if row.isdigit() and email:
+                    entries.append((int(row), email))
+    except FileNotFoundError:
+        pass
+    return entries, offset
+
+def lock_file(file):
+    """Block until this process holds the exclusive lock on an open file"""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        return
+    file.seek(0)  # msvcrt locks bytes from the current position
+    while True:
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue  # LK_LOCK gives up after about ten seconds; keep waiting
+
+def unlock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+class FileLock:
+    """Reentrant advisory lock shared by every process using a database.
+
+    Threads of this process queue on an RLock, and the outermost holder
+    also takes an exclusive lock on a lock file next to the database, so
+    other processes wait as well: flock where there is one, a lock on
+    the file's first byte through msvcrt on Windows. A separate file is
+    locked because atomic rewrites replace the database file itself.
+    Readers never take the lock: rows are only ever appended or swapped
+    in whole by rename.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0 and (fcntl or msvcrt) is not None:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "ab")
+                lock_file(self._file)
+            except BaseException:
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            unlock_file(self._file)
+        self._lock.release()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class Journal:
+    """Write-ahead log of the changes made to a CSV database.
+
+    Each entry is one line holding a CRC32 checksum and a JSON payload.
+    A change is written here and committed before its write call
+    returns, so the data file and tombstone log never need an fsync of
+    their own: after a crash, replaying the journal restores anything
+    they lost. A torn or corrupt line marks the end of the log; it can
+    only belong to a commit that never finished.
+
+    In "group" mode a commit that finds another one syncing waits for
+    it and then syncs everything written meanwhile with a single fsync.
+    The committer that syncs can also linger for group_interval seconds,
+    or until group_rows entries are pending, to gather a larger group.
+    """
+
+    def __init__(self, path, durability="full", group_interval=0.0, group_rows=256):
+        if durability not in DURABILITY_MODES:
+            raise StorageError(f"Unknown durability mode: {durability}")
+        self.path = path
+        self.durability = durability
+        self.group_interval = group_interval
+        self.group_rows = group_rows
+        self.entries = 0  # entries written since the last reset
+        self._file = None
+        self._written = 0
+        self._synced = 0
+        self._pending = 0
+        self._syncing = False
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def encode(payload):
+        data = json.dumps(payload, separators=(",", ":"))
+        return f"{zlib.crc32(data.encode('utf-8')):08x} {data}\n".encode("utf-8")
+
+    @staticmethod
+    def decode(line):
+        """Return the payload of a journal line, or None if it is damaged"""
+        checksum, _, data = line.rstrip(b"\n").partition(b" ")
+        if not line.endswith(b"\n") or checksum != b"%08x" % zlib.crc32(data):
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def read(self):
+        """Return the payloads of every intact entry, in order"""
+        payloads = []
+        try:
+            with open(self.path, "rb") as file:
+                for line in file:
+                    payload = self.decode(line)
+                    if payload is None:
+                        break
+                    payloads.append(payload)
+        except FileNotFoundError:
+            pass
+        return payloads
+
+    def append(self, payloads):
+        """Write entries and return the sequence number to commit"""
+        data = b"".join(self.encode(payload) for payload in payloads)
+        with self._cond:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.write(data)
+            self._file.flush()
+            self._written += 1
+            self.entries += len(payloads)
+            self._pending += len(payloads)
+            if self._pending >= self.group_rows:
+                self._cond.notify_all()
+            return self._written
+
+    def commit(self, sequence):
+        """Block until the entries up to sequence are on disk"""
+        if self.durability == "off":
+            return
+        with self._cond:
+            while self._synced < sequence:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                try:
+                    if (self.durability == "group" and self.group_interval
+                            and self._pending < self.group_rows):
+                        self._cond.wait(self.group_interval)
+                    target, self._pending = self._written, 0
+                    file = self._file
+                    # Other writers may append while this fsync runs
+                    self._cond.release()
+                    try:
+                        with instrumentation.timed("journal.fsync"):
+                            os.fsync(file.fileno())
+                    finally:
+                        self._cond.acquire()
+                    self._synced = max(self._synced, target)
+                finally:
+                    self._syncing = False
+                    self._cond.notify_all()
+
+    def reset(self):
+        """Empty the log once everything in it is safely in the data files"""
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.truncate(0)
+            os.fsync(self._file.fileno())
+            self._synced = self._written
+            self._pending = 0
+            self.entries = 0
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class Repository:
+    """Interface every storage backend implements.
+
+    Records go in and come out as LoanRecord instances; each backend
+    decides how to lay them out on disk.
+    """
+
+    def initialize(self):
+        """Create the store if needed and check that it is usable"""
+        raise NotImplementedError
+
+    def iter_records(self):
+        """Yield every stored record in insertion order"""
+        raise NotImplementedError
+
+    def load(self):
+        return list(self.iter_records())
+
+    def fetch(self, offset, limit):
+        """Return at most limit records starting at position offset"""
+        return list(itertools.islice(self.iter_records(), offset, offset + limit))
+
+    def append(self, record):
+        """Store a new record, raising DuplicateEmailError on a clash"""
+        raise NotImplementedError
+
+    def append_many(self, records, skipped=None):
+        """Store records in one batch, skipping emails already stored.
+
+        Returns the number of records inserted. When skipped is a list,
+        the records left out because their email was taken, earlier in
+        the batch or before it, are appended to it.
+        """
+        inserted = 0
+        for record in records:
+            try:
+                self.append(record)
+            except DuplicateEmailError:
+                if skipped is not None:
+                    skipped.append(record)
+                continue
+            inserted += 1
+        return inserted
+
+    def delete(self, email):
+        """Remove the record for email, returning False if there was none"""
+        raise NotImplementedError
+
+    def delete_many(self, emails):
+        """Remove the records for several emails, returning how many existed"""
+        return sum(1 for email in emails if self.delete(email))
+
+    def update_all(self, transform, chunk_size=10000):
+        """Pass every record through transform in chunks and store the result.
+
+        transform receives a list of records and returns the replacement
+        records in the same order. Returns the number of records visited.
+        """
+        raise NotImplementedError
+
+    def email_exists(self, email):
+        raise NotImplementedError
+
+    def get(self, email):
+        """Return the record stored for email, or None"""
+        target = EmailIndex.normalize(email)
+        for record in self.iter_records():
+            if EmailIndex.normalize(record.email) == target:
+                return record
+        return None
+
+    def count(self):
+        return sum(1 for _ in self.iter_records())
+
+    def change_token(self):
+        """Cheap value that differs whenever the stored records changed.
+
+        Also covers changes made by other processes. None means the
+        backend cannot tell.
+        """
+        return None
+
+    def change_cursor(self):
+        """Position in the change feed read by changes_since(), or None"""
+        return None
+
+    def changes_since(self, cursor):
+        """Return (added records, removed records, new cursor) since cursor.
+
+        Every change is listed exactly once: a record both added and
+        removed since cursor appears in neither list. Returns None when
+        the changes cannot be listed, for instance after a rewrite, and
+        the caller has to reload everything.
+        """
+        return None
+
+    def query(self, text="", sort_by=None, descending=False):
+        """Find records by name or email in the store itself, ordered by a field.
+
+        Returns a result with total and page(offset, limit), like
+        RecordIndex.search, or None if the backend cannot search and the
+        caller has to keep an index of its own.
+        """
+        return None
+
+    def records_with_cursor(self):
+        """Return (cursor, records): the stored records as of cursor.
+
+        Following up with changes_since(cursor) gives exactly the changes
+        made since the records were read, so totals built from them never
+        count a record twice.
+        """
+        return self.change_cursor(), self.iter_records()
+
+    def close(self):
+        pass
+
+class CSVRepository(Repository):
+    """Flat-file backend compatible with the original database.csv.
+
+    Every change is recorded in a write-ahead Journal before it touches
+    the data file, and replayed by initialize() after a crash. Once
+    CHECKPOINT_ENTRIES changes have piled up, the data files are synced
+    and the journal emptied.
+
+    Deletes append to a tombstone log instead of rewriting the file.
+    Once the log names enough rows the file is compacted: live rows are
+    copied to a temporary file which atomically replaces the original.
+
+    Several processes can share one database: every read-modify-write
+    holds a FileLock and catches up with the files before deciding
+    anything, so duplicate checks and row numbers stay right.
+    """
+
+    # Compact once this many rows, and this share of the file, are dead
+    COMPACT_MIN_TOMBSTONES = 1000
+    COMPACT_RATIO = 0.25
+    CHECKPOINT_ENTRIES = 1000
+
+    def __init__(self, path=DATABASE_FILE, durability="full", group_interval=0.0, group_rows=256):
+        self.path = path
+        self.email_index = EmailIndex(path)
+        self.journal = Journal(path + JOURNAL_SUFFIX, durability, group_interval, group_rows)
+        self.lock = FileLock(path + LOCK_SUFFIX)
+        self._recovered = False
+
+    @property
+    def tombstone_path(self):
+        return self.email_index.tombstone_path
+
+    @instrumented("csv.initialize")
+    def initialize(self):
+        with self.lock:
+            try:
+                with open(self.path, "rb") as file:
+                    header = file.readline()
+            except FileNotFoundError:
+                header = b""
+            if not header.strip():
+                # Missing or empty file - create it with the correct headers
+                atomic_write(self.path, lambda file: csv.DictWriter(
+                    file, fieldnames=FIELDNAMES).writeheader())
+                remove_file(self.tombstone_path)
+            elif parse_header(header) != FIELDNAMES:
+                self.upgrade_header(parse_header(header))
+            self.recover()
+
+    def upgrade_header(self, headers):
+        """Rewrite a file with legacy or reordered columns under FIELDNAMES.
+
+        Rows keep their order, so tombstones and journal entries still
+        name the right rows. If some columns cannot be mapped, the
+        original file is kept next to the new one with a ".orig" suffix.
+        Raises StorageError, leaving the file alone, if a column in
+        REQUIRED_COLUMNS has no match or two columns map to the same one.
+        """
+        columns = map_header(headers)
+        known = [column for column in columns if column]
+        missing = [column for column in REQUIRED_COLUMNS if column not in known]
+        if missing or len(known) != len(set(known)):
+            reason = f" (no {', '.join(missing)} column)" if missing else ""
+            raise StorageError(
+                f"Cannot read the columns of {self.path}: {', '.join(headers)}{reason}. "
+                "The file was left unchanged.")
+        if None in columns:
+            import shutil  # only legacy files need it; kept out of start-up
+            shutil.copy2(self.path, self.path + ".orig")
+
+        def write(output):
+            writer = csv.DictWriter(output, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(row for _, row in RowReader(self.path).read())
+
+        with self.lock:
+            # Rows keep their numbers, so the log must hold for the new file too
+            self._stamp_tombstones(None)
+            atomic_write(self.path, write)
+            self.email_index.rebuild()
+
+    def _stamp_tombstones(self, identity):
+        """Tie the tombstone log to the data file with identity before a rewrite.
+
+        A rewrite renames the new data file into place and then removes
+        the log. Stamped with the old file's identity, a log that outlives
+        a crash in between is ignored rather than applied to renumbered
+        rows. With identity None the stamp is dropped, for rewrites that
+        keep row numbers. A log stamped for another file is already stale
+        and is removed.
+        """
+        try:
+            with open(self.tombstone_path, "rb") as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return
+        stamp = tombstone_stamp(self.tombstone_path)
+        if stamp is not None and stamp != file_identity(self.path):
+            remove_file(self.tombstone_path)
+        elif stamp != identity:
+            if stamp is not None:
+                del lines[0]
+            if lines and not lines[-1].endswith(b"\n"):
+                lines.pop()  # torn by a crash
+            if identity is not None:
+                lines.insert(0, f"#{identity}\n".encode("ascii"))
+            atomic_write(self.tombstone_path, lambda file: file.writelines(lines), binary=True)
+        else:
+            return
+        self.email_index.rebuild()
+
+    @instrumented("csv.recover")
+    def recover(self):
+        """Replay journal entries the data files lost in a crash.
+
+        Entries name the row they affect, so replay skips whatever was
+        already written and is safe to repeat. Returns the number of
+        entries applied.
+        """
+        with self.lock:
+            self._recovered = True
+            payloads = self.journal.read()
+            trim_torn_tail(self.path)
+            self.email_index.rebuild()
+            applied = 0
+            for payload in payloads:
+                kind, row = payload[0], payload[1]
+                if kind == "A" and row >= self.email_index.row_count:
+                    record = LoanRecord.from_row(dict(zip(FIELDNAMES, payload[2])))
+                    self._write_records([record])
+                    applied += 1
+                elif (kind == "D" and row not in self.email_index.dead
+                      and self.email_index.row_of(payload[2]) == row):
+                    self._write_tombstones({EmailIndex.normalize(payload[2]): row})
+                    applied += 1
+            self.checkpoint()
+            return applied
+
+    @instrumented("csv.checkpoint")
+    def checkpoint(self):
+        """Sync the data files to disk and empty the journal"""
+        with self.lock:
+            if not self._recovered:
+                # Never drop entries a crash may have kept out of the files
+                self.recover()
+                return
+            sync_file(self.path)
+            sync_file(self.tombstone_path)
+            self.journal.reset()
+
+    def _commit(self, sequence):
+        self.journal.commit(sequence)
+        if self.journal.entries >= self.CHECKPOINT_ENTRIES:
+            self.checkpoint()
+
+    def _write_records(self, records):
+        # A process that crashed mid-row left a line that was never
+        # acknowledged; cut it off so this row does not get glued onto it
+        trim_torn_tail(self.path)
+        with open(self.path, "a", newline="", encoding=ENCODING) as file:
+            writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+            if file.tell() == 0:  # Write header if file is empty
+                writer.writeheader()
+            writer.writerows(record.to_row() for record in records)
+        self.email_index.catch_up()
+
+    def _write_tombstones(self, tombstones):
+        identity = file_identity(self.path)
+        stamp = tombstone_stamp(self.tombstone_path)
+        if stamp is not None and stamp != identity:
+            remove_file(self.tombstone_path)  # left by an interrupted rewrite
+        with open(self.tombstone_path, "a", newline="", encoding=ENCODING) as file:
+            if file.tell() == 0 and identity is not None:
+                file.write(f"#{identity}\n")
+            elif ends_mid_line(self.tombstone_path):
+                file.write("\n")  # Seal off a line torn by a crash
+            file.writelines(f"{row},{email}\n" for email, row in tombstones.items())
+        self.email_index.catch_up()
+
+    def _journal_records(self, records):
+        first_row = self.email_index.row_count
+        rows = (record.to_row() for record in records)
+        return self.journal.append([
+            ["A", first_row + offset, [row[field] for field in FIELDNAMES]]
+            for offset, row in enumerate(rows)
+        ])
+
+    @instrumented("csv.iter_records")
+    def iter_records(self):
+        """Yield live records, upgrading rows written in the legacy format.
+
+        Rows whose figures cannot be read at all are skipped.
+        """
+        self.email_index.refresh()
+        dead = frozenset(self.email_index.dead)
+        for number, row in RowReader(self.path).read():
+            if number in dead:
+                continue
+            try:
+                yield LoanRecord.from_row(row)
+            except ValueError:
+                continue
+
+    @instrumented("csv.fetch")
+    def fetch(self, offset, limit):
+        """Read a page from the nearest row mark instead of from the top"""
+        index = self.email_index
+        with index._lock:
+            index.refresh()
+            start = index.physical_row(offset)
+            if start is None:
+                return []
+            dead = frozenset(index.dead)
+            rows = index._reader.read_from(start)
+        if rows is None:
+            return Repository.fetch(self, offset, limit)
+
+        records = []
+        for number, row in rows:
+            if number < start or number in dead:
+                continue
+            try:
+                records.append(LoanRecord.from_row(row))
+            except ValueError:
+                continue
+            if len(records) == limit:
+                rows.close()
+                break
+        return records
+
+    @instrumented("csv.append")
+    def append(self, record):
+        with self.lock:
+            if record.email in self.email_index:
+                raise DuplicateEmailError(
+                    f"This email address is already registered in our system: {record.email}")
+            sequence = self._journal_records([record])
+            self._write_records([record])
+        self._commit(sequence)
+
+    @instrumented("csv.append_many")
+    def append_many(self, records, skipped=None):
+        """Append a batch of records with a single buffered write and commit"""
+        with self.lock:
+            # Nobody else can write while we hold the lock, so one sync will do
+            self.email_index.refresh()
+            stored = self.email_index._rows
+            accepted = []
+            seen = set()
+            for record in records:
+                email = EmailIndex.normalize(record.email)
+                if email in seen or email in stored:
+                    if skipped is not None:
+                        skipped.append(record)
+                    continue
+                seen.add(email)
+                accepted.append(record)
+            if not accepted:
+                return 0
+            sequence = self._journal_records(accepted)
+            self._write_records(accepted)
+        self._commit(sequence)
+        return len(accepted)
+
+    def delete(self, email):
+        return self.delete_many([email]) == 1
+
+    @instrumented("csv.delete_many")
+    def delete_many(self, emails):
+        """Tombstone every listed email with a single append to the log"""
+        with self.lock:
+            tombstones = {}
+            for email in emails:
+                row = self.email_index.row_of(email)
+                if row is not None:
+                    tombstones[EmailIndex.normalize(email)] = row
+            if not tombstones:
+                return 0
+            sequence = self.journal.append([["D", row, email] for email, row in tombstones.items()])
+            self._write_tombstones(tombstones)
+        self._commit(sequence)
+
+        if self.needs_compaction():
+            self.compact()
+        return len(tombstones)
+
+    def needs_compaction(self):
+        dead = len(self.email_index.dead)
+        return (dead >= self.COMPACT_MIN_TOMBSTONES
+                and dead >= self.email_index.row_count * self.COMPACT_RATIO)
+
+    @instrumented("csv.compact")
+    def compact(self):
+        """Drop tombstoned rows by rewriting the file through an atomic rename"""
+        with self.lock:
+            # Row numbers change below, so journal entries must not outlive it
+            self.checkpoint()
+            self._compact()
+
+    def _compact(self):
+        self._stamp_tombstones(file_identity(self.path))
+        self.email_index.refresh()
+        dead = frozenset(self.email_index.dead)
+
+        def write(output):
+            writer = csv.DictWriter(output, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(row for number, row in RowReader(self.path).read()
+                             if number not in dead)
+
+        atomic_write(self.path, write)
+        remove_file(self.tombstone_path)
+        self.email_index.rebuild()
+
+    @instrumented("csv.update_all")
+    def update_all(self, transform, chunk_size=10000):
+        """Stream the live records through transform into a fresh file.
+
+        Tombstoned rows are dropped along the way, as in compact().
+        """
+        with self.lock:
+            self.checkpoint()
+            return self._update_all(transform, chunk_size)
+
+    def _update_all(self, transform, chunk_size):
+        visited = 0
+
+        def write(output):
+            nonlocal visited
+            writer = csv.DictWriter(output, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            records = self.iter_records()
+            while True:
+                chunk = list(itertools.islice(records, chunk_size))
+                if not chunk:
+                    break
+                writer.writerows(record.to_row() for record in transform(chunk))
+                visited += len(chunk)
+
+        self._stamp_tombstones(file_identity(self.path))
+        atomic_write(self.path, write)
+        remove_file(self.tombstone_path)
+        self.email_index.rebuild()
+        return visited
+
+    @instrumented("csv.email_exists")
+    def email_exists(self, email):
+        return email in self.email_index
+
+    @instrumented("csv.get")
+    def get(self, email):
+        # The index answers misses without touching the file, and finds
+        # the row of a hit so only the rows after its mark are parsed
+        row = self.email_index.row_of(email)
+        if row is None:
+            return None
+        found = self._read_rows([row])
+        if found is None:
+            return Repository.get(self, email)
+        return found.get(row)
+
+    @instrumented("csv.count")
+    def count(self):
+        return len(self.email_index)
+
+    def change_token(self):
+        # Appends, tombstones and rewrites all change a file's size or mtime
+        return self.email_index._stat_signature()
+
+    def change_cursor(self):
+        index = self.email_index
+        with index._lock:
+            index.refresh()
+            return (index.epoch, index.row_count, len(index.tombstones))
+
+    def changes_since(self, cursor):
+        index = self.email_index
+        with index._lock:
+            index.refresh()
+            if cursor is None or cursor[0] != index.epoch:
+                return None
+            _, first_row, first_tombstone = cursor
+            new_cursor = (index.epoch, index.row_count, len(index.tombstones))
+            # Rows added after cursor and already deleted were never seen
+            removed = self._read_rows(row for row, _ in index.tombstones[first_tombstone:]
+                                      if row < first_row)
+            added = self._read_rows(row for row in range(first_row, new_cursor[1])
+                                    if row not in index.dead)
+        if added is None or removed is None:
+            return None
+        return list(added.values()), list(removed.values()), new_cursor
+
+    def _read_rows(self, rows):
+        """Return {row number: record} for the given rows, or None if the file changed.
+
+        Rows are read through the reader's row marks, skipping ahead
+        whenever the next wanted row is more than a mark away.
+        """
+        wanted = sorted(rows)
+        found = {}
+        position = 0
+        while position < len(wanted):
+            rows = self.email_index._reader.read_from(wanted[position])
+            if rows is None:
+                return None
+            for number, row in rows:
+                if number < wanted[position]:
+                    continue
+                if number == wanted[position]:
+                    try:
+                        found[number] = LoanRecord.from_row(row)
+                    except ValueError:
+                        pass
+                position += 1
+                if position == len(wanted) or wanted[position] - number > ROW_MARK_INTERVAL:
+                    break
+            else:
+                break  # The file ended before the rows did
+            rows.close()
+        return found
+
+    def records_with_cursor(self):
+        index = self.email_index
+        with index._lock:
+            index.refresh()
+            cursor = (index.epoch, index.row_count, len(index.tombstones))
+            dead = frozenset(index.dead)
+
+        def records():
+            for number, row in RowReader(self.path).read():
+                if number >= cursor[1]:
+                    break
+                if number in dead:
+                    continue
+                try:
+                    yield LoanRecord.from_row(row)
+                except ValueError:
+                    continue
+
+        # Should the file be rewritten meanwhile, the epoch moves on and
+        # the next changes_since(cursor) asks for a reload
+        return cursor, records()
+
+    def close(self):
+        with self.lock:
+            if self.journal.entries:
+                self.checkpoint()
+            self.journal.close()
+        self.lock.close()
+
+def _change_trigger(event, logged, keep):
+    """SQL for a trigger copying rows into loans_changes on event.
+
+    logged lists ("new" or "old", added flag) pairs. Only the last keep
+    log entries are kept.
+    """
+    values = ", ".join(COLUMNS)
+    inserts = "".join(
+        f"INSERT INTO loans_changes (id, added, {values}) VALUES ({row}.id, {added}, "
+        + ", ".join(f"{row}.{column}" for column in COLUMNS) + "); "
+        for row, added in logged
+    )
+    return (f"CREATE TRIGGER IF NOT EXISTS loans_{event.lower()} AFTER {event} ON loans BEGIN "
+            f"{inserts}DELETE FROM loans_changes "
+            f"WHERE seq <= (SELECT max(seq) FROM loans_changes) - {keep}; END")
+
+def _like_pattern(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class SQLiteSearchResult:
+    """The ordered outcome of SQLiteRepository.query, read a page at a time.
+
+    Every page is its own query, so nothing is held in memory between
+    pages and writes made meanwhile show up on the next page. The total
+    is counted once, when first asked for.
+    """
+
+    STREAM_CHUNK = 1000
+
+    def __init__(self, repository, where, params, order):
+        self.repository = repository
+        self.where = where
+        self.params = params
+        self.order = order
+        self._total = None
+
+    @property
+    def total(self):
+        if self._total is None:
+            self._total = self.repository.connection.execute(
+                f"SELECT COUNT(*) FROM loans{self.where}", self.params).fetchone()[0]
+        return self._total
+
+    def page(self, offset, limit):
+        """Records at positions offset to offset + limit"""
+        rows = self.repository.connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM loans{self.where} ORDER BY {self.order} "
+            "LIMIT ? OFFSET ?", self.params + (limit, offset))
+        return [LoanRecord(*row) for row in rows]
+
+    def __iter__(self):
+        """Stream every matching record, one chunk at a time"""
+        offset = 0
+        while True:
+            records = self.page(offset, self.STREAM_CHUNK)
+            yield from records
+            if len(records) < self.STREAM_CHUNK:
+                return
+            offset += self.STREAM_CHUNK
+
+class SQLiteRepository(Repository):
+    """Indexed backend for large loan books.
+
+    Email uniqueness is enforced by an index on lower(email), so lookups
+    and deletes never scan the table. All statements are parameterized
+    constants, which lets sqlite3 reuse its prepared statement cache.
+    Each thread gets its own connection, so the repository can be used
+    from background workers. Other processes can share the file; SQLite
+    does the locking.
+
+    Triggers copy every inserted, updated and deleted row into the
+    loans_changes log, which changes_since() reads back. The log keeps
+    the last CHANGE_LOG_SIZE entries; a reader further behind reloads.
+
+    query() sorts through an index per sort field and searches names and
+    emails through an FTS5 trigram table kept current by triggers, so
+    no index of the whole book has to be held in memory. Where SQLite
+    was built without FTS5, searches scan the table instead.
+    """
+
+    CHANGE_LOG_SIZE = 10000
+
+    CREATE_TABLE = (
+        "CREATE TABLE IF NOT EXISTS loans ("
+        "id INTEGER PRIMARY KEY, "
+        "name TEXT NOT NULL, email TEXT NOT NULL, dob TEXT NOT NULL, "
+        "loan_cents INTEGER NOT NULL, rate INTEGER NOT NULL, "
+        "months INTEGER NOT NULL, interest_cents INTEGER NOT NULL, "
+        "total_interest_cents INTEGER NOT NULL)"
+    )
+    # Tables written before records were typed kept the display strings
+    LEGACY_COLUMNS = [
+        "name", "email", "dob", "loan_amount", "interest_rate",
+        "interest_money", "months", "total_interest"
+    ]
+    CREATE_EMAIL_INDEX = (
+        "CREATE UNIQUE INDEX IF NOT EXISTS loans_email "
+        "ON loans (lower(email))"
+    )
+    INSERT = (
+        "INSERT INTO loans (" + ", ".join(COLUMNS) + ") "
+        "VALUES (" + ", ".join("?" * len(COLUMNS)) + ")"
+    )
+    CREATE_CHANGE_LOG = (
+        "CREATE TABLE IF NOT EXISTS loans_changes ("
+        "seq INTEGER PRIMARY KEY, id INTEGER NOT NULL, added INTEGER NOT NULL, "
+        + ", ".join(COLUMNS) + ")"
+    )
+    CREATE_CHANGE_TRIGGERS = [
+        _change_trigger("INSERT", [("new", 1)], CHANGE_LOG_SIZE),
+        _change_trigger("DELETE", [("old", 0)], CHANGE_LOG_SIZE),
+        _change_trigger("UPDATE", [("old", 0), ("new", 1)], CHANGE_LOG_SIZE),
+    ]
+    # Sort key of each field, matching search.sort_value; a trailing id
+    # keeps equal values in insertion order
+    SORT_EXPRESSIONS = {
+        "name": "lower(name)", "email": "lower(email)", "dob": "dob",
+        "loan_cents": "loan_cents", "rate": "rate", "months": "months",
+    }
+    CREATE_SORT_INDEXES = [
+        f"CREATE INDEX IF NOT EXISTS loans_by_{field} ON loans ({expression})"
+        for field, expression in SORT_EXPRESSIONS.items() if field != "email"  # see loans_email
+    ]
+    CREATE_SEARCH_TABLE = (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS loans_search USING fts5("
+        "name, email, content='loans', content_rowid='id', tokenize='trigram')"
+    )
+    CREATE_SEARCH_TRIGGERS = [
+        "CREATE TRIGGER IF NOT EXISTS loans_search_insert AFTER INSERT ON loans BEGIN "
+        "INSERT INTO loans_search (rowid, name, email) VALUES (new.id, new.name, new.email); END",
+        "CREATE TRIGGER IF NOT EXISTS loans_search_delete AFTER DELETE ON loans BEGIN "
+        "INSERT INTO loans_search (loans_search, rowid, name, email) "
+        "VALUES ('delete', old.id, old.name, old.email); END",
+        "CREATE TRIGGER IF NOT EXISTS loans_search_update AFTER UPDATE OF name, email ON loans BEGIN "
+        "INSERT INTO loans_search (loans_search, rowid, name, email) "
+        "VALUES ('delete', old.id, old.name, old.email); "
+        "INSERT INTO loans_search (rowid, name, email) VALUES (new.id, new.name, new.email); END",
+    ]
+    # Matches of three or more characters, anywhere in a name or email
+    SEARCH_MATCH = " WHERE id IN (SELECT rowid FROM loans_search WHERE loans_search MATCH ?)"
+    SEARCH_SCAN = (" WHERE lower(name) LIKE ? ESCAPE '\\' "
+                   "OR lower(email) LIKE ? ESCAPE '\\'")
+    # Shorter text matches the start of a name word or of the email
+    SEARCH_PREFIX = (" WHERE lower(name) LIKE ? ESCAPE '\\' OR lower(name) LIKE ? ESCAPE '\\' "
+                     "OR lower(email) LIKE ? ESCAPE '\\'")
+    SELECT_CHANGES = ("SELECT seq, id, added, " + ", ".join(COLUMNS) + " FROM loans_changes "
+                      "WHERE seq > ? ORDER BY seq")
+    LAST_CHANGE = "SELECT coalesce(max(seq), 0) FROM loans_changes"
+    SELECT_ALL = "SELECT " + ", ".join(COLUMNS) + " FROM loans ORDER BY id"
+    SELECT_PAGE = SELECT_ALL + " LIMIT ? OFFSET ?"
+    SELECT_CHUNK = ("SELECT id, " + ", ".join(COLUMNS) + " FROM loans "
+                    "WHERE id > ? ORDER BY id LIMIT ?")
+    UPDATE_ID = ("UPDATE loans SET " + ", ".join(f"{column} = ?" for column in COLUMNS)
+                 + " WHERE id = ?")
+    SELECT_EMAIL = "SELECT 1 FROM loans WHERE lower(email) = lower(?)"
+    SELECT_RECORD = ("SELECT " + ", ".join(COLUMNS) + " FROM loans "
+                     "WHERE lower(email) = lower(?)")
+    DELETE_EMAIL = "DELETE FROM loans WHERE lower(email) = lower(?)"
+    COUNT = "SELECT COUNT(*) FROM loans"
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._watch = None
+        self.full_text = False
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @instrumented("sqlite.initialize")
+    def initialize(self):
+        with self.connection:
+            # DDL is not wrapped in a transaction implicitly; without this
+            # a crash mid-upgrade would leave the rows behind in loans_legacy
+            self.connection.execute("BEGIN")
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(loans)")]
+            if "loan_amount" in columns:
+                self._upgrade_legacy_table()
+            elif self.connection.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'loans_legacy'").fetchone():
+                self._upgrade_legacy_table(renamed=True)
+            self.connection.execute(self.CREATE_TABLE)
+            self.connection.execute(self.CREATE_EMAIL_INDEX)
+            self.connection.execute(self.CREATE_CHANGE_LOG)
+            for trigger in self.CREATE_CHANGE_TRIGGERS:
+                self.connection.execute(trigger)
+            for statement in self.CREATE_SORT_INDEXES:
+                self.connection.execute(statement)
+            self.full_text = self._create_search_table()
+
+    def _create_search_table(self):
+        """Add the trigram search table, filling it from an existing book.
+
+        Returns False if this SQLite has no FTS5.
+        """
+        connection = self.connection
+        existed = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'loans_search'").fetchone() is not None
+        try:
+            connection.execute(self.CREATE_SEARCH_TABLE)
+        except sqlite3.OperationalError:
+            return False
+        for trigger in self.CREATE_SEARCH_TRIGGERS:
+            connection.execute(trigger)
+        if not existed:
+            connection.execute("INSERT INTO loans_search (loans_search) VALUES ('rebuild')")
+        return True
+
+    def _upgrade_legacy_table(self, renamed=False):
+        """Convert a table of formatted TEXT columns to the typed schema.
+
+        Runs inside initialize()'s explicit transaction, so an interrupted
+        upgrade leaves the legacy table untouched. With renamed, the rows
+        were already moved to loans_legacy by an upgrade that ran without
+        one, and their copy is resumed. Rows whose figures cannot be
+        parsed are dropped.
+        """
+        connection = self.connection
+        if not renamed:
+            connection.execute("DROP INDEX IF EXISTS loans_email")
+            connection.execute("ALTER TABLE loans RENAME TO loans_legacy")
+        connection.execute(self.CREATE_TABLE)
+        rows = connection.execute(
+            "SELECT " + ", ".join(self.LEGACY_COLUMNS) + " FROM loans_legacy ORDER BY id"
+        )
+        upgraded = []
+        for row in rows:
+            try:
+                upgraded.append(self._to_row(LoanRecord.from_row(dict(zip(FIELDNAMES, row)))))
+            except ValueError:
+                continue
+        connection.executemany(self.INSERT.replace("INSERT", "INSERT OR IGNORE", 1), upgraded)
+        connection.execute("DROP TABLE loans_legacy")
+
+    @staticmethod
+    def _to_row(record):
+        return tuple(getattr(record, column) for column in COLUMNS)
+
+    @staticmethod
+    def _to_record(row):
+        return LoanRecord(*row)
+
+    @instrumented("sqlite.iter_records")
+    def iter_records(self):
+        for row in self.connection.execute(self.SELECT_ALL):
+            yield self._to_record(row)
+
+    @instrumented("sqlite.fetch")
+    def fetch(self, offset, limit):
+        rows = self.connection.execute(self.SELECT_PAGE, (limit, offset))
+        return [self._to_record(row) for row in rows]
+
+    @instrumented("sqlite.append")
+    def append(self, record):
+        try:
+            with self.connection:
+                self.connection.execute(self.INSERT, self._to_row(record))
+        except sqlite3.IntegrityError:
+            raise DuplicateEmailError(
+                f"This email address is already registered in our system: {record.email}")
+
+    @instrumented("sqlite.append_many")
+    def append_many(self, records, skipped=None):
+        """Insert a batch of records in one transaction.
+
+        Rows go in one at a time when the caller wants the skipped
+        records, so each clash can be told apart.
+        """
+        insert = self.INSERT.replace("INSERT", "INSERT OR IGNORE", 1)
+        with self.connection:
+            if skipped is None:
+                cursor = self.connection.executemany(
+                    insert, (self._to_row(record) for record in records)
+                )
+                return cursor.rowcount
+            inserted = 0
+            for record in records:
+                if self.connection.execute(insert, self._to_row(record)).rowcount:
+                    inserted += 1
+                else:
+                    skipped.append(record)
+        return inserted
+
+    @instrumented("sqlite.delete")
+    def delete(self, email):
+        with self.connection:
+            cursor = self.connection.execute(self.DELETE_EMAIL, (email.strip(),))
+        return cursor.rowcount > 0
+
+    @instrumented("sqlite.delete_many")
+    def delete_many(self, emails):
+        with self.connection:
+            cursor = self.connection.executemany(
+                self.DELETE_EMAIL, ((email.strip(),) for email in emails)
+            )
+        return cursor.rowcount
+
+    @instrumented("sqlite.update_all")
+    def update_all(self, transform, chunk_size=10000):
+        """Rewrite every row in one transaction, walking the table by id"""
+        visited = 0
+        last_id = 0
+        with self.connection:
+            while True:
+                rows = self.connection.execute(self.SELECT_CHUNK, (last_id, chunk_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                records = transform([self._to_record(row[1:]) for row in rows])
+                self.connection.executemany(self.UPDATE_ID, (
+                    self._to_row(record) + (row[0],) for record, row in zip(records, rows)
+                ))
+                visited += len(rows)
+        return visited
+
+    @instrumented("sqlite.email_exists")
+    def email_exists(self, email):
+        cursor = self.connection.execute(self.SELECT_EMAIL, (email.strip(),))
+        return cursor.fetchone() is not None
+
+    @instrumented("sqlite.get")
+    def get(self, email):
+        row = self.connection.execute(self.SELECT_RECORD, (email.strip(),)).fetchone()
+        return None if row is None else self._to_record(row)
+
+    @instrumented("sqlite.count")
+    def count(self):
+        return self.connection.execute(self.COUNT).fetchone()[0]
+
+    def query(self, text="", sort_by=None, descending=False):
+        if sort_by is not None and sort_by not in self.SORT_EXPRESSIONS:
+            raise ValueError(f"Cannot sort by {sort_by!r}")
+        direction = " DESC" if descending else ""
+        order = f"id{direction}"
+        if sort_by is not None:
+            order = f"{self.SORT_EXPRESSIONS[sort_by]}{direction}, {order}"
+
+        needle = text.strip().lower()
+        if not needle:
+            return SQLiteSearchResult(self, "", (), order)
+        if len(needle) < 3:
+            pattern = _like_pattern(needle)
+            return SQLiteSearchResult(self, self.SEARCH_PREFIX,
+                                      (f"{pattern}%", f"% {pattern}%", f"{pattern}%"), order)
+        if self.full_text:
+            phrase = '"' + needle.replace('"', '""') + '"'
+            return SQLiteSearchResult(self, self.SEARCH_MATCH, (phrase,), order)
+        pattern = f"%{_like_pattern(needle)}%"
+        return SQLiteSearchResult(self, self.SEARCH_SCAN, (pattern, pattern), order)
+
+    def change_token(self):
+        # data_version moves whenever any other connection commits, and the
+        # watch connection never writes, so it sees every thread and process
+        with self._connections_lock:
+            if self._watch is None:
+                self._watch = sqlite3.connect(self.path, check_same_thread=False)
+                self._connections.append(self._watch)
+            return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def change_cursor(self):
+        return self.connection.execute(self.LAST_CHANGE).fetchone()[0]
+
+    @instrumented("sqlite.changes_since")
+    def changes_since(self, cursor):
+        if cursor is None:
+            return None
+        entries = self.connection.execute(self.SELECT_CHANGES, (cursor,)).fetchall()
+        if not entries:
+            return [], [], cursor
+        if entries[0][0] != cursor + 1:
+            return None  # The log was trimmed past cursor
+        # An id's first entry tells what it held at cursor, its last what it holds now
+        first, last = {}, {}
+        for _, row_id, added, *row in entries:
+            first.setdefault(row_id, (added, row))
+            last.pop(row_id, None)
+            last[row_id] = (added, row)
+        removed = [self._to_record(row) for added, row in first.values() if not added]
+        added = [self._to_record(row) for added, row in last.values() if added]
+        return added, removed, entries[-1][0]
+
+    def records_with_cursor(self):
+        # A connection of its own keeps the read transaction open while the
+        # caller iterates, whatever the thread's connection does meanwhile
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        try:
+            connection.execute("BEGIN")
+            cursor = connection.execute(self.LAST_CHANGE).fetchone()[0]
+        except sqlite3.Error:
+            connection.close()
+            raise
+
+        def records():
+            try:
+                for row in connection.execute(self.SELECT_ALL):
+                    yield self._to_record(row)
+            finally:
+                connection.close()
+
+        return cursor, records()
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._watch = None
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+BACKENDS = {
+    "csv": (CSVRepository, DATABASE_FILE),
+    "sqlite": (SQLiteRepository, SQLITE_FILE),
+    "snapshot": (None, SNAPSHOT_FILE),  # SnapshotRepository, from snapshot.py
+}
+
+def environment_number(name, default, convert=int, minimum=0):
+    """Read a number of at least minimum from the environment variable name.
+
+    Raises StorageError naming the variable if it holds anything else.
+    """
+    text = os.environ.get(name, "").strip()
+    if not text:
+        return default
+    try:
+        value = convert(text)
+    except ValueError:
+        value = None
+    # NaN fails every comparison, so "not >=" also catches it
+    if value is None or not value >= minimum or value == float("inf"):
+        raise StorageError(f"{name} must be a number of at least {minimum}, not {text!r}")
+    return value
+
+def open_repository(backend=None, path=None):
+    """Build the configured repository.
+
+    The backend and path default to the BANK_STORAGE and BANK_DATABASE
+    environment variables, falling back to the CSV file. For the CSV
+    backend, BANK_DURABILITY picks one of DURABILITY_MODES, and
+    BANK_GROUP_COMMIT_MS and BANK_GROUP_COMMIT_ROWS how long, and for how
+    many pending rows at most, a group commit waits for company. Values
+    these cannot hold raise StorageError naming the variable.
+    """
+    backend = (backend or os.environ.get("BANK_STORAGE") or "csv").lower()
+    if backend not in BACKENDS:
+        raise StorageError(f"Unknown storage backend: {backend}")
+    cls, default_path = BACKENDS[backend]
+    path = path or os.environ.get("BANK_DATABASE") or default_path
+    if backend == "snapshot":
+        # snapshot.py builds on this module, so it is only imported on demand
+        try:
+            from .snapshot import SnapshotRepository
+        except ImportError:  # running as a script: python src/storage.py
+            from snapshot import SnapshotRepository
+        return SnapshotRepository(path)
+    if cls is CSVRepository:
+        durability = (os.environ.get("BANK_DURABILITY") or "full").strip().lower()
+        if durability not in DURABILITY_MODES:
+            raise StorageError(f"BANK_DURABILITY must be one of {', '.join(DURABILITY_MODES)}, "
+                               f"not {durability!r}")
+        group_interval = environment_number("BANK_GROUP_COMMIT_MS", 0.0, float) / 1000
+        group_rows = environment_number("BANK_GROUP_COMMIT_ROWS", 256, minimum=1)
+        return cls(path, durability, group_interval, group_rows)
+    return cls(path)
+
+def migrate_csv_to_sqlite(csv_path=DATABASE_FILE, sqlite_path=SQLITE_FILE):
+    """Copy every record of a CSV database into SQLite.
+
+    The CSV database is recovered first, so writes its journal holds are
+    copied too. Records whose email is already present are skipped, so
+    running the migration twice is harmless. Returns the number of rows
+    inserted.
+    """
+    source = CSVRepository(csv_path)
+    target = SQLiteRepository(sqlite_path)
+    try:
+        source.initialize()
+        target.initialize()
+        return target.append_many(source.iter_records())
+    finally:
+        target.close()
+        source.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bank System storage tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="copy a CSV database into SQLite")
+    migrate.add_argument("csv_path", nargs="?", default=DATABASE_FILE)
+    migrate.add_argument("sqlite_path", nargs="?", default=SQLITE_FILE)
+    compact = subparsers.add_parser("compact", help="drop deleted rows from a CSV database")
+    compact.add_argument("csv_path", nargs="?", default=DATABASE_FILE)
+    upgrade = subparsers.add_parser(
+        "upgrade", help="rewrite legacy formatted rows of a CSV database as raw numbers"
+    )
+    upgrade.add_argument("csv_path", nargs="?", default=DATABASE_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        inserted = migrate_csv_to_sqlite(args.csv_path, args.sqlite_path)
+        print(f"Migrated {inserted} records into {args.sqlite_path}")
+    elif args.command == "compact":
+        repository = CSVRepository(args.csv_path)
+        try:
+            repository.compact()
+            print(f"Compacted {args.csv_path}: {repository.count()} records")
+        finally:
+            repository.close()
+    elif args.command == "upgrade":
+        # Reading already upgrades each row; writing them back makes it stick
+        repository = CSVRepository(args.csv_path)
+        try:
+            repository.initialize()
+            upgraded = repository.update_all(list)
+            print(f"Upgraded {upgraded} records in {args.csv_path}")
+        finally:
+            repository.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+import functools
+import os
+import re
+from collections.abc import Mapping
+from datetime import date
+
+try:
+    from .instrumentation import instrumented
+except ImportError:  # imported from a script in src/
+    from instrumentation import instrumented
+
+# Form fields of an application, in the order the checks take them
+FIELDS = ("name", "email", "dob", "loan_amount", "interest_rate", "months")
+
+# Patterns are compiled once; fullmatch anchors them at both ends
+EMAIL_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+DOB_PATTERN = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+WHOLE_PATTERN = re.compile(r"[0-9]+")
+
+# Dates of birth must fall before this day; BANK_DOB_CUTOFF (YYYY-MM-DD)
+# moves it
+DEFAULT_DOB_CUTOFF = date(2025, 1, 1)
+
+# (message when empty, message when invalid) for each field
+MESSAGES = {
+    "name": ("Please enter the customer's full name.", None),
+    "email": ("Please enter the customer's email address.",
+              "Please enter a valid email address (e.g., user@example.com)."),
+    "dob": ("Please enter the date of birth.",
+            "Please enter a valid date of birth in YYYY-MM-DD format (must be before {cutoff})."),
+    "loan_amount": ("Please enter the loan amount.", "Loan amount must be a positive number."),
+    "interest_rate": ("Please enter the interest rate.", "Interest rate must be a positive number."),
+    "months": ("Please enter the loan term in months.",
+               "Loan term must be a positive number of months."),
+}
+
+class ConfigurationError(ValueError):
+    """Raised at start-up when an environment setting cannot be used"""
+
+def load_dob_cutoff(environ=os.environ):
+    """Read the cutoff for dates of birth from BANK_DOB_CUTOFF"""
+    value = environ.get("BANK_DOB_CUTOFF")
+    if not value:
+        return DEFAULT_DOB_CUTOFF
+    try:
+        return date.fromisoformat(value.strip())
+    except ValueError:
+        raise ConfigurationError(
+            f"BANK_DOB_CUTOFF must be a date in YYYY-MM-DD form, not {value!r}") from None
+
+# Read once, so a bad setting stops start-up instead of every check
+DOB_CUTOFF = load_dob_cutoff()
+
+def dob_cutoff():
+    """The configured cutoff for dates of birth"""
+    return DOB_CUTOFF
+
+def validate_email(email):
+    return EMAIL_PATTERN.fullmatch(email) is not None
+
+@functools.lru_cache(maxsize=4096)
+def parse_dob(dob):
+    """The date a YYYY-MM-DD string names, or None if there is no such day"""
+    match = DOB_PATTERN.fullmatch(dob)
+    if match is None:
+        return None
+    try:
+        return date(*(int(part) for part in match.groups()))
+    except ValueError:  # 2000-02-31 and the like
+        return None
+
+def validate_dob(dob, cutoff=None):
+    born = parse_dob(dob)
+    return born is not None and born < (cutoff or dob_cutoff())
+
+def is_positive_whole(value):
+    return WHOLE_PATTERN.fullmatch(value) is not None and int(value) > 0
+
+def check_field(field, value, cutoff=None):
+    """Return the message for a problem with one stripped form field, or None"""
+    missing, invalid = MESSAGES[field]
+    if not value:
+        return missing
+    if field == "email":
+        valid = validate_email(value)
+    elif field == "dob":
+        cutoff = cutoff or dob_cutoff()
+        valid = validate_dob(value, cutoff)
+    elif field == "name":
+        valid = True
+    else:
+        valid = is_positive_whole(value)
+    return None if valid else invalid.format(cutoff=cutoff)
+
+def check_fields(name, email, dob, loan_amount, interest_rate, months, cutoff=None):
+    """Return {field: message} for every field that breaks the form's rules"""
+    cutoff = cutoff or dob_cutoff()
+    errors = {}
+    for field, value in zip(FIELDS, (name, email, dob, loan_amount, interest_rate, months)):
+        message = check_field(field, value, cutoff)
+        if message is not None:
+            errors[field] = message
+    return errors
+
+@instrumented("validate.application")
+def validate_application(name, email, dob, loan_amount, interest_rate, months):
+    """Check the raw form fields of a loan application.
+
+    Returns the message for the first problem found, or None if the
+    application is valid. Fields are expected to be stripped strings.
+    """
+    errors = check_fields(name, email, dob, loan_amount, interest_rate, months)
+    return next(iter(errors.values()), None)
+
+@instrumented("validate.batch")
+def validate_batch(rows, cutoff=None):
+    """Check many applications in one call.
+
+    rows are mappings keyed by FIELDS, or sequences in FIELDS order, of
+    stripped strings. Returns one {field: message} dict per row, empty
+    when the row is valid. The cutoff is read once for the whole batch
+    and repeated dates of birth are parsed once.
+    """
+    cutoff = cutoff or dob_cutoff()
+    return [
+        check_fields(*((row.get(field, "") for field in FIELDS) if isinstance(row, Mapping) else row),
+                     cutoff=cutoff)
+        for row in rows
+    ]
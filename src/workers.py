@@ -0,0 +1,91 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait
+
+class IOExecutor:
+    """Runs storage work off the Tk thread.
+
+    Reads share a small thread pool. Writes go to a single worker so they
+    run one at a time, in the order they were submitted, and can never
+    interleave on disk. Finished jobs are queued and their callbacks are
+    invoked on the thread that calls poll(), which the GUI schedules with
+    root.after so widgets are only touched from the Tk thread.
+    """
+
+    POLL_INTERVAL = 50  # milliseconds
+
+    def __init__(self, schedule=None, on_busy_change=None, read_workers=2):
+        self._schedule = schedule
+        self.on_busy_change = on_busy_change
+        self._reads = ThreadPoolExecutor(max_workers=read_workers,
+                                         thread_name_prefix="bank-read")
+        self._writes = ThreadPoolExecutor(max_workers=1,
+                                          thread_name_prefix="bank-write")
+        self._results = queue.Queue()
+        self._futures = set()
+        self._quiet = set()  # background jobs that do not count as busy
+        self._polling = False
+
+    @property
+    def busy(self):
+        return bool(self._futures)
+
+    def submit(self, fn, *args, on_success=None, on_error=None, write=False, quiet=False):
+        """Run fn(*args) in the background and report back through poll().
+
+        A quiet job, such as a periodic check for changes, never turns
+        the busy state on.
+        """
+        was_busy = self.busy
+        pool = self._writes if write else self._reads
+        future = pool.submit(fn, *args)
+        (self._quiet if quiet else self._futures).add(future)
+        future.add_done_callback(
+            lambda done: self._results.put((done, on_success, on_error))
+        )
+        if not quiet and not was_busy and self.on_busy_change:
+            self.on_busy_change(True)
+        self._start_polling()
+        return future
+
+    def poll(self):
+        """Invoke the callbacks of every job that has finished so far"""
+        while True:
+            try:
+                future, on_success, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            quiet = future in self._quiet
+            self._futures.discard(future)
+            self._quiet.discard(future)
+            error = future.exception()
+            if error is None:
+                if on_success:
+                    on_success(future.result())
+            elif on_error:
+                on_error(error)
+            if not quiet and not self.busy and self.on_busy_change:
+                self.on_busy_change(False)
+
+    def drain(self, timeout=None):
+        """Block until all submitted jobs, and any they trigger, are done"""
+        while self._futures or self._quiet:
+            wait(list(self._futures | self._quiet), timeout=timeout)
+            self.poll()
+
+    def _start_polling(self):
+        if self._schedule is None or self._polling:
+            return
+        self._polling = True
+        self._schedule(self.POLL_INTERVAL, self._tick)
+
+    def _tick(self):
+        self._polling = False
+        self.poll()
+        if self._futures or self._quiet:
+            self._start_polling()
+
+    def shutdown(self):
+        """Finish queued writes, then stop both pools"""
+        self._writes.shutdown(wait=True)
+        self._reads.shutdown(wait=True)
+        self.poll()
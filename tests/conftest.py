@@ -0,0 +1,17 @@
+import pytest
+from src.service import LoanService
+from src.storage import open_repository
+
+@pytest.fixture(params=["csv", "sqlite"])
+def repository(request, tmp_path):
+    """An initialized, empty repository of each backend"""
+    suffix = "csv" if request.param == "csv" else "db"
+    repo = open_repository(request.param, str(tmp_path / f"database.{suffix}"))
+    repo.initialize()
+    yield repo
+    repo.close()
+
+@pytest.fixture
+def service(repository):
+    """A LoanService over each backend"""
+    return LoanService(repository)
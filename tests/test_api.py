@@ -0,0 +1,152 @@
+import asyncio
+import json
+from src.api import LoanAPIServer
+from src.storage import StorageError
+
+def application(name, email, amount="1000"):
+    return {"name": name, "email": email, "dob": "1990-01-01",
+            "loan_amount": amount, "interest_rate": "5", "months": "12"}
+
+async def request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = b"" if payload is None else json.dumps(payload).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(content) if content else None
+
+def run_with_server(service, scenario, **options):
+    async def main():
+        server = await LoanAPIServer(service, port=0, **options).start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+def test_submit_lookup_list_delete(service):
+    """Test every endpoint against a server on localhost"""
+    async def scenario(server):
+        port = server.port
+        status, record = await request(port, "POST", "/applications", application("ann lee", "Ann@Example.com"))
+        assert status == 201
+        assert record["name"] == "Ann Lee"
+        assert record["interest"] == 50
+        
+        assert (await request(port, "POST", "/applications", application("Ann", "ann@example.com")))[0] == 409
+        status, error = await request(port, "POST", "/applications", application("Bob", "bob"))
+        assert status == 400
+        assert "valid email" in error["error"]
+        
+        status, error = await request(port, "POST", "/applications",
+                                      dict(application("", "cy@example.com"), name=None))
+        assert status == 400
+        assert "name must be a string or a number" in error["error"]
+        assert (await request(port, "POST", "/applications",
+                              dict(application("Cy", "cy@example.com"), months=[12])))[0] == 400
+        assert not service.email_exists("cy@example.com")
+        
+        status, found = await request(port, "GET", "/applications/ann%40example.com")
+        assert (status, found["email"]) == (200, "ann@example.com")
+        
+        await request(port, "POST", "/applications", application("Bob", "bob@example.com"))
+        status, page = await request(port, "GET", "/applications?offset=1&limit=5")
+        assert status == 200
+        assert page["total"] == 2
+        assert [r["email"] for r in page["records"]] == ["bob@example.com"]
+        assert (await request(port, "GET", "/applications?limit=0"))[0] == 400
+        
+        assert (await request(port, "DELETE", "/applications/ann@example.com"))[0] == 204
+        assert (await request(port, "DELETE", "/applications/ann@example.com"))[0] == 404
+        assert (await request(port, "GET", "/applications/ann@example.com"))[0] == 404
+        assert (await request(port, "PUT", "/applications"))[0] == 405
+        assert (await request(port, "GET", "/nowhere"))[0] == 404
+        
+        status, metrics = await request(port, "GET", "/metrics")
+        assert status == 200
+        assert metrics["routes"]["submit"]["count"] == 6
+        assert metrics["requests_total"] >= 12
+        assert "p99_ms" in metrics["routes"]["lookup"]
+    
+    run_with_server(service, scenario)
+
+def test_concurrent_submissions_are_grouped(service):
+    """Test that concurrent writes share commits and duplicates are still caught"""
+    async def scenario(server):
+        applications = [application(f"User {i}", f"user{i}@example.com") for i in range(40)]
+        applications.append(application("Again", "user0@example.com"))
+        results = await asyncio.gather(*(
+            request(server.port, "POST", "/applications", item) for item in applications
+        ))
+        return sorted(status for status, _ in results), server.metrics.snapshot()
+    
+    statuses, metrics = run_with_server(service, scenario, max_delay=0.05)
+    
+    assert statuses == [201] * 40 + [409]
+    assert service.count() == 40
+    assert metrics["write_batches"] < 41
+    assert metrics["average_batch_size"] > 1
+
+def test_submit_list_of_applications(service):
+    """Test submitting several applications in one request"""
+    async def scenario(server):
+        return await request(server.port, "POST", "/applications", [
+            application("Ann", "ann@example.com"),
+            application("Bad", "bad@example.com", amount="zero"),
+            application("Ann Again", "ANN@example.com"),
+        ])
+    
+    status, results = run_with_server(service, scenario)
+    
+    assert status == 200
+    assert [result["status"] for result in results] == [201, 400, 409]
+    assert service.count() == 1
+
+def test_failed_record_does_not_fail_the_list(service, monkeypatch):
+    """Test that a storage failure is reported on its own record only"""
+    submit_many = service.submit_many
+    def failing_submit_many(records):
+        if any(record.email == "bad@example.com" for record in records):
+            raise StorageError("disk full")
+        return submit_many(records)
+    monkeypatch.setattr(service, "submit_many", failing_submit_many)
+    
+    async def scenario(server):
+        return await request(server.port, "POST", "/applications", [
+            application("Ann", "ann@example.com"),
+            application("Bad", "bad@example.com"),
+            application("Bob", "bob@example.com"),
+        ])
+    
+    status, results = run_with_server(service, scenario, max_batch=1)
+    
+    assert status == 200
+    assert [result["status"] for result in results] == [201, 500, 201]
+    assert "disk full" in results[1]["error"]
+    assert service.count() == 2
+
+async def raw_request(port, data):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split()[1]) if response else None
+
+def test_malformed_requests_are_refused(service):
+    """Test that a bad Content-Length gets 400 and an oversized header 431"""
+    async def scenario(server):
+        head = b"POST /applications HTTP/1.1\r\nHost: localhost\r\n"
+        return [
+            await raw_request(server.port, head + b"Content-Length: -5\r\n\r\n"),
+            await raw_request(server.port, head + b"Content-Length: lots\r\n\r\n"),
+            await raw_request(server.port, head + b"Content-Length: %d\r\n\r\n" % (2 * 1024 * 1024)),
+            await raw_request(server.port, head + b"X-Padding: " + b"a" * 100_000 + b"\r\n\r\n"),
+            await raw_request(server.port, b"GET /" + b"a" * 100_000 + b" HTTP/1.1\r\n\r\n"),
+        ]
+    
+    assert run_with_server(service, scenario) == [400, 400, 413, 431, 431]
@@ -1,16 +1,47 @@
 import pytest
-from src.bank_system import BankSystemGUI
+from src.bank_system import (
+    BankSystemGUI, DatabasePage, MainPage, PAGE_SIZE, ReportsPage, WINDOW_PAGES, window_overflow
+)
+from src.benchmark import GUI_STARTUP_BUDGET_MS, gui_startup_time
+from src.instrumentation import instrumentation
+from src.loans import build_record
+from src.storage import CSVRepository
 import csv
 import tkinter as tk
 
 @pytest.fixture
-def bank_system():
+def bank_system(tmp_path, monkeypatch):
+    # Keep the database, its journal and lock out of the working directory
+    monkeypatch.setenv("BANK_STORAGE", "csv")
+    monkeypatch.setenv("BANK_DATABASE", str(tmp_path / "database.csv"))
     # Create a proper Tk root window but keep it hidden
     root = tk.Tk()
     root.withdraw()  # Hide the window
     app = BankSystemGUI(root)
     yield app
-    root.destroy()  # Clean up after tests
+    app.executor.drain()  # Let background storage work finish
+    app.close()  # Stops the workers, closes the database and destroys root
+
+def test_pages_are_built_on_first_view(bank_system):
+    """Test that only the application form is built at start-up"""
+    assert list(bank_system.frames) == [MainPage]
+    bank_system.show_frame(DatabasePage)
+    assert DatabasePage in bank_system.frames
+    bank_system.show_frame(MainPage)
+
+def test_window_starts_within_budget(tmp_path):
+    """Test the cold start of the whole window in a fresh interpreter"""
+    assert gui_startup_time(str(tmp_path / "test_db.csv")) * 1000 < GUI_STARTUP_BUDGET_MS
+
+def test_window_is_trimmed_back_to_its_size():
+    """Test the row window arithmetic, which needs no display"""
+    capacity = PAGE_SIZE * WINDOW_PAGES
+    assert window_overflow(0, PAGE_SIZE) == 0
+    assert window_overflow(capacity - PAGE_SIZE, PAGE_SIZE) == 0
+    assert window_overflow(capacity, PAGE_SIZE) == PAGE_SIZE
+    # A page larger than the rows left in the window drops only the excess
+    assert window_overflow(capacity - 10, PAGE_SIZE) == PAGE_SIZE - 10
+    assert window_overflow(5, 20, capacity=10) == 5
 
 def test_validate_email(bank_system):
     """Test email validation logic"""
@@ -65,19 +96,200 @@ def test_email_exists(tmp_path, bank_system):
         writer.writerow(["Name", "Email", "Date of Birth"])
         writer.writerow(["Test User", "test@example.com", "2000-01-01"])
     
-    # Monkey patch the load_database method to use our test file
-    original_load = bank_system.load_database
-    
-    def mock_load_database():
-        with open(test_file, 'r') as f:
-            reader = csv.DictReader(f)
-            return list(reader)
-    
-    bank_system.load_database = mock_load_database
+    # Point the repository at our test file
+    original_repository = bank_system.repository
+    bank_system.repository = CSVRepository(str(test_file))
     
     # Test email exists
     assert bank_system.email_exists("test@example.com") is True
+    assert bank_system.email_exists("TEST@example.com") is True
     assert bank_system.email_exists("nonexistent@example.com") is False
     
-    # Restore original method
-    bank_system.load_database = original_load
\ No newline at end of file
+    # Restore original repository
+    bank_system.repository = original_repository
+
+def test_database_page_loads_one_window(tmp_path, bank_system):
+    """Test that the database view only materializes a window of rows"""
+    repository = CSVRepository(str(tmp_path / "test_db.csv"))
+    repository.initialize()
+    total = PAGE_SIZE * WINDOW_PAGES + PAGE_SIZE // 2
+    for i in range(total):
+        repository.append(build_record(f"User {i}", f"user{i}@example.com", "2000-01-01", 100, 1, 1))
+    
+    original_repository = bank_system.repository
+    bank_system.repository = repository
+    page = bank_system.frames[DatabasePage]
+    
+    page.load_data()
+    bank_system.executor.drain()
+    assert len(page.tree.get_children()) == PAGE_SIZE * WINDOW_PAGES
+    assert page.window_start == 0
+    
+    # Scrolling past the end pulls in the remaining rows and drops the oldest
+    page.shift_window(1)
+    bank_system.executor.drain()
+    items = page.tree.get_children()
+    assert page.window_start == PAGE_SIZE // 2
+    assert len(items) == PAGE_SIZE * WINDOW_PAGES
+    assert page.tree.item(items[-1])["values"][1] == f"user{total - 1}@example.com"
+    
+    # Scrolling back to the top restores the first rows
+    page.shift_window(-1)
+    bank_system.executor.drain()
+    items = page.tree.get_children()
+    assert page.window_start == 0
+    assert page.tree.item(items[0])["values"][1] == "user0@example.com"
+    
+    bank_system.repository = original_repository
+
+def test_database_page_search_and_sort(tmp_path, bank_system):
+    """Test that searching and clicking a heading reorder the database view"""
+    repository = CSVRepository(str(tmp_path / "test_db.csv"))
+    repository.initialize()
+    for i, name in enumerate(["Ann Lee", "Bob Stone", "Cara Lee"]):
+        repository.append(build_record(name, f"user{i}@example.com", "2000-01-01", 300 - i * 100, 1, 1))
+    
+    original_repository = bank_system.repository
+    bank_system.repository = repository
+    page = bank_system.frames[DatabasePage]
+    
+    def names():
+        return [page.tree.item(item)["values"][0] for item in page.tree.get_children()]
+    
+    page.sort_column("Loan Amount")
+    bank_system.executor.drain()
+    assert names() == ["Cara Lee", "Bob Stone", "Ann Lee"]
+    
+    page.search_entry.insert(0, "lee")
+    page.run_search()
+    bank_system.executor.drain()
+    assert names() == ["Cara Lee", "Ann Lee"]
+    
+    page.sort_column("Loan Amount")
+    bank_system.executor.drain()
+    assert names() == ["Ann Lee", "Cara Lee"]
+    assert page.tree.heading("Loan Amount", "text").endswith("\u25bc")
+    
+    page.clear_search()
+    bank_system.executor.drain()
+    assert len(names()) == 3
+    
+    bank_system.repository = original_repository
+
+def test_database_page_follows_other_processes(tmp_path, bank_system):
+    """Test that rows written by another process appear in the open view"""
+    repository = CSVRepository(str(tmp_path / "test_db.csv"))
+    repository.initialize()
+    repository.append(build_record("Ann Lee", "ann@example.com", "2000-01-01", 100, 1, 1))
+    
+    original_repository = bank_system.repository
+    bank_system.repository = repository
+    page = bank_system.frames[DatabasePage]
+    bank_system.show_frame(DatabasePage)
+    bank_system.executor.drain()
+    
+    other = CSVRepository(repository.path)
+    other.append(build_record("Bob Stone", "bob@example.com", "2000-01-01", 100, 1, 1))
+    other.delete("ann@example.com")
+    
+    page.poll_changes()
+    bank_system.executor.drain()
+    assert [page.tree.item(item)["values"][0] for item in page.tree.get_children()] == ["Bob Stone"]
+    
+    bank_system.show_frame(MainPage)
+    bank_system.repository = original_repository
+
+def test_reports_page_shows_portfolio_totals(tmp_path, bank_system):
+    """Test that the reports page shows totals and follows later deletes"""
+    repository = CSVRepository(str(tmp_path / "test_db.csv"))
+    repository.initialize()
+    repository.append(build_record("Ann Lee", "ann@example.com", "2000-01-01", 100, 1, 12))
+    repository.append(build_record("Bob Stone", "bob@example.com", "1960-01-01", 300, 1, 48))
+    
+    original_repository = bank_system.repository
+    bank_system.repository = repository
+    page = bank_system.frames[ReportsPage]
+    bank_system.show_frame(ReportsPage)
+    bank_system.executor.drain()
+    assert page.summary_labels["principal"].cget("text") == "400 $"
+    assert [page.trees["terms"].item(item)["values"][0]
+            for item in page.trees["terms"].get_children()] == ["Up to 12 months", "37-60 months"]
+    
+    bank_system.service.delete("bob@example.com")
+    page.recompute()
+    bank_system.executor.drain()
+    assert page.summary_labels["count"].cget("text") == "1"
+    assert page.recompute_progress is None
+    
+    bank_system.show_frame(MainPage)
+    bank_system.repository = original_repository
+
+def test_diagnostics_panel_shows_timings(tmp_path, bank_system):
+    """Test that the diagnostics panel lists the operations recorded so far"""
+    instrumentation.reset()
+    instrumentation.configure(True)
+    try:
+        repository = CSVRepository(str(tmp_path / "test_db.csv"))
+        repository.initialize()
+        original_repository = bank_system.repository
+        bank_system.repository = repository
+        bank_system.show_frame(DatabasePage)
+        bank_system.executor.drain()
+        
+        bank_system.show_diagnostics()
+        operations = [bank_system.diagnostics.tree.item(item)["values"][0]
+                      for item in bank_system.diagnostics.tree.get_children()]
+        assert "gui.load_data" in operations
+        assert "csv.count" in operations
+        
+        # Closing the panel cancels its refresh timer
+        window = bank_system.diagnostics
+        job = window.refresh_job
+        assert job in bank_system.root.tk.splitlist(bank_system.root.tk.call("after", "info"))
+        window.destroy()
+        assert job not in bank_system.root.tk.splitlist(bank_system.root.tk.call("after", "info"))
+        
+        bank_system.show_frame(MainPage)
+        bank_system.repository = original_repository
+    finally:
+        instrumentation.configure(False)
+        instrumentation.reset()
+
+def test_results_update_while_typing(bank_system):
+    """Test that the results panel follows the loan figures as they are entered"""
+    page = bank_system.frames[MainPage]
+    page.loan_entry.insert(0, "1000")
+    page.interest_entry.insert(0, "5")
+    page.month_entry.insert(0, "3")
+    
+    page.update_results()
+    assert page.month_result.cget("text") == "Total Interest for 3 months: 150 $"
+    assert page.payment_result.cget("text") == "Monthly Payment: 383 $ (total repaid 1,150 $)"
+    
+    page.month_entry.delete(0, "end")
+    page.update_results()
+    assert page.month_result.cget("text") == ""
+
+def test_fields_are_checked_while_typing(tmp_path, bank_system):
+    """Test that live validation flags bad fields and taken emails"""
+    repository = CSVRepository(str(tmp_path / "test_db.csv"))
+    repository.initialize()
+    repository.append(build_record("Ann Lee", "ann@example.com", "2000-01-01", 100, 1, 1))
+    original_repository = bank_system.repository
+    bank_system.repository = repository
+    page = bank_system.frames[MainPage]
+    
+    page.dob_entry.insert(0, "2000-02-31")
+    page.validate_field("dob")
+    assert "valid date of birth" in page.validation_label.cget("text")
+    assert page.dob_entry.cget("style") == "Invalid.TEntry"
+    
+    page.email_entry.insert(0, "ann@example.com")
+    page.validate_field("email")
+    bank_system.executor.drain()
+    assert page.validation_label.cget("text") == "This email address is already registered in our system."
+    
+    page.clear_fields()
+    assert page.validation_label.cget("text") == ""
+    assert page.dob_entry.cget("style") == "TEntry"
+    bank_system.repository = original_repository
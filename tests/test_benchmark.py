@@ -0,0 +1,60 @@
+import json
+import subprocess
+import sys
+from src.benchmark import (
+    STARTUP_BUDGET_MS, STARTUP_MODULES, compare, import_time, main, run, synthetic_records
+)
+
+def test_synthetic_records_are_reproducible():
+    """Test that a seed always generates the same loan book"""
+    first = list(synthetic_records(50, seed=7))
+    assert first == list(synthetic_records(50, seed=7))
+    assert len({record.email for record in first}) == 50
+
+def test_benchmark_reports_every_operation():
+    """Test that each operation gets latency percentiles and a memory peak"""
+    results = run(["csv", "sqlite"], [200], iterations=5, budget=1.0, report=lambda message: None)
+    operations = {key.split("/")[2] for key in results["results"]}
+    assert operations == {"first_query", "submit", "email_exists", "email_missing", "lookup",
+                          "list_page", "query", "delete"}
+    for key, figures in results["results"].items():
+        # The cold first query is timed once
+        assert figures["samples"] == (1 if "first_query" in key else 5)
+        assert 0 <= figures["p50_ms"] <= figures["p95_ms"] <= figures["p99_ms"]
+        assert figures["peak_kib"] >= 0
+
+def test_compare_flags_regressions():
+    """Test that only growth beyond the tolerance and the noise floor is reported"""
+    baseline = {"results": {
+        "csv/service/lookup/1000": {"p50_ms": 10.0, "peak_kib": 100.0},
+        "csv/service/list_page/1000": {"p50_ms": 0.1, "peak_kib": 100.0},
+    }}
+    results = {"results": {
+        "csv/service/lookup/1000": {"p50_ms": 20.0, "peak_kib": 1000.0},
+        "csv/service/list_page/1000": {"p50_ms": 0.3, "peak_kib": 120.0},
+        "csv/service/query/1000": {"p50_ms": 50.0, "peak_kib": 5000.0},
+    }}
+    assert compare(results, baseline) == [
+        "csv/service/lookup/1000: p50 20.0 ms, baseline 10.0 ms",
+        "csv/service/lookup/1000: peak 1000.0 KiB, baseline 100.0 KiB",
+    ]
+    assert compare(results, baseline, tolerance=20) == []
+
+def test_main_saves_baseline(tmp_path, capsys):
+    """Test that --save-baseline merges the results into the baseline file"""
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"results": {"sqlite/service/lookup/1": {"p50_ms": 1, "peak_kib": 1}}}))
+    
+    assert main(["--sizes", "100", "--iterations", "3", "--baseline", str(path), "--save-baseline"]) == 0
+    saved = json.loads(path.read_text())["results"]
+    assert "sqlite/service/lookup/1" in saved
+    assert "csv/service/submit/100" in saved
+    assert "csv/service/submit/100" in capsys.readouterr().out
+
+def test_entry_points_start_within_budget():
+    """Test that headless entry points import quickly and never load tkinter"""
+    for module in STARTUP_MODULES:
+        assert min(import_time(module) for _ in range(3)) * 1000 < STARTUP_BUDGET_MS, module
+    code = "import sys, src.bank_system; print('tkinter' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,39 @@
+import json
+from src.cli import main
+
+def run(capsys, database, *args):
+    code = main(["--database", database, *args])
+    captured = capsys.readouterr()
+    return code, captured.out, captured.err
+
+def test_cli_round_trip(tmp_path, capsys):
+    """Test submit, list, search and delete from the command line"""
+    database = str(tmp_path / "database.csv")
+    
+    code, out, _ = run(capsys, database, "submit", "--name", "jane doe", "--email", "jane@example.com",
+                       "--dob", "1990-01-01", "--amount", "5000", "--rate", "10", "--months", "12")
+    assert code == 0
+    assert out.startswith("Jane Doe | jane@example.com")
+    assert "500 $ | 12 months | 6000 $" in out
+    
+    code, out, _ = run(capsys, database, "--json", "list")
+    assert code == 0
+    assert json.loads(out)["interest"] == 500
+    
+    code, out, _ = run(capsys, database, "search", "JANE")
+    assert "jane@example.com" in out
+    
+    code, out, _ = run(capsys, database, "report")
+    assert "Outstanding principal: 5000 $" in out
+    
+    assert run(capsys, database, "delete", "jane@example.com")[0] == 0
+    code, _, err = run(capsys, database, "delete", "jane@example.com")
+    assert code == 1
+    assert "No record found" in err
+
+def test_cli_reports_validation_errors(tmp_path, capsys):
+    """Test that bad input is reported without a traceback"""
+    code, _, err = run(capsys, str(tmp_path / "database.csv"), "submit", "--name", "Jane",
+                       "--email", "nope", "--dob", "1990-01-01", "--amount", "1", "--rate", "1", "--months", "1")
+    assert code == 1
+    assert err.startswith("error: Please enter a valid email address")
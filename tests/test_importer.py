@@ -0,0 +1,116 @@
+import pytest
+import csv
+import json
+from src.importer import import_file, main
+from src.loans import build_record
+from src.storage import CSVRepository
+
+@pytest.fixture
+def repository(tmp_path):
+    repo = CSVRepository(str(tmp_path / "database.csv"))
+    repo.initialize()
+    return repo
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name", "Email", "Date of Birth", "Loan amount", "Interest amount", "Month"])
+        writer.writerows(rows)
+
+def read_rejects(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+def test_import_csv(tmp_path, repository):
+    """Test that valid rows are stored and bad rows are rejected with reasons"""
+    repository.append(build_record("Existing", "existing@example.com", "1990-05-01", 100, 1, 1))
+    source = tmp_path / "applications.csv"
+    write_csv(source, [
+        ["alice smith", "Alice@Example.com", "1990-05-01", "1000", "5", "12"],
+        ["Bob", "not-an-email", "1990-05-01", "1000", "5", "12"],
+        ["Carol", "carol@example.com", "1990-05-01", "-3", "5", "12"],
+        ["Alice Again", "alice@example.com", "1990-05-01", "1000", "5", "12"],
+        ["Existing", "existing@example.com", "1990-05-01", "1000", "5", "12"],
+        ["Dave", "dave@example.com", "1985-01-31", "2000 $", "10 %", "24 months"],
+    ])
+    rejects = tmp_path / "rejects.csv"
+    
+    result = import_file(str(source), repository, str(rejects), batch_size=2)
+    
+    assert (result.accepted, result.rejected) == (2, 4)
+    stored = repository.load()
+    assert [r.email for r in stored] == ["existing@example.com", "alice@example.com", "dave@example.com"]
+    assert stored[1].name == "Alice Smith"
+    assert stored[2].interest_cents == 20_000
+    assert stored[2].total_interest_cents == 480_000
+    
+    reasons = {r["Line"]: r["Reason"] for r in read_rejects(rejects)}
+    assert set(reasons) == {"3", "4", "5", "6"}
+    assert "valid email" in reasons["3"]
+    assert reasons["4"] == "Loan amount must be a positive number."
+    assert "already registered" in reasons["5"]
+    assert "already registered" in reasons["6"]
+
+def test_import_jsonl(tmp_path, repository):
+    """Test importing JSON Lines input with snake_case keys"""
+    source = tmp_path / "applications.jsonl"
+    with open(source, 'w') as f:
+        f.write(json.dumps({"name": "Eve", "email": "eve@example.com", "dob": "1970-07-07",
+                            "loan_amount": 300, "interest_rate": 3, "months": 6}) + "\n")
+        f.write("{broken\n")
+    rejects = tmp_path / "rejects.csv"
+    
+    result = import_file(str(source), repository, str(rejects))
+    
+    assert (result.accepted, result.rejected) == (1, 1)
+    assert repository.load()[0].interest_cents == 900
+    assert read_rejects(rejects)[0]["Reason"].startswith("Invalid JSON")
+
+def test_import_accepts_the_database_header_spellings(tmp_path, repository):
+    """Test that input headers are read with the same aliases as legacy database files"""
+    source = tmp_path / "applications.csv"
+    with open(source, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Customer Name", "Email Address", "DOB", "Loan Amount ($)",
+                         "Interest Rate (%)", "Term (Months)", "Branch"])
+        writer.writerow(["Fay Wu", "fay@example.com", "1988-08-08", "3000", "6", "24", "North"])
+    
+    result = import_file(str(source), repository)
+    
+    assert (result.accepted, result.rejected) == (1, 0)
+    stored = repository.get("fay@example.com")
+    assert (stored.name, stored.loan_cents, stored.rate, stored.months) == ("Fay Wu", 300_000, 6, 24)
+
+def test_import_rejects_emails_stored_during_the_batch(tmp_path, repository, monkeypatch):
+    """Test that a row losing a race for its email is rejected, not lost"""
+    source = tmp_path / "applications.csv"
+    write_csv(source, [
+        ["Fay", "fay@example.com", "1990-05-01", "1000", "5", "12"],
+        ["Gus", "gus@example.com", "1990-05-01", "1000", "5", "12"],
+    ])
+    rejects = tmp_path / "rejects.csv"
+    # Another writer stores Gus between the check and the batch write
+    email_exists = repository.email_exists
+    def stored_meanwhile(email):
+        found = email_exists(email)
+        if email == "gus@example.com":
+            CSVRepository(repository.path).append(
+                build_record("Gus", "gus@example.com", "1990-05-01", 5, 1, 1))
+        return found
+    monkeypatch.setattr(repository, "email_exists", stored_meanwhile)
+    
+    result = import_file(str(source), repository, str(rejects))
+    
+    assert (result.accepted, result.rejected) == (1, 1)
+    assert [(r["Line"], r["email"]) for r in read_rejects(rejects)] == [("3", "gus@example.com")]
+    assert "already registered" in read_rejects(rejects)[0]["Reason"]
+
+def test_import_command(tmp_path, capsys):
+    """Test the command-line entry point"""
+    source = tmp_path / "applications.csv"
+    write_csv(source, [["Frank", "frank@example.com", "1960-03-03", "100", "1", "1"]])
+    database = tmp_path / "database.db"
+    
+    assert main([str(source), "--storage", "sqlite", "--database", str(database)]) == 0
+    assert "Imported 1 applications, rejected 0" in capsys.readouterr().out
+    assert (tmp_path / "applications.rejects.csv").exists()
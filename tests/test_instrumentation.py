@@ -0,0 +1,117 @@
+import pytest
+import os
+import pstats
+import time
+from src.api import LoanAPIServer
+from src.instrumentation import Instrumentation, instrumentation, instrumented
+from src.service import LoanService
+
+@pytest.fixture
+def recording():
+    """Turn the process-wide instrumentation on for one test"""
+    instrumentation.reset()
+    instrumentation.configure(True)
+    yield instrumentation
+    instrumentation.configure(False)
+    instrumentation.reset()
+
+def test_timers_and_counters():
+    """Test that timed blocks, timers and counters add up"""
+    metrics = Instrumentation(enabled=True)
+    for _ in range(3):
+        with metrics.timed("storage.read"):
+            pass
+    with pytest.raises(KeyError):
+        with metrics.timed("storage.read"):
+            raise KeyError("missing")
+    metrics.start("gui.load_data").stop()
+    metrics.count("csv.rows_parsed", 40)
+    metrics.count("csv.rows_parsed", 2)
+    
+    snapshot = metrics.snapshot()
+    assert snapshot["operations"]["storage.read"]["count"] == 4
+    assert snapshot["operations"]["storage.read"]["errors"] == 1
+    assert snapshot["operations"]["gui.load_data"]["count"] == 1
+    assert snapshot["counters"] == {"csv.rows_parsed": 42}
+
+def test_disabled_instrumentation_records_nothing():
+    """Test that hooks cost nothing and keep nothing while switched off"""
+    metrics = Instrumentation()
+    with metrics.timed("storage.read"):
+        pass
+    metrics.start("gui.load_data").stop()
+    metrics.count("csv.rows_parsed")
+    assert metrics.snapshot()["operations"] == {}
+    assert metrics.snapshot()["counters"] == {}
+
+def test_generators_closed_early_are_not_errors(recording):
+    """Test that a consumer stopping early counts as a normal call"""
+    @instrumented("storage.scan")
+    def scan():
+        yield from range(10)
+    
+    rows = scan()
+    assert next(rows) == 0
+    rows.close()
+    operation = recording.snapshot()["operations"]["storage.scan"]
+    assert (operation["count"], operation["errors"]) == (1, 0)
+    assert recording.snapshot()["counters"] == {"storage.scan.items": 1}
+
+def test_generators_time_only_their_own_steps(recording):
+    """Test that the consumer's work between items is left out of a generator's timing"""
+    @instrumented("storage.scan")
+    def scan():
+        yield from range(3)
+    
+    for _ in scan():
+        with recording.timed("gui.insert"):
+            time.sleep(0.02)
+    operations = recording.snapshot()["operations"]
+    assert operations["storage.scan"]["count"] == 1
+    assert operations["storage.scan"]["total_seconds"] < 0.02
+    assert operations["gui.insert"]["count"] == 3
+    assert recording.snapshot()["counters"] == {"storage.scan.items": 3}
+
+def test_prometheus_export():
+    """Test the text exposition format of timings, errors and counters"""
+    metrics = Instrumentation(enabled=True)
+    metrics.record("csv.append", 0.002)
+    metrics.record("csv.append", 0.004, failed=True)
+    metrics.count("csv.rows_parsed", 7)
+    
+    lines = metrics.to_prometheus().splitlines()
+    assert "# TYPE bank_operation_seconds summary" in lines
+    assert 'bank_operation_seconds{operation="csv.append",quantile="0.5"} 0.002' in lines
+    assert 'bank_operation_seconds_count{operation="csv.append"} 2' in lines
+    assert 'bank_operation_errors_total{operation="csv.append"} 1' in lines
+    assert 'bank_events_total{event="csv.rows_parsed"} 7' in lines
+
+def test_storage_and_service_calls_are_timed(tmp_path, recording):
+    """Test that repository and service operations report to the instrumentation"""
+    service = LoanService.open("csv", str(tmp_path / "database.csv"))
+    service.submit("Ann Lee", "ann@example.com", "1990-01-01", "1000", "5", "12")
+    assert service.email_exists("ann@example.com")
+    assert len(service.list(0, 10)) == 1
+    service.close()
+    
+    snapshot = recording.snapshot()
+    for operation in ("csv.append", "csv.email_exists", "csv.fetch", "service.submit",
+                      "validate.application", "journal.fsync"):
+        assert snapshot["operations"][operation]["count"] >= 1, operation
+    assert snapshot["counters"]["csv.rows_parsed"] >= 1
+    assert "csv.append" in LoanAPIServer(service).prometheus_text()
+
+def test_profiles_are_recorded_per_operation(tmp_path):
+    """Test that cProfile stats and tracemalloc peaks are kept per outermost operation"""
+    metrics = Instrumentation(enabled=True, profile=["cprofile", "tracemalloc"])
+    with metrics.timed("build"):
+        with metrics.timed("inner"):
+            data = [str(number) for number in range(10000)]
+    del data
+    
+    assert set(metrics.profiles) == {"build"}
+    assert metrics.memory_peaks["build"] > 10000
+    paths = metrics.dump_profiles(str(tmp_path))
+    assert sorted(os.path.basename(path) for path in paths) == ["build.prof", "build.tracemalloc"]
+    assert pstats.Stats(str(tmp_path / "build.prof")).total_calls > 0
+    metrics.configure(False)
@@ -0,0 +1,107 @@
+import pytest
+import csv
+import io
+import itertools
+import random
+import subprocess
+import sys
+from array import array
+from src import loans
+from src.loans import (
+    amortization_schedule, amortization_summary, build_record,
+    calculate_interest, calculate_interest_batch, calculate_monthly_interest, write_schedules
+)
+from src.records import LoanRecord
+from src.validation import validate_application
+
+def test_validate_application():
+    """Test that the first problem with an application is reported"""
+    valid = ("Test User", "test@example.com", "2000-01-01", "1000", "5", "12")
+    assert validate_application(*valid) is None
+    
+    assert validate_application("", *valid[1:]) == "Please enter the customer's full name."
+    assert "valid email" in validate_application(valid[0], "nope", *valid[2:])
+    assert "date of birth" in validate_application(*valid[:2], "2000-13-01", *valid[3:])
+    assert validate_application(*valid[:3], "-5", *valid[4:]) == "Loan amount must be a positive number."
+    assert validate_application(*valid[:4], "0", valid[5]) == "Interest rate must be a positive number."
+    assert validate_application(*valid[:5], "1.5") == "Loan term must be a positive number of months."
+
+def test_build_record():
+    """Test that records hold the computed figures as integer cents"""
+    assert build_record("test user", "Test@Example.com", "2000-01-01", 5000, 10, 12) == LoanRecord(
+        name="Test User",
+        email="test@example.com",
+        dob="2000-01-01",
+        loan_cents=500_000,
+        rate=10,
+        months=12,
+        interest_cents=50_000,
+        total_interest_cents=600_000
+    )
+
+def test_numpy_is_not_imported_at_start_up():
+    """Test that only batch pricing loads NumPy, so the entry points start quickly"""
+    code = "import sys, src.bank_system, src.service, src.cli; print('numpy' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_interest_batch_matches_scalar(monkeypatch, use_numpy):
+    """Test that batch pricing agrees with the scalar functions, truncation included"""
+    if use_numpy and loans.load_numpy() is None:
+        pytest.skip("NumPy is not installed")
+    if not use_numpy:
+        monkeypatch.setattr(loans, "numpy", None)
+    
+    rng = random.Random(42)
+    amounts = array("q", [rng.randint(1, 10_000_000) for _ in range(2000)])
+    rates = array("q", [rng.randint(1, 99) for _ in range(2000)])
+    months = array("q", [rng.randint(1, 480) for _ in range(2000)])
+    # Values whose float product lands just below a whole number
+    amounts.extend([7, 29, 57])
+    rates.extend([100, 7, 10])
+    months.extend([1, 1, 1])
+    
+    interest, totals = calculate_interest_batch(amounts, rates, months)
+    
+    expected = [calculate_interest(a, r) for a, r in zip(amounts, rates)]
+    assert [int(value) for value in interest] == expected
+    assert [int(value) for value in totals] == [
+        calculate_monthly_interest(value, term) for value, term in zip(expected, months)
+    ]
+
+@pytest.mark.parametrize("amount, rate, months", [(1000, 5, 3), (5000, 10, 12), (7, 3, 10), (999_999, 17, 360)])
+def test_amortization_schedule_matches_summary(amount, rate, months):
+    """Test that the streamed schedule adds up to the closed-form totals"""
+    rows = list(amortization_schedule(amount, rate, months))
+    summary = amortization_summary(amount, rate, months)
+    
+    assert [row.month for row in rows] == list(range(1, months + 1))
+    assert sum(row.principal for row in rows) == amount
+    assert rows[-1].balance == 0
+    assert sum(row.interest for row in rows) == summary.total_interest
+    assert summary.total_interest == calculate_monthly_interest(calculate_interest(amount, rate), months)
+    assert sum(row.payment for row in rows) == summary.total_paid
+    assert rows[0].payment == summary.monthly_payment
+    assert rows[-1].payment == summary.final_payment
+
+def test_amortization_schedule_is_lazy():
+    """Test that rows are produced on demand, even for very long terms"""
+    first = list(itertools.islice(amortization_schedule(10**9, 5, 10**9), 2))
+    assert [row.balance for row in first] == [10**9 - 1, 10**9 - 2]
+
+def test_write_schedules():
+    """Test streaming the schedules of several records to CSV"""
+    records = [
+        build_record("Ann", "ann@example.com", "1990-01-01", 1000, 5, 3),
+        LoanRecord("No Term", "noterm@example.com", "1990-01-01", 100_000, 5, 0, 0, 0),
+        build_record("Ben", "ben@example.com", "1980-01-01", 200, 10, 2),
+    ]
+    output = io.StringIO()
+    
+    assert write_schedules(output, iter(records)) == 5
+    
+    rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+    assert [row["Email"] for row in rows] == ["ann@example.com"] * 3 + ["ben@example.com"] * 2
+    assert rows[-1] == {"Email": "ben@example.com", "Month": "2", "Payment": "120",
+                        "Principal": "100", "Interest": "20", "Balance": "0"}
@@ -0,0 +1,60 @@
+import sys
+
+import pytest
+from src.loans import build_record
+from src.records import LoanRecord, format_money, parse_money
+
+def test_parse_money():
+    """Test reading amounts in both the raw and the legacy display form"""
+    assert parse_money("5000") == 500_000
+    assert parse_money("5000.25") == 500_025
+    assert parse_money("5000 $") == 500_000
+    assert parse_money("1,250 $") == 125_000
+    assert parse_money("") == 0
+    with pytest.raises(ValueError):
+        parse_money("lots $")
+    for value in ("inf $", "-Infinity", "nan", "sNaN $"):
+        with pytest.raises(ValueError):
+            parse_money(value)
+
+def test_format_money():
+    assert format_money(500_000) == "5000 $"
+    assert format_money(500_025) == "5000.25 $"
+
+def test_row_round_trip():
+    """Test that a record survives being written as a CSV row and read back"""
+    record = build_record("Ann", "ann@example.com", "1990-01-01", 5000, 10, 12)
+    row = record.to_row()
+    
+    assert row["Loan amount"] == "5000"
+    assert row["Interest amount"] == "10"
+    assert row["Month"] == "12"
+    assert LoanRecord.from_row(row) == record
+
+def test_legacy_row_is_upgraded():
+    """Test that rows written as display strings read as the same record"""
+    legacy = {
+        "Name": "Ann", "Email": "ann@example.com", "Date of Birth": "1990-01-01",
+        "Loan amount": "5000 $", "Interest amount": "10 %", "Interest money": "500 $",
+        "Month": "12 months", "Interest money per month": "6000 $"
+    }
+    record = LoanRecord.from_row(legacy)
+    
+    assert record == build_record("Ann", "ann@example.com", "1990-01-01", 5000, 10, 12)
+    assert record.display_values() == tuple(legacy.values())
+
+def test_record_is_compact():
+    """Test that records use slots instead of a per-instance dict"""
+    record = build_record("Ann", "ann@example.com", "1990-01-01", 5000, 10, 12)
+    row = record.to_row()
+    
+    assert not hasattr(record, "__dict__")
+    assert sys.getsizeof(record) < sys.getsizeof(row)
+
+def test_to_json():
+    record = build_record("Ann", "ann@example.com", "1990-01-01", 5000, 10, 12)
+    assert record.to_json() == {
+        "name": "Ann", "email": "ann@example.com", "dob": "1990-01-01",
+        "loan_amount": 5000, "interest_rate": 10, "months": 12,
+        "interest": 500, "total_interest": 6000,
+    }
@@ -0,0 +1,59 @@
+import json
+from datetime import date
+from src.loans import build_record
+from src.reporting import Portfolio, age_band, age_on, main, term_bucket
+from src.storage import CSVRepository
+
+def make_record(email, dob="1990-06-15", amount=1000, rate=5, months=12):
+    return build_record("Test User", email, dob, amount, rate, months)
+
+def test_buckets_and_bands():
+    """Test the term buckets and age bands at their edges"""
+    assert [term_bucket(months) for months in (1, 12, 13, 120, 121)] == [
+        "Up to 12 months", "Up to 12 months", "13-36 months", "61-120 months", "Over 120 months"
+    ]
+    today = date(2025, 6, 15)
+    assert age_on("2000-06-15", today) == 25
+    assert age_on("2000-06-16", today) == 24
+    assert age_on("not a date", today) is None
+    assert [age_band(age) for age in (24, 25, 64, 65, None)] == [
+        "Under 25", "25-34", "55-64", "65 and over", "Unknown"
+    ]
+
+def test_incremental_totals_match_a_full_pass():
+    """Test that adding and removing records keeps the same totals as recomputing"""
+    records = [make_record(f"user{i}@example.com", f"19{50 + i}-01-01", 1000 * (i + 1), i + 1, 12 * (i + 1))
+               for i in range(10)]
+    portfolio = Portfolio()
+    for record in records:
+        portfolio.add(record)
+    for record in records[::3]:
+        portfolio.remove(record)
+    
+    today = date(2025, 1, 1)
+    kept = [record for record in records if record not in records[::3]]
+    progress = []
+    assert portfolio.report(today) == Portfolio.compute(kept, chunk_size=4, progress=progress.append).report(today)
+    assert progress == [4, 6]
+    
+    report = portfolio.report(today)
+    assert report["count"] == 6
+    assert report["principal_cents"] == sum(record.loan_cents for record in kept)
+    assert report["interest_cents"] == sum(record.total_interest_cents for record in kept)
+    assert report["average_rate"] == round(sum(record.rate for record in kept) / 6, 2)
+    assert sum(group["count"] for group in report["ages"]) == 6
+    assert sum(group["principal_cents"] for group in report["terms"]) == report["principal_cents"]
+
+def test_report_command(tmp_path, capsys):
+    """Test the command line report as JSON"""
+    path = str(tmp_path / "database.csv")
+    repository = CSVRepository(path)
+    repository.initialize()
+    repository.append_many([make_record("ann@example.com"), make_record("bob@example.com", months=48)])
+    
+    assert main(["--json", "--storage", "csv", "--database", path]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["count"] == 2
+    assert [(group["label"], group["share"]) for group in report["terms"]] == [
+        ("Up to 12 months", 0.5), ("37-60 months", 0.5)
+    ]
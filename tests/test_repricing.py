@@ -0,0 +1,57 @@
+import dataclasses
+
+import pytest
+from src.loans import build_record
+from src.repricing import main, reprice_records, reprice_repository
+from src.storage import open_repository
+
+@pytest.fixture
+def repository(repository):
+    repository.append(build_record("Ann", "ann@example.com", "1990-01-01", 1000, 5, 12))
+    repository.append(build_record("Ben", "ben@example.com", "1980-01-01", 2500, 3, 24))
+    repository.append(build_record("Cid", "cid@example.com", "1970-01-01", 999, 7, 6))
+    return repository
+
+def test_reprice_records():
+    """Test that each record is repriced at its own rate unless one is given"""
+    records = [
+        build_record("Ann", "ann@example.com", "1990-01-01", 1000, 5, 12),
+        build_record("Ben", "ben@example.com", "1980-01-01", 2500, 3, 24),
+    ]
+    stale = [dataclasses.replace(record, interest_cents=0, total_interest_cents=0)
+             for record in records]
+    
+    assert reprice_records(stale) == records
+    
+    result = reprice_records(records, rate=10)
+    assert result[0].rate == 10
+    assert result[0].interest_cents == 10_000
+    assert result[0].total_interest_cents == 120_000
+
+def test_reprice_repository_with_new_rate(repository):
+    """Test moving the whole book to a new rate"""
+    repository.delete("ben@example.com")
+    
+    assert reprice_repository(repository, rate=10, chunk_size=1) == 2
+    
+    assert repository.load() == [
+        build_record("Ann", "ann@example.com", "1990-01-01", 1000, 10, 12),
+        build_record("Cid", "cid@example.com", "1970-01-01", 999, 10, 6),
+    ]
+
+def test_reprice_command(tmp_path, capsys):
+    """Test the command-line entry point recomputes stored figures"""
+    database = str(tmp_path / "database.db")
+    repo = open_repository("sqlite", database)
+    repo.initialize()
+    record = build_record("Ann", "ann@example.com", "1990-01-01", 1000, 5, 12)
+    record = dataclasses.replace(record, interest_cents=0)
+    repo.append(record)
+    repo.close()
+    
+    assert main(["--storage", "sqlite", "--database", database]) == 0
+    assert "Repriced 1 records" in capsys.readouterr().out
+    
+    repo = open_repository("sqlite", database)
+    assert repo.load()[0].interest_cents == 5000
+    repo.close()
@@ -0,0 +1,177 @@
+import itertools
+import pytest
+from src.loans import build_record
+from src.search import RecordIndex
+from src.storage import SQLiteRepository
+
+def make_records():
+    return [
+        build_record("Ann Lee", "ann@example.com", "1990-03-01", 5000, 10, 12),
+        build_record("Bob Stone", "bob@work.org", "1985-07-15", 1200, 4, 36),
+        build_record("Cara Leeson", "cara@example.com", "2001-11-30", 800, 7, 6),
+        build_record("Dan Brown", "dleeds@mail.net", "1979-01-20", 25000, 3, 120),
+    ]
+
+def emails(records):
+    return [record.email for record in records]
+
+def test_substring_search():
+    """Test that three or more characters match anywhere in a name or email"""
+    index = RecordIndex(make_records())
+    
+    assert emails(index.search("LEE").page(0, 10)) == [
+        "ann@example.com", "cara@example.com", "dleeds@mail.net"
+    ]
+    assert emails(index.search("example.c").page(0, 10)) == ["ann@example.com", "cara@example.com"]
+    assert index.search("ownx").total == 0
+
+def test_short_queries_match_prefixes():
+    """Test that one or two characters match the start of a word or email"""
+    index = RecordIndex(make_records())
+    
+    assert emails(index.search("b").page(0, 10)) == ["bob@work.org", "dleeds@mail.net"]
+    assert emails(index.search("da").page(0, 10)) == ["dleeds@mail.net"]
+    assert index.search("on").total == 0
+
+@pytest.mark.parametrize("field", ["name", "email", "dob", "loan_cents", "rate", "months"])
+def test_sorted_pages(field):
+    """Test that every sort order agrees with sorting the records directly"""
+    records = make_records()
+    index = RecordIndex(records)
+    
+    def value(record):
+        attribute = getattr(record, field)
+        return attribute.lower() if isinstance(attribute, str) else attribute
+    
+    expected = emails(sorted(records, key=value))
+    assert emails(index.search(sort_by=field).page(0, 10)) == expected
+    assert emails(index.search(sort_by=field, descending=True).page(0, 10)) == expected[::-1]
+    assert emails(index.search(sort_by=field).page(1, 2)) == expected[1:3]
+    assert emails(index.search(sort_by=field, descending=True).page(3, 5)) == expected[::-1][3:]
+
+def test_search_and_sort_combined():
+    index = RecordIndex(make_records())
+    result = index.search("lee", sort_by="loan_cents", descending=True)
+    assert emails(result) == ["dleeds@mail.net", "ann@example.com", "cara@example.com"]
+    with pytest.raises(ValueError):
+        index.search(sort_by="Interest money")
+
+def test_incremental_updates():
+    """Test that adding and removing records keeps every index current"""
+    index = RecordIndex(make_records())
+    
+    assert index.discard("CARA@example.com") is True
+    assert index.discard("cara@example.com") is False
+    index.add(build_record("Eve Leer", "eve@example.com", "1995-05-05", 100, 1, 1))
+    
+    assert len(index) == 4
+    assert "eve@example.com" in index and "cara@example.com" not in index
+    assert emails(index.search("lee")) == ["ann@example.com", "dleeds@mail.net", "eve@example.com"]
+    assert emails(index.search(sort_by="loan_cents").page(0, 2)) == ["eve@example.com", "bob@work.org"]
+    assert emails(index.search("le", sort_by="dob")) == ["ann@example.com", "eve@example.com"]
+    
+    # A later record with the same email replaces the earlier one
+    index.extend([build_record("Ann Other", "ANN@example.com", "1990-03-01", 10, 1, 1)])
+    assert len(index) == 4
+    assert [record.name for record in index.search("ann")] == ["Ann Other"]
+    assert index.search(sort_by="loan_cents").page(0, 1)[0].name == "Ann Other"
+
+def test_sort_orders_follow_changes_after_first_use():
+    """Test that sort orders built on first use are kept current, with deleted ids skipped"""
+    records = make_records()
+    index = RecordIndex(records)
+    index.discard("bob@work.org")
+    assert emails(index.search(sort_by="loan_cents")) == [
+        "cara@example.com", "ann@example.com", "dleeds@mail.net"
+    ]
+    
+    index.add(build_record("Eve Leer", "eve@example.com", "1995-05-05", 900, 1, 1))
+    index.discard("ann@example.com")
+    assert emails(index.search(sort_by="loan_cents")) == [
+        "cara@example.com", "eve@example.com", "dleeds@mail.net"
+    ]
+    assert emails(index.search()) == ["cara@example.com", "dleeds@mail.net", "eve@example.com"]
+    assert emails(index.search("e", descending=True)) == ["eve@example.com"]
+
+def test_deleted_slots_are_compacted():
+    """Test that enough deletes renumber the live records and old results run again"""
+    index = RecordIndex(
+        build_record(f"User {i}", f"user{i}@example.com", "2000-01-01", 100 + i, 1, 12)
+        for i in range(4000)
+    )
+    by_loan = index.search(sort_by="loan_cents", descending=True)
+    assert by_loan.page(0, 1)[0].email == "user3999@example.com"
+    matches = index.search("user39")
+    assert matches.total == 111
+    
+    for i in range(0, 4000, 4):
+        index.discard(f"user{i}@example.com")
+    assert index.generation == 1
+    assert len(index.records) == len(index) == 3000
+    assert all(record is not None for record in index.records)
+    assert matches.total == 84
+    assert emails(matches.page(0, 2)) == ["user39@example.com", "user390@example.com"]
+    assert by_loan.page(0, 1)[0].email == "user3999@example.com"
+    assert emails(index.search("user3998").page(0, 5)) == ["user3998@example.com"]
+
+@pytest.mark.parametrize("text", ["", "lee", "LEE", "example.c", "b", "da", "on", "ownx", "100%"])
+@pytest.mark.parametrize("sort_by", [None, "name", "loan_cents", "dob"])
+def test_sqlite_queries_agree_with_the_index(tmp_path, text, sort_by):
+    """Test that SQLite answers queries in SQL with the same results as the in-memory index"""
+    repository = SQLiteRepository(str(tmp_path / "database.db"))
+    repository.initialize()
+    repository.append_many(make_records())
+    repository.delete("bob@work.org")
+    index = RecordIndex(repository.iter_records())
+    try:
+        # With and without FTS5, which some SQLite builds leave out
+        for full_text, descending in itertools.product((True, False), (False, True)):
+            repository.full_text = full_text
+            expected = index.search(text, sort_by, descending)
+            result = repository.query(text, sort_by, descending)
+            assert result.total == expected.total
+            assert emails(result) == emails(expected)
+            assert emails(result.page(1, 1)) == emails(expected.page(1, 1))
+        with pytest.raises(ValueError):
+            repository.query(sort_by="Interest money")
+    finally:
+        repository.close()
+
+def test_sqlite_search_table_is_filled_for_existing_books(tmp_path):
+    """Test that opening a database written before the search table indexes its rows"""
+    path = str(tmp_path / "database.db")
+    repository = SQLiteRepository(path)
+    repository.initialize()
+    repository.append_many(make_records())
+    repository.connection.execute("DROP TABLE loans_search")
+    repository.close()
+    
+    repository = SQLiteRepository(path)
+    repository.initialize()
+    try:
+        assert repository.full_text
+        assert emails(repository.query("leeds")) == ["dleeds@mail.net"]
+    finally:
+        repository.close()
+
+class CountingList(list):
+    """A list that counts the items read from it"""
+    reads = 0
+    
+    def __getitem__(self, position):
+        self.reads += 1
+        return super().__getitem__(position)
+
+def test_queries_stay_fast_on_large_books():
+    """Test that a query over a large index does not scan every record"""
+    index = RecordIndex(
+        build_record(f"User {i}", f"user{i}@example.com", "2000-01-01", 100 + i % 5000, 1 + i % 30, 12)
+        for i in range(50_000)
+    )
+    index.sorted_ids("loan_cents")  # built once, outside the count
+    index.records = CountingList(index.records)
+    
+    assert emails(index.search("user4999").page(0, 20))[0] == "user4999@example.com"
+    assert len(index.search(sort_by="loan_cents", descending=True).page(25_000, 100)) == 100
+    # Only the candidates of the rarest trigram and the pages themselves are read
+    assert index.records.reads < 1000
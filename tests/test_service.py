@@ -0,0 +1,139 @@
+import pytest
+import subprocess
+import sys
+from src.service import (
+    DuplicateEmailError, LoanService, RecordNotFoundError, ServiceError, ValidationError
+)
+
+def test_service_does_not_need_tkinter():
+    """Test that the headless layer never pulls in the GUI toolkit"""
+    code = "import sys, src.service, src.cli; print('tkinter' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+def test_submit_and_get(service):
+    """Test submitting an application from raw form strings"""
+    record = service.submit(" jane doe ", "Jane@Example.com", "1990-01-01", "5000", "10", "12")
+    
+    assert record.name == "Jane Doe"
+    assert record.total_interest_cents == 600_000
+    assert service.get("JANE@example.com") == record
+    assert service.count() == 1
+    assert service.email_exists("jane@example.com") is True
+
+def test_submit_rejects_bad_input(service):
+    """Test that invalid applications raise typed errors"""
+    with pytest.raises(ValidationError, match="positive number of months"):
+        service.submit("Jane", "jane@example.com", "1990-01-01", "5000", "10", "0")
+    
+    service.submit("Jane", "jane@example.com", "1990-01-01", "5000", "10", "12")
+    with pytest.raises(DuplicateEmailError):
+        service.submit("Jane", "JANE@example.com", "1990-01-01", "5000", "10", "12")
+    assert service.count() == 1
+
+def test_list_search_and_delete(service):
+    """Test paging, searching and deleting records"""
+    for name in ("Ann Lee", "Bob Stone", "Cara Lee"):
+        first = name.split()[0].lower()
+        service.submit(name, f"{first}@example.com", "1990-01-01", "100", "1", "1")
+    
+    assert [r.name for r in service.list(1, 5)] == ["Bob Stone", "Cara Lee"]
+    assert [r.name for r in service.search("LEE")] == ["Ann Lee", "Cara Lee"]
+    assert [r.name for r in service.search("bob@")] == ["Bob Stone"]
+    assert service.search("lee", 1, sort_by="name", descending=True) == service.query(
+        "lee", "name", True).page(0, 1)
+    with pytest.raises(ValidationError):
+        service.search("  ")
+    
+    service.delete("bob@example.com")
+    with pytest.raises(RecordNotFoundError):
+        service.delete("bob@example.com")
+    with pytest.raises(RecordNotFoundError):
+        service.get("bob@example.com")
+    with pytest.raises(ValidationError):
+        service.delete("not-an-email")
+    assert issubclass(RecordNotFoundError, ServiceError)
+    assert service.count() == 2
+
+def test_query_index_follows_changes(service):
+    """Test that the search index is kept current after it is built"""
+    service.submit("Ann Lee", "ann@example.com", "1990-01-01", "300", "1", "1")
+    service.submit("Bob Stone", "bob@example.com", "1990-01-01", "100", "1", "1")
+    
+    assert [r.name for r in service.query(sort_by="loan_cents")] == ["Bob Stone", "Ann Lee"]
+    
+    service.submit("Cara Lee", "cara@example.com", "1990-01-01", "200", "1", "1")
+    service.submit_many([service.prepare("Dee Lee", "dee@example.com", "1990-01-01", "50", "1", "1")])
+    service.delete("ann@example.com")
+    
+    result = service.query("lee", sort_by="loan_cents", descending=True)
+    assert (result.total, [r.name for r in result]) == (2, ["Cara Lee", "Dee Lee"])
+    with pytest.raises(ValidationError):
+        service.query(sort_by="Interest money")
+
+def test_submit_many_reports_emails_stored_elsewhere(service, monkeypatch):
+    """Test that a clash found at write time is reported, not dropped"""
+    other = LoanService(type(service.repository)(service.repository.path))
+    other.submit("Bob Lee", "bob@example.com", "1990-01-01", "100", "1", "1")
+    other.close()
+    # As if the email were checked just before the other writer stored it
+    monkeypatch.setattr(service.repository, "email_exists", lambda email: False)
+    
+    ann = service.prepare("Ann Lee", "ann@example.com", "1990-01-01", "300", "1", "1")
+    bob = service.prepare("Bob Stone", "BOB@example.com", "1990-01-01", "200", "1", "1")
+    outcomes = service.submit_many([ann, bob, ann])
+    assert outcomes[0] is None
+    assert all(isinstance(outcome, DuplicateEmailError) for outcome in outcomes[1:])
+    assert service.count() == 2
+    assert service.get("bob@example.com").name == "Bob Lee"
+
+def test_sync_picks_up_other_processes(service):
+    """Test that sync reports changes made through another connection"""
+    service.submit("Ann Lee", "ann@example.com", "1990-01-01", "300", "1", "1")
+    assert [r.name for r in service.query("lee")] == ["Ann Lee"]
+    assert service.sync() is False
+    
+    other = LoanService(type(service.repository)(service.repository.path))
+    other.submit("Bob Lee", "bob@example.com", "1990-01-01", "100", "1", "1")
+    other.delete("ann@example.com")
+    other.close()
+    
+    assert service.sync() is True
+    assert service.sync() is False
+    assert [r.name for r in service.query("lee")] == ["Bob Lee"]
+
+def test_index_drops_own_record_deleted_elsewhere(service):
+    """Test that a record submitted here and deleted by another process leaves the index"""
+    service.submit("Ann Lee", "ann@example.com", "1990-01-01", "300", "1", "1")
+    assert service.query("").total == 1
+    assert service.sync() is False
+    service.submit("Bob Lee", "bob@example.com", "1990-01-01", "100", "1", "1")
+    
+    other = LoanService(type(service.repository)(service.repository.path))
+    other.delete("bob@example.com")
+    other.close()
+    
+    assert service.sync() is True
+    assert "bob@example.com" not in service.index
+    assert [r.email for r in service.query("")] == ["ann@example.com"]
+    assert service.count() == 1
+
+def test_portfolio_follows_writes_from_every_process(service):
+    """Test that running totals track own and other processes' changes without recounting"""
+    service.submit("Ann Lee", "ann@example.com", "1990-01-01", "300", "5", "12")
+    assert service.report()["principal_cents"] == 30_000
+    service.submit("Bob Lee", "bob@example.com", "1990-01-01", "100", "5", "24")
+    service.sync()
+    
+    other = LoanService(type(service.repository)(service.repository.path))
+    other.delete("ann@example.com")
+    other.submit("Cara Lee", "cara@example.com", "1980-01-01", "200", "10", "12")
+    other.close()
+    service.sync()
+    service.delete("bob@example.com")
+    
+    report = service.report()
+    assert (report["count"], report["principal_cents"]) == (1, 20_000)
+    progress = []
+    assert service.recompute_portfolio(chunk_size=1, progress=lambda *step: progress.append(step)) == report
+    assert progress == [(1, 1)]
@@ -0,0 +1,157 @@
+import pytest
+from src.loans import build_record
+from src.repricing import reprice_repository
+from src import snapshot as snapshot_module
+from src.service import LoanService
+from src.snapshot import Snapshot, SnapshotError, SnapshotRepository, TextColumn, main, write_snapshot
+from src.storage import CSVRepository, StorageError, open_repository
+
+RECORDS = [
+    build_record("Ann Lee", "ann@example.com", "1990-01-01", 1000, 5, 12),
+    build_record("Bob Stone", "Bob@Example.com", "1980-06-15", 2500, 3, 24),
+    build_record("Zoë Ünal", "zoe@example.com", "1970-03-03", 999, 7, 6),
+]
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "database.snap")
+    write_snapshot(path, RECORDS)
+    return path
+
+def test_snapshot_round_trip(snapshot_path):
+    """Test that a snapshot reads back the records it was written from"""
+    with Snapshot(snapshot_path) as snapshot:
+        assert len(snapshot) == 3
+        assert list(snapshot) == RECORDS
+        assert list(snapshot.records(1, 10)) == RECORDS[1:]
+        assert snapshot[2] == RECORDS[2]
+        assert snapshot[-1] == RECORDS[2]
+        with pytest.raises(IndexError):
+            snapshot[3]
+
+def test_snapshot_columns_are_views(snapshot_path):
+    """Test that columns are read from the mapping without copying"""
+    with Snapshot(snapshot_path) as snapshot:
+        amounts = snapshot.column("loan_cents")
+        assert isinstance(amounts, memoryview)
+        assert amounts.tolist() == [record.loan_cents for record in RECORDS]
+        names = snapshot.column("name")
+        assert isinstance(names, TextColumn)
+        assert names[2] == "Zoë Ünal"
+        assert bytes(names.raw(0)) == b"Ann Lee"
+        with pytest.raises(KeyError):
+            snapshot.column("nothing")
+        amounts.release()
+
+def test_snapshot_find(snapshot_path):
+    """Test looking up rows by email, ignoring case and spaces"""
+    with Snapshot(snapshot_path) as snapshot:
+        assert snapshot.find("bob@example.com") == 1
+        assert snapshot.find(" ZOE@example.com ") == 2
+        assert snapshot.find("missing@example.com") is None
+
+def test_empty_snapshot(tmp_path):
+    """Test that a snapshot of an empty book opens and reads nothing"""
+    path = str(tmp_path / "empty.snap")
+    assert write_snapshot(path, []) == 0
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 0
+        assert list(snapshot) == []
+        assert snapshot.find("ann@example.com") is None
+
+def test_corrupt_snapshot_is_rejected(tmp_path, snapshot_path):
+    """Test that files which are not whole snapshots raise SnapshotError"""
+    not_snapshot = tmp_path / "database.csv"
+    not_snapshot.write_text("Name,Email\n" * 10)
+    with pytest.raises(SnapshotError):
+        Snapshot(str(not_snapshot))
+
+    with open(snapshot_path, "rb") as file:
+        data = file.read()
+    truncated = tmp_path / "truncated.snap"
+    truncated.write_bytes(data[:-40])
+    with pytest.raises(SnapshotError):
+        Snapshot(str(truncated))
+
+    with pytest.raises(SnapshotError):
+        Snapshot(str(tmp_path / "missing.snap"))
+
+def test_snapshot_repository_is_read_only(snapshot_path):
+    """Test the snapshot backend's lookups and that it refuses writes"""
+    repository = open_repository("snapshot", snapshot_path)
+    try:
+        assert isinstance(repository, SnapshotRepository)
+        repository.initialize()
+        assert repository.count() == 3
+        assert repository.email_exists("ann@example.com")
+        assert repository.get("BOB@example.com") == RECORDS[1]
+        assert repository.fetch(1, 1) == RECORDS[1:2]
+        with pytest.raises(StorageError):
+            repository.append(build_record("Cid", "cid@example.com", "1990-01-01", 1, 1, 1))
+        with pytest.raises(StorageError):
+            repository.delete("ann@example.com")
+    finally:
+        repository.close()
+
+def test_snapshot_repository_sees_a_new_export(snapshot_path):
+    """Test that replacing the file is picked up by the service"""
+    service = LoanService(SnapshotRepository(snapshot_path))
+    try:
+        service.repository.initialize()
+        assert service.report()["count"] == 3
+        assert [record.email for record in service.search("ann")] == ["ann@example.com"]
+        service.sync()
+
+        write_snapshot(snapshot_path, RECORDS[:1])
+        assert service.sync()
+        assert service.report()["count"] == 1
+        assert service.count() == 1
+    finally:
+        service.close()
+
+def test_readers_keep_a_replaced_snapshot_open(snapshot_path, monkeypatch):
+    """Test that a new export does not unmap a snapshot another reader is still using"""
+    monkeypatch.setattr(snapshot_module, "READ_CHUNK", 1)
+    repository = SnapshotRepository(snapshot_path)
+    try:
+        repository.initialize()
+        old = repository.snapshot
+        records = repository.iter_records()
+        assert next(records) == RECORDS[0]
+        
+        write_snapshot(snapshot_path, RECORDS[:1])
+        assert repository.count() == 1
+        assert not old._map.closed
+        assert list(records) == RECORDS[1:]
+        assert old._map.closed
+    finally:
+        repository.close()
+
+def test_reprice_snapshot(snapshot_path):
+    """Test that repricing a snapshot writes a new one"""
+    repository = SnapshotRepository(snapshot_path)
+    try:
+        repository.initialize()
+        assert reprice_repository(repository, rate=10, chunk_size=2) == 3
+        assert [record.rate for record in repository.iter_records()] == [10, 10, 10]
+        assert repository.get("ann@example.com").interest_cents == 10_000
+    finally:
+        repository.close()
+
+def test_export_command(tmp_path, capsys):
+    """Test exporting a CSV database and describing the snapshot"""
+    database = str(tmp_path / "database.csv")
+    source = CSVRepository(database)
+    source.initialize()
+    source.append_many(RECORDS)
+    source.close()
+    output = str(tmp_path / "export.snap")
+
+    assert main(["export", output, "--storage", "csv", "--database", database]) == 0
+    assert "Exported 3 records" in capsys.readouterr().out
+    with Snapshot(output) as snapshot:
+        assert list(snapshot) == RECORDS
+
+    assert main(["info", output]) == 0
+    assert "3 records" in capsys.readouterr().out
+    assert main(["info", str(tmp_path / "missing.snap")]) == 1
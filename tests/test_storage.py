@@ -0,0 +1,802 @@
+import pytest
+import csv
+import os
+import subprocess
+import sys
+import sqlite3
+import threading
+from src import storage
+from src.loans import build_record
+from src.records import LoanRecord
+from src.storage import (
+    FIELDNAMES, CSVRepository, DuplicateEmailError, EmailIndex, Journal, RowReader,
+    SQLiteRepository, StorageError, migrate_csv_to_sqlite, open_repository
+)
+
+LEGACY_ROW = [
+    "Legacy User", "legacy@example.com", "2000-01-01", "1000 $",
+    "5 %", "50 $", "12 months", "600 $"
+]
+
+def make_record(name="Test User", email="test@example.com"):
+    return build_record(name, email, "2000-01-01", 1000, 5, 12)
+
+def test_email_index_tracks_file_changes(tmp_path):
+    """Test that the email index stays in sync with the database file"""
+    test_file = tmp_path / "test_db.csv"
+    with open(test_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name", "Email", "Date of Birth"])
+        writer.writerow(["Test User", "Test@Example.com", "2000-01-01"])
+    
+    index = EmailIndex(str(test_file))
+    index.rebuild()
+    assert "test@example.com" in index
+    
+    # Appends made through the index are visible immediately
+    with open(test_file, 'a', newline='') as f:
+        csv.writer(f).writerow(["Other User", "other@example.com", "1990-05-05"])
+    index.add("other@example.com")
+    assert "OTHER@example.com" in index
+    
+    # Removing a record through the index forgets the email
+    index.discard("test@example.com")
+    assert "test@example.com" not in index
+    
+    # Rewriting the file underneath the index forces a rebuild
+    with open(test_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name", "Email", "Date of Birth"])
+        writer.writerow(["New User", "new@example.com", "1980-02-02"])
+        writer.writerow(["Filler", "filler@example.com", "1980-02-02"])
+    assert "new@example.com" in index
+    assert "other@example.com" not in index
+
+def test_repository_append_and_load(repository):
+    """Test that stored records round-trip through every backend"""
+    repository.append(make_record())
+    repository.append(make_record("Other User", "other@example.com"))
+    
+    records = repository.load()
+    assert [r.email for r in records] == ["test@example.com", "other@example.com"]
+    assert records[0] == make_record()
+    assert repository.count() == 2
+
+def test_repository_rejects_duplicate_email(repository):
+    """Test that the same email cannot be stored twice, ignoring case"""
+    repository.append(make_record())
+    with pytest.raises(DuplicateEmailError):
+        repository.append(make_record(email="TEST@example.com"))
+    assert repository.email_exists("Test@Example.com") is True
+
+def test_append_many_reports_skipped_records(repository):
+    """Test that a batch lists the records it left out"""
+    repository.append(make_record())
+    batch = [
+        make_record("Ann", "ann@example.com"),
+        make_record("Clash", "TEST@example.com"),
+        make_record("Ann Again", "ann@example.com"),
+        make_record("Bob", "bob@example.com"),
+    ]
+    skipped = []
+    assert repository.append_many(batch, skipped) == 2
+    assert skipped == [batch[1], batch[2]]
+    assert repository.append_many([make_record("Cid", "cid@example.com")]) == 1
+    assert repository.count() == 4
+
+def test_repository_delete(repository):
+    """Test deleting a record by email"""
+    repository.append(make_record())
+    repository.append(make_record("Other User", "other@example.com"))
+    
+    assert repository.delete("TEST@example.com") is True
+    assert repository.delete("test@example.com") is False
+    assert repository.email_exists("test@example.com") is False
+    assert [r.email for r in repository.load()] == ["other@example.com"]
+
+def test_repository_fetch_pages(repository):
+    """Test fetching a window of records by position"""
+    for i in range(10):
+        repository.append(make_record(f"User {i}", f"user{i}@example.com"))
+    
+    page = repository.fetch(3, 4)
+    assert [r.email for r in page] == [f"user{i}@example.com" for i in range(3, 7)]
+    assert len(repository.fetch(8, 4)) == 2
+    assert repository.fetch(20, 4) == []
+
+def test_open_repository_uses_environment(tmp_path, monkeypatch):
+    """Test that the backend is chosen by configuration"""
+    monkeypatch.setenv("BANK_STORAGE", "sqlite")
+    monkeypatch.setenv("BANK_DATABASE", str(tmp_path / "loans.db"))
+    repo = open_repository()
+    assert isinstance(repo, SQLiteRepository)
+    assert repo.path == str(tmp_path / "loans.db")
+    
+    with pytest.raises(StorageError):
+        open_repository("oracle")
+    
+    monkeypatch.setenv("BANK_STORAGE", "csv")
+    monkeypatch.setenv("BANK_DATABASE", str(tmp_path / "loans.csv"))
+    monkeypatch.setenv("BANK_DURABILITY", "group")
+    monkeypatch.setenv("BANK_GROUP_COMMIT_MS", "5")
+    monkeypatch.setenv("BANK_GROUP_COMMIT_ROWS", "32")
+    journal = open_repository().journal
+    assert (journal.durability, journal.group_interval, journal.group_rows) == ("group", 0.005, 32)
+    
+    for name, value in [("BANK_DURABILITY", "sometimes"), ("BANK_GROUP_COMMIT_MS", "5ms"),
+                        ("BANK_GROUP_COMMIT_MS", "nan"), ("BANK_GROUP_COMMIT_ROWS", "0"),
+                        ("BANK_GROUP_COMMIT_ROWS", "1.5")]:
+        with monkeypatch.context() as patch:
+            patch.setenv(name, value)
+            with pytest.raises(StorageError, match=name):
+                open_repository()
+
+def test_migrate_csv_to_sqlite(tmp_path):
+    """Test the one-shot migration from an existing CSV database"""
+    source = CSVRepository(str(tmp_path / "database.csv"))
+    source.initialize()
+    source.append(make_record())
+    source.append(make_record("Other User", "other@example.com"))
+    
+    sqlite_path = str(tmp_path / "database.db")
+    assert migrate_csv_to_sqlite(source.path, sqlite_path) == 2
+    # Running it again does not duplicate anything
+    assert migrate_csv_to_sqlite(source.path, sqlite_path) == 0
+    
+    target = SQLiteRepository(sqlite_path)
+    assert target.load() == source.load()
+    target.close()
+
+def test_migrate_recovers_and_closes_the_csv_database(tmp_path, monkeypatch):
+    """Test that journaled writes are migrated and both databases are closed"""
+    source = CSVRepository(str(tmp_path / "database.csv"))
+    source.initialize()
+    for i in range(3):
+        source.append(make_record(f"User {i}", f"user{i}@example.com"))
+    # The last row only half reached the disk; the journal still has it
+    with open(source.path, "rb+") as f:
+        f.truncate(os.path.getsize(source.path) - 20)
+    
+    closed = []
+    close = CSVRepository.close
+    def recording_close(self):
+        closed.append(self.path)
+        close(self)
+    monkeypatch.setattr(CSVRepository, "close", recording_close)
+    sqlite_path = str(tmp_path / "database.db")
+    assert migrate_csv_to_sqlite(source.path, sqlite_path) == 3
+    assert closed == [source.path]
+    
+    target = SQLiteRepository(sqlite_path)
+    assert [r.email for r in target.load()] == [f"user{i}@example.com" for i in range(3)]
+    target.close()
+    
+    # The maintenance commands close what they open as well
+    assert storage.main(["compact", source.path]) == 0
+    assert storage.main(["upgrade", source.path]) == 0
+    assert closed == [source.path] * 3
+
+def test_csv_delete_appends_tombstone(tmp_path):
+    """Test that deleting leaves the data file alone and readers skip the row"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    for i in range(5):
+        repository.append(make_record(f"User {i}", f"user{i}@example.com"))
+    with open(repository.path) as f:
+        before = f.read()
+    
+    assert repository.delete_many(["user1@example.com", "USER3@example.com", "nobody@example.com"]) == 2
+    
+    with open(repository.path) as f:
+        assert f.read() == before
+    assert [r.email for r in repository.load()] == [
+        "user0@example.com", "user2@example.com", "user4@example.com"
+    ]
+    assert repository.count() == 3
+    
+    # A fresh repository sees the same view from the files on disk
+    reopened = CSVRepository(repository.path)
+    assert reopened.email_exists("user1@example.com") is False
+    assert reopened.count() == 3
+    
+    # A deleted email can be registered again
+    reopened.append(make_record("User 1", "user1@example.com"))
+    assert reopened.email_exists("user1@example.com") is True
+    assert reopened.load()[-1].name == "User 1"
+
+def test_csv_compaction(tmp_path):
+    """Test that crossing the threshold compacts the file atomically"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.COMPACT_MIN_TOMBSTONES = 3
+    repository.initialize()
+    for i in range(8):
+        repository.append(make_record(f"User {i}", f"user{i}@example.com"))
+    
+    repository.delete_many(["user0@example.com", "user1@example.com"])
+    assert repository.email_index.row_count == 8
+    
+    repository.delete("user2@example.com")
+    # The log is gone and only live rows remain in the file
+    assert not (tmp_path / "database.csv.tombstones").exists()
+    assert repository.email_index.row_count == 5
+    assert repository.email_index.dead == set()
+    assert [r.email for r in repository.load()] == [
+        f"user{i}@example.com" for i in range(3, 8)
+    ]
+    # No temporary files are left behind, and the journal was emptied first
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "database.csv", "database.csv.journal", "database.csv.lock"
+    ]
+    assert (tmp_path / "database.csv.journal").stat().st_size == 0
+
+def test_csv_stale_tombstones_are_ignored(tmp_path):
+    """Test that a log left over from an interrupted compaction hides nothing"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    repository.append(make_record("User 0", "user0@example.com"))
+    repository.append(make_record("User 1", "user1@example.com"))
+    
+    # Row 0 holds user0, so a tombstone naming another email at row 0 is stale
+    with open(repository.tombstone_path, "w") as f:
+        f.write("0,gone@example.com\n1,user1@exa")
+    
+    assert [r.email for r in repository.load()] == [
+        "user0@example.com", "user1@example.com"
+    ]
+    
+    # New tombstones start on a fresh line after the torn one
+    assert repository.delete("user1@example.com") is True
+    assert CSVRepository(repository.path).count() == 1
+
+@pytest.mark.parametrize("rewrite", ["compact", "update_all"])
+def test_csv_rewrite_interrupted_before_log_removal(tmp_path, monkeypatch, rewrite):
+    """Test that a crash between the rename and removing the log loses nothing"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    repository.append(make_record())
+    repository.delete("test@example.com")
+    repository.append(make_record("Again", "test@example.com"))
+    
+    def crash(path):
+        raise KeyboardInterrupt("crashed")
+    monkeypatch.setattr(storage, "remove_file", crash)
+    with pytest.raises(KeyboardInterrupt):
+        repository.compact() if rewrite == "compact" else repository.update_all(list)
+    monkeypatch.undo()
+    assert os.path.exists(repository.tombstone_path)
+    
+    reopened = CSVRepository(repository.path)
+    reopened.initialize()
+    assert [r.name for r in reopened.load()] == ["Again"]
+    assert reopened.email_exists("test@example.com") is True
+    # Deleting starts a new log for the new file
+    assert reopened.delete("test@example.com") is True
+    assert CSVRepository(repository.path).load() == []
+
+def test_csv_stores_raw_numbers_and_upgrades_legacy_rows(tmp_path):
+    """Test that new rows hold plain numbers and old formatted rows still load"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    with open(repository.path, "a", newline="") as f:
+        csv.writer(f).writerow(LEGACY_ROW)
+    repository.append(make_record())
+    
+    with open(repository.path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[2][3:] == ["1000", "5", "50", "12", "600"]
+    
+    legacy, new = repository.load()
+    assert legacy == make_record("Legacy User", "legacy@example.com")
+    assert new == make_record()
+    
+    # Rewriting the file stores the legacy row in the raw form too
+    repository.update_all(list)
+    with open(repository.path, newline="") as f:
+        assert list(csv.reader(f))[1][3:] == ["1000", "5", "50", "12", "600"]
+
+def test_sqlite_upgrades_legacy_table(tmp_path):
+    """Test that a table of formatted TEXT columns is converted on initialize"""
+    path = str(tmp_path / "database.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE loans (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+        "email TEXT NOT NULL, dob TEXT NOT NULL, loan_amount TEXT, interest_rate TEXT, "
+        "interest_money TEXT, months TEXT, total_interest TEXT)"
+    )
+    connection.execute("CREATE UNIQUE INDEX loans_email ON loans (lower(email))")
+    connection.execute(
+        "INSERT INTO loans (name, email, dob, loan_amount, interest_rate, "
+        "interest_money, months, total_interest) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", LEGACY_ROW
+    )
+    connection.commit()
+    connection.close()
+    
+    repository = SQLiteRepository(path)
+    repository.initialize()
+    assert repository.load() == [make_record("Legacy User", "legacy@example.com")]
+    with pytest.raises(DuplicateEmailError):
+        repository.append(make_record("Again", "LEGACY@example.com"))
+    
+    # A second initialize finds the typed table and leaves it alone
+    repository.initialize()
+    assert repository.count() == 1
+    repository.close()
+
+def make_legacy_table(path, rows, name="loans"):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+        "email TEXT NOT NULL, dob TEXT NOT NULL, loan_amount TEXT, interest_rate TEXT, "
+        "interest_money TEXT, months TEXT, total_interest TEXT)"
+    )
+    connection.executemany(
+        f"INSERT INTO {name} (name, email, dob, loan_amount, interest_rate, "
+        "interest_money, months, total_interest) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+    )
+    connection.commit()
+    connection.close()
+
+def test_sqlite_legacy_upgrade_is_all_or_nothing(tmp_path, monkeypatch):
+    """Test that an upgrade failing mid-copy loses no rows"""
+    path = str(tmp_path / "database.db")
+    rows = [[f"User {i}", f"user{i}@example.com"] + LEGACY_ROW[2:] for i in range(3)]
+    make_legacy_table(path, rows)
+    
+    from_row = LoanRecord.from_row
+    def crash_on_second_row(row):
+        if row["Email"] == "user1@example.com":
+            raise RuntimeError("crashed")
+        return from_row(row)
+    monkeypatch.setattr(LoanRecord, "from_row", staticmethod(crash_on_second_row))
+    repository = SQLiteRepository(path)
+    with pytest.raises(RuntimeError):
+        repository.initialize()
+    repository.close()
+    connection = sqlite3.connect(path)
+    tables = [row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")]
+    connection.close()
+    assert tables == ["loans"]
+    
+    monkeypatch.setattr(LoanRecord, "from_row", staticmethod(from_row))
+    repository = SQLiteRepository(path)
+    repository.initialize()
+    assert repository.count() == 3
+    repository.close()
+
+def test_sqlite_resumes_a_stranded_legacy_copy(tmp_path):
+    """Test that rows left in loans_legacy by an older interrupted upgrade come back"""
+    path = str(tmp_path / "database.db")
+    make_legacy_table(path, [LEGACY_ROW], name="loans_legacy")
+    
+    repository = SQLiteRepository(path)
+    repository.initialize()
+    assert repository.load() == [make_record("Legacy User", "legacy@example.com")]
+    repository.initialize()
+    assert repository.count() == 1
+    repository.close()
+
+def test_journal_replays_writes_lost_in_a_crash(tmp_path):
+    """Test that acknowledged writes survive losing the data files' tails"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    for i in range(4):
+        repository.append(make_record(f"User {i}", f"user{i}@example.com"))
+    with open(repository.path, "rb") as f:
+        header_and_first_row = b"".join(f.readlines()[:2])
+    repository.delete("user1@example.com")
+    repository.delete("user3@example.com")
+    
+    # The OS only got the header, the first row and half of the second
+    # to disk, and none of the tombstone log
+    with open(repository.path, "wb") as f:
+        f.write(header_and_first_row + b"User 1,user1@exa")
+    os.remove(repository.tombstone_path)
+    
+    recovered = CSVRepository(repository.path)
+    recovered.initialize()
+    assert [r.email for r in recovered.load()] == ["user0@example.com", "user2@example.com"]
+    assert os.path.getsize(recovered.journal.path) == 0
+    
+    # Replaying again, or after a clean write, changes nothing
+    recovered.initialize()
+    assert recovered.count() == 2
+    assert recovered.email_index.row_count == 4
+
+def test_journal_builds_each_row_once(tmp_path, monkeypatch):
+    """Test that journal entries hold each row once, in column order"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    calls = []
+    to_row = LoanRecord.to_row
+    def counting_to_row(self):
+        calls.append(self)
+        return to_row(self)
+    monkeypatch.setattr(LoanRecord, "to_row", counting_to_row)
+    records = [make_record(f"User {i}", f"user{i}@example.com") for i in range(3)]
+    
+    repository._journal_records(records)
+    assert calls == records
+    payloads = [entry[2] for entry in repository.journal.read()]
+    assert payloads == [[to_row(record)[field] for field in FIELDNAMES] for record in records]
+
+def test_journal_ignores_torn_entries(tmp_path):
+    """Test that an entry cut off mid-write is treated as never committed"""
+    journal = Journal(str(tmp_path / "database.csv.journal"))
+    journal.commit(journal.append([["D", 0, "a@example.com"], ["D", 1, "b@example.com"]]))
+    journal.close()
+    with open(journal.path, "ab") as f:
+        f.write(Journal.encode(["D", 2, "c@example.com"])[:-5])
+    
+    assert Journal(journal.path).read() == [["D", 0, "a@example.com"], ["D", 1, "b@example.com"]]
+    with pytest.raises(StorageError):
+        Journal(journal.path, durability="sometimes")
+
+def test_group_commit_shares_fsyncs(tmp_path, monkeypatch):
+    """Test that concurrent writers in group mode are synced together"""
+    syncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (syncs.append(fd), real_fsync(fd)))
+    repository = CSVRepository(str(tmp_path / "database.csv"), durability="group", group_interval=0.05)
+    repository.initialize()
+    syncs.clear()
+    
+    threads = [
+        threading.Thread(target=repository.append, args=(make_record(f"User {i}", f"user{i}@example.com"),))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert repository.count() == 8
+    assert len(repository.journal.read()) == 8
+    assert len(syncs) < 8
+
+def test_journal_checkpoints(tmp_path):
+    """Test that the journal is emptied once enough entries pile up, and on close"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.CHECKPOINT_ENTRIES = 3
+    repository.initialize()
+    repository.append_many([make_record(f"User {i}", f"user{i}@example.com") for i in range(2)])
+    assert len(repository.journal.read()) == 2
+    
+    repository.delete("user0@example.com")
+    assert repository.journal.read() == []
+    
+    repository.append(make_record())
+    repository.close()
+    assert repository.journal.read() == []
+    assert CSVRepository(repository.path).count() == 2
+
+def test_csv_maps_legacy_and_reordered_headers(tmp_path):
+    """Test that a file with other column names is rewritten, not wiped"""
+    path = tmp_path / "database.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Email", "Full Name", "DOB", "Loan Amount ($)", "Interest Rate (%)",
+                         "Term (Months)", "Branch"])
+        writer.writerow(["ann@example.com", "Ann", "2000-01-01", "1000 $", "5 %", "12 months", "North"])
+    
+    repository = CSVRepository(str(path))
+    repository.initialize()
+    
+    record = repository.load()[0]
+    assert (record.name, record.email, record.loan_amount, record.rate, record.months) == (
+        "Ann", "ann@example.com", 1000, 5, 12)
+    with open(path, newline="") as f:
+        assert next(csv.reader(f)) == FIELDNAMES
+    # The Branch column has no place in the new file, so the original is kept
+    with open(str(path) + ".orig", newline="") as f:
+        assert next(csv.reader(f))[-1] == "Branch"
+
+def test_csv_refuses_unreadable_headers(tmp_path):
+    """Test that a file without an email column is reported and left alone"""
+    path = tmp_path / "database.csv"
+    path.write_text("Customer,Amount\nAnn,1000\n")
+    
+    with pytest.raises(StorageError, match="left unchanged"):
+        CSVRepository(str(path)).initialize()
+    assert path.read_text() == "Customer,Amount\nAnn,1000\n"
+
+def test_csv_reads_a_header_with_a_byte_order_mark(tmp_path):
+    """Test that a file saved by Excel keeps its names"""
+    path = tmp_path / "database.csv"
+    path.write_bytes("\ufeffFull Name,Email,DOB,Amount,Rate,Term\n"
+                     "Ann,ann@example.com,2000-01-01,1000,5,12\n".encode("utf-8"))
+    
+    repository = CSVRepository(str(path))
+    repository.initialize()
+    assert [(r.name, r.email) for r in repository.load()] == [("Ann", "ann@example.com")]
+    assert not os.path.exists(str(path) + ".orig")
+    
+    # A BOM in front of the current header needs no rewrite at all
+    path.write_bytes(("\ufeff" + ",".join(FIELDNAMES) + "\n").encode("utf-8"))
+    before = path.read_bytes()
+    CSVRepository(str(path)).initialize()
+    assert path.read_bytes() == before
+
+def test_csv_skips_rows_with_infinite_amounts(tmp_path):
+    """Test that an amount of "inf" or "nan" makes a row unreadable rather than failing the load"""
+    path = tmp_path / "database.csv"
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDNAMES)
+        writer.writerow(["Inf", "inf@example.com", "2000-01-01", "inf $"] + LEGACY_ROW[4:])
+        writer.writerow(["NaN", "nan@example.com", "2000-01-01", "nan"] + LEGACY_ROW[4:])
+        writer.writerow(LEGACY_ROW)
+    repository = CSVRepository(str(path))
+    repository.initialize()
+    assert [record.name for record in repository.load()] == ["Legacy User"]
+
+def test_csv_round_trips_non_ascii_text(tmp_path):
+    """Test that names outside ASCII are stored as UTF-8 and survive a rewrite"""
+    path = tmp_path / "database.csv"
+    repository = CSVRepository(str(path))
+    repository.initialize()
+    repository.append_many([make_record("Zoë Ünal", "zoe@example.com"),
+                            make_record("Åsa Øberg", "asa@example.com")])
+    assert "Zoë Ünal" in path.read_bytes().decode("utf-8")
+    
+    repository.delete("zoe@example.com")
+    repository.compact()
+    assert [record.name for record in CSVRepository(str(path)).load()] == ["Åsa Øberg"]
+
+def test_csv_reads_files_written_in_the_windows_code_page(tmp_path):
+    """Test that a database the original app wrote on Windows opens, and new rows are UTF-8"""
+    path = tmp_path / "database.csv"
+    with open(path, "w", newline="", encoding="cp1252") as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDNAMES)
+        writer.writerow(["José Núñez", "jose@example.com"] + LEGACY_ROW[2:])
+    repository = CSVRepository(str(path))
+    repository.initialize()
+    repository.append(make_record("Zoë Ünal", "zoe@example.com"))
+    
+    assert [record.name for record in repository.load()] == ["José Núñez", "Zoë Ünal"]
+    assert repository.delete("jose@example.com")
+    assert [record.name for record in CSVRepository(str(path)).load()] == ["Zoë Ünal"]
+
+def test_csv_refuses_to_drop_required_columns(tmp_path):
+    """Test that a file missing a column it needs is left alone"""
+    path = tmp_path / "database.csv"
+    path.write_text("Customer,Email,DOB,Amount,Rate,Term\nAnn,ann@example.com,2000-01-01,1000,5,12\n")
+    
+    with pytest.raises(StorageError, match="no Name column"):
+        CSVRepository(str(path)).initialize()
+    assert path.read_text().startswith("Customer,")
+
+def test_email_index_add_does_not_rebuild(tmp_path, monkeypatch):
+    """Test that adding appended rows reads only those rows"""
+    test_file = tmp_path / "test_db.csv"
+    test_file.write_text("Name,Email,Date of Birth\n")
+    index = EmailIndex(str(test_file))
+    index.rebuild()
+    
+    def no_rebuild():
+        raise AssertionError("the whole file was read again")
+    monkeypatch.setattr(index, "rebuild", no_rebuild)
+    for i in range(50):
+        with open(test_file, 'a', newline='') as f:
+            csv.writer(f).writerow([f"User {i}", f"User{i}@example.com", "2000-01-01"])
+        index.add(f"User{i}@example.com")
+        assert index._reader.checkpoint.offset == os.path.getsize(test_file)
+        assert index._signature == index._stat_signature()
+    assert index.row_count == 50
+    assert "user49@example.com" in index
+
+def test_email_index_reads_only_new_rows(tmp_path, monkeypatch):
+    """Test that rows appended by another writer are picked up incrementally"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    for i in range(3):
+        repository.append(make_record(f"User {i}", f"user{i}@example.com"))
+    
+    # Another process appends a row and deletes one
+    other = CSVRepository(repository.path)
+    other.append(make_record("Late User", "late@example.com"))
+    other.delete("user1@example.com")
+    
+    def no_rebuild():
+        raise AssertionError("the whole file was read again")
+    monkeypatch.setattr(repository.email_index, "rebuild", no_rebuild)
+    offset = repository.email_index._reader.checkpoint.offset
+    
+    assert repository.count() == 3
+    assert repository.email_exists("late@example.com") is True
+    assert repository.email_exists("user1@example.com") is False
+    assert repository.email_index._reader.checkpoint.offset > offset
+
+def test_row_reader_resumes_after_complete_rows(tmp_path):
+    """Test that torn rows wait for the rest and quoted newlines stay in their field"""
+    path = tmp_path / "database.csv"
+    path.write_bytes(b'Name,Email\r\n"Ann\nLee",ann@example.com\r\n\r\nBob,bob@exa')
+    reader = RowReader(str(path))
+    
+    assert list(reader.read()) == [(0, {"Name": "Ann\nLee", "Email": "ann@example.com"})]
+    with open(path, "ab") as f:
+        f.write(b"mple.com\r\n")
+    assert list(reader.read()) == [(1, {"Name": "Bob", "Email": "bob@example.com"})]
+    assert list(reader.read()) == []
+    
+    # Rewriting the file in place makes the reader start over
+    path.write_bytes(b"Name,Email\r\nCid,cid@example.com\r\nDee,dee@example.com\r\n")
+    assert [row for row, _ in reader.read()] == [0, 1]
+
+def test_csv_fetch_reads_from_row_marks(tmp_path, monkeypatch):
+    """Test that deep pages skip straight to a marked row and honour deletes"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    repository.append_many([make_record(f"User {i}", f"user{i}@example.com") for i in range(2500)])
+    repository.delete_many([f"user{i}@example.com" for i in (5, 1500, 1501)])
+    expected = repository.load()
+    
+    monkeypatch.setattr(CSVRepository, "iter_records", lambda self: pytest.fail("read from the top"))
+    for offset in (0, 998, 1499, 2400, 2496):
+        assert repository.fetch(offset, 3) == expected[offset:offset + 3]
+    assert repository.fetch(2497, 10) == []
+
+def test_csv_counts_rows_with_repeated_or_blank_emails(tmp_path):
+    """Test that count and fetch see every row of a legacy file, whatever its emails"""
+    path = tmp_path / "database.csv"
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDNAMES)
+        for name, email in [("A", "a@example.com"), ("B", "a@example.com"), ("C", ""),
+                            ("D", ""), ("E", "e@example.com")]:
+            writer.writerow([name, email] + LEGACY_ROW[2:])
+    repository = CSVRepository(str(path))
+    
+    assert len(list(repository.iter_records())) == 5
+    assert repository.count() == 5
+    assert [record.name for record in repository.fetch(3, 10)] == ["D", "E"]
+
+def test_csv_keeps_an_email_until_its_last_row_is_deleted(tmp_path):
+    """Test that deleting one of two rows sharing an email leaves the email taken"""
+    path = tmp_path / "database.csv"
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDNAMES)
+        writer.writerow(["Old", "twin@example.com"] + LEGACY_ROW[2:])
+        writer.writerow(["New", "Twin@example.com"] + LEGACY_ROW[2:])
+    repository = CSVRepository(str(path))
+    
+    assert repository.delete("twin@example.com")
+    assert repository.email_exists("twin@example.com")
+    assert repository.get("twin@example.com").name == "Old"
+    with pytest.raises(DuplicateEmailError):
+        repository.append(make_record(email="twin@example.com"))
+    
+    # A fresh index reading the tombstone log agrees
+    assert CSVRepository(str(path)).email_exists("twin@example.com")
+    assert repository.delete("twin@example.com")
+    assert not repository.email_exists("twin@example.com")
+    assert repository.count() == 0
+
+def test_csv_change_feed_across_processes(tmp_path):
+    """Test that another process's appends and deletes show up as changes"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    repository.append(make_record("Ann", "ann@example.com"))
+    token, cursor = repository.change_token(), repository.change_cursor()
+    
+    other = CSVRepository(repository.path)
+    other.append(make_record("Bob", "bob@example.com"))
+    other.delete("ann@example.com")
+    
+    assert repository.change_token() != token
+    added, removed, cursor = repository.changes_since(cursor)
+    assert [record.email for record in added] == ["bob@example.com"]
+    assert [record.email for record in removed] == ["ann@example.com"]
+    assert repository.changes_since(cursor) == ([], [], cursor)
+    
+    # A rewrite renumbers rows, so the feed asks for a reload
+    other.compact()
+    assert repository.changes_since(cursor) is None
+
+def test_csv_writers_in_separate_processes(tmp_path):
+    """Test that concurrent processes never store the same email twice"""
+    path = str(tmp_path / "database.csv")
+    CSVRepository(path).initialize()
+    code = (
+        "import sys; from src.loans import build_record; from src.storage import CSVRepository\n"
+        "repository = CSVRepository(sys.argv[1]); repository.initialize()\n"
+        "for i in range(100):\n"
+        "    repository.append_many([build_record('User', f'user{i}@example.com', '2000-01-01', 1000, 5, 12)])\n"
+        "repository.close()\n"
+    )
+    workers = [subprocess.Popen([sys.executable, "-c", code, path]) for _ in range(3)]
+    assert [worker.wait(timeout=60) for worker in workers] == [0, 0, 0]
+    
+    emails = [record.email for record in CSVRepository(path).iter_records()]
+    assert sorted(emails) == sorted(f"user{i}@example.com" for i in range(100))
+
+def test_file_lock_uses_msvcrt_without_fcntl(tmp_path, monkeypatch):
+    """Test that on Windows the lock file's first byte is locked and unlocked through msvcrt"""
+    calls = []
+    
+    class FakeMsvcrt:
+        LK_LOCK, LK_UNLCK = "lock", "unlock"
+        attempts = 0
+        
+        def locking(self, fd, mode, length):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise OSError("still held after ten seconds")
+            calls.append((mode, os.lseek(fd, 0, os.SEEK_CUR), length))
+    
+    monkeypatch.setattr(storage, "fcntl", None)
+    monkeypatch.setattr(storage, "msvcrt", FakeMsvcrt())
+    lock = storage.FileLock(str(tmp_path / "database.csv.lock"))
+    with lock:
+        with lock:
+            assert calls == [("lock", 0, 1)]
+    assert calls == [("lock", 0, 1), ("unlock", 0, 1)]
+    lock.close()
+
+def test_csv_append_after_another_process_tore_a_row(tmp_path):
+    """Test that a row torn by a crashed process does not swallow the next append"""
+    repository = CSVRepository(str(tmp_path / "database.csv"))
+    repository.initialize()
+    repository.append(make_record("Ann", "ann@example.com"))
+    code = (
+        "import os, sys; from src.storage import CSVRepository\n"
+        "repository = CSVRepository(sys.argv[1]); repository.initialize()\n"
+        "with open(sys.argv[1], 'a') as file:\n"
+        "    file.write('Torn User,torn@exa'); file.flush()\n"
+        "os._exit(1)\n"
+    )
+    assert subprocess.run([sys.executable, "-c", code, repository.path], timeout=60).returncode == 1
+    
+    repository.append(make_record("Bob", "bob@example.com"))
+    assert [r.email for r in repository.load()] == ["ann@example.com", "bob@example.com"]
+    reopened = CSVRepository(repository.path)
+    reopened.initialize()
+    assert [r.email for r in reopened.load()] == ["ann@example.com", "bob@example.com"]
+
+def test_sqlite_change_token_sees_other_connections(tmp_path):
+    """Test that commits from another connection change the token"""
+    repository = SQLiteRepository(str(tmp_path / "database.db"))
+    repository.initialize()
+    token = repository.change_token()
+    assert repository.change_token() == token
+    
+    other = SQLiteRepository(repository.path)
+    other.append(make_record())
+    other.close()
+    assert repository.change_token() != token
+    repository.close()
+
+@pytest.mark.parametrize("cls, name", [(CSVRepository, "database.csv"), (SQLiteRepository, "database.db")])
+def test_change_feed_lists_each_change_once(tmp_path, cls, name):
+    """Test that the feed reports net changes and matches the records read with it"""
+    repository = cls(str(tmp_path / name))
+    repository.initialize()
+    repository.append_many([make_record(who, f"{who.lower()}@example.com") for who in ("Ann", "Bob")])
+    cursor, records = repository.records_with_cursor()
+    repository.append(make_record("Cid", "cid@example.com"))
+    assert [record.email for record in records] == ["ann@example.com", "bob@example.com"]
+    
+    repository.delete("cid@example.com")  # Added and removed since cursor: not listed
+    repository.delete("bob@example.com")
+    repository.append(make_record("Bob Again", "bob@example.com"))
+    added, removed, cursor = repository.changes_since(cursor)
+    assert [record.name for record in added] == ["Bob Again"]
+    assert [record.name for record in removed] == ["Bob"]
+    assert repository.changes_since(cursor) == ([], [], cursor)
+    repository.close()
+
+def test_sqlite_change_feed_reloads_past_trimmed_log(tmp_path, monkeypatch):
+    """Test that a reader further behind than the change log gets None"""
+    monkeypatch.setattr(SQLiteRepository, "CREATE_CHANGE_TRIGGERS", [
+        trigger.replace(f"- {SQLiteRepository.CHANGE_LOG_SIZE}", "- 2")
+        for trigger in SQLiteRepository.CREATE_CHANGE_TRIGGERS
+    ])
+    repository = SQLiteRepository(str(tmp_path / "database.db"))
+    repository.initialize()
+    cursor = repository.change_cursor()
+    repository.append_many([make_record(f"User {i}", f"user{i}@example.com") for i in range(5)])
+    assert repository.changes_since(cursor) is None
+    assert len(repository.changes_since(repository.change_cursor() - 2)[0]) == 2
+    repository.close()
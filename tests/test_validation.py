@@ -0,0 +1,65 @@
+import pytest
+import os
+import subprocess
+import sys
+from datetime import date
+from src import validation
+from src.validation import (
+    ConfigurationError, check_field, check_fields, load_dob_cutoff, parse_dob,
+    validate_application, validate_batch, validate_dob, validate_email
+)
+
+VALID = ("Jane Doe", "jane@example.com", "1990-01-01", "5000", "10", "12")
+
+def test_dates_of_birth_are_real_days_before_the_cutoff(monkeypatch):
+    """Test calendar checks and the configurable cutoff"""
+    assert validate_dob("2000-02-29") is True
+    assert validate_dob("2001-02-29") is False
+    assert validate_dob("2000-02-31") is False
+    assert validate_dob("2000-1-01") is False
+    assert parse_dob("0000-01-01") is None
+    
+    assert validate_dob("2024-12-31") is True
+    assert validate_dob("2025-01-01") is False
+    assert validate_dob("2025-01-01", cutoff=date(2026, 1, 1)) is True
+    monkeypatch.setattr(validation, "DOB_CUTOFF", load_dob_cutoff({"BANK_DOB_CUTOFF": "2010-06-01"}))
+    assert validate_dob("2010-05-31") is True
+    assert validate_dob("2010-06-01") is False
+    assert "before 2010-06-01" in check_field("dob", "2011-01-01")
+
+def test_bad_cutoff_setting_fails_once_at_start_up():
+    """Test that a malformed BANK_DOB_CUTOFF is reported by name"""
+    assert load_dob_cutoff({}) == date(2025, 1, 1)
+    with pytest.raises(ConfigurationError, match="BANK_DOB_CUTOFF"):
+        load_dob_cutoff({"BANK_DOB_CUTOFF": "01/06/2010"})
+    
+    env = dict(os.environ, BANK_DOB_CUTOFF="soon")
+    result = subprocess.run([sys.executable, "-c", "import src.validation"],
+                            env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode != 0
+    assert "ConfigurationError: BANK_DOB_CUTOFF must be a date" in result.stderr
+
+def test_field_checks():
+    """Test that every failing field is reported, not just the first"""
+    assert validate_email("user@example.com\n") is False
+    assert check_field("loan_amount", "²") == "Loan amount must be a positive number."
+    assert check_fields(*VALID) == {}
+    assert validate_application(*VALID) is None
+    
+    errors = check_fields("", "nope", *VALID[2:4], "0", "")
+    assert list(errors) == ["name", "email", "interest_rate", "months"]
+    assert validate_application("", "nope", *VALID[2:4], "0", "") == errors["name"]
+
+def test_validate_batch():
+    """Test structured per-row errors for mappings and sequences"""
+    rows = [
+        VALID,
+        dict(zip(("name", "email", "dob", "loan_amount", "interest_rate", "months"), VALID), dob="2000-02-31"),
+        {"name": "Bob"},
+    ] * 1000
+    errors = validate_batch(rows)
+    assert len(errors) == 3000
+    assert errors[:2] == [{}, {"dob": "Please enter a valid date of birth in YYYY-MM-DD format "
+                                      "(must be before 2025-01-01)."}]
+    assert set(errors[2]) == {"email", "dob", "loan_amount", "interest_rate", "months"}
+    assert validate_batch([VALID[:2] + ("2030-01-01",) + VALID[3:]], cutoff=date(2031, 1, 1)) == [{}]
@@ -0,0 +1,90 @@
+import pytest
+import threading
+from src.workers import IOExecutor
+
+@pytest.fixture
+def executor():
+    busy_states = []
+    executor = IOExecutor(on_busy_change=busy_states.append)
+    executor.busy_states = busy_states
+    yield executor
+    executor.shutdown()
+
+def test_callbacks_run_on_polling_thread(executor):
+    """Test that results are delivered on the thread that polls"""
+    results = []
+    worker_threads = []
+    
+    def job(value):
+        worker_threads.append(threading.current_thread())
+        return value * 2
+    
+    executor.submit(job, 21, on_success=lambda result: results.append(
+        (result, threading.current_thread())))
+    executor.drain()
+    
+    assert results == [(42, threading.current_thread())]
+    assert worker_threads[0] is not threading.current_thread()
+    assert executor.busy_states == [True, False]
+
+def test_errors_are_reported(executor):
+    """Test that exceptions raised by a job reach the error callback"""
+    errors = []
+    
+    def job():
+        raise ValueError("disk on fire")
+    
+    executor.submit(job, on_success=lambda result: errors.append("no error"),
+                    on_error=errors.append)
+    executor.drain()
+    
+    assert len(errors) == 1
+    assert isinstance(errors[0], ValueError)
+    assert executor.busy is False
+
+def test_writes_are_serialized(executor):
+    """Test that write jobs never overlap and keep their submission order"""
+    order = []
+    active = []
+    
+    def write(i):
+        active.append(i)
+        assert len(active) == 1
+        order.append(i)
+        active.remove(i)
+    
+    errors = []
+    for i in range(20):
+        executor.submit(write, i, on_error=errors.append, write=True)
+    executor.drain()
+    
+    assert errors == []
+    assert order == list(range(20))
+
+def test_polling_is_scheduled_while_busy():
+    """Test that the executor asks the scheduler to poll until work is done"""
+    scheduled = []
+    executor = IOExecutor(schedule=lambda delay, callback: scheduled.append(callback))
+    results = []
+    executor.submit(lambda: "done", on_success=results.append)
+    
+    while not results:
+        assert len(scheduled) == 1
+        scheduled.pop()()  # Simulate the Tk timer firing
+    assert results == ["done"]
+    assert scheduled == []
+    executor.shutdown()
+
+def test_quiet_jobs_leave_the_busy_state_alone(executor):
+    """Test that background checks are delivered without flagging the GUI as busy"""
+    results = []
+    executor.submit(lambda: "quiet", on_success=results.append, quiet=True)
+    assert executor.busy is False
+    executor.drain()
+    assert results == ["quiet"]
+    assert executor.busy_states == []
+    
+    executor.submit(lambda: "loud", on_success=results.append)
+    executor.submit(lambda: "quiet", on_success=results.append, quiet=True)
+    executor.drain()
+    assert executor.busy_states == [True, False]